@@ -0,0 +1,37 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+
+async def arender(request, template_name, context):
+    """
+    Renders a template from an async view.
+
+    Template rendering and the context processors are synchronous, so they run in the thread
+    that Django uses for the synchronous ORM calls of the request. Querysets in the context
+    should be fetched beforehand, e.g. with ``alist``, so rendering does not wait for the database.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        template_name (str): The template to render.
+        context (dict): The template context.
+
+    Returns:
+        HttpResponse: The rendered response.
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def alist(queryset):
+    """
+    Evaluates a queryset with async iteration.
+
+    Args:
+        queryset (QuerySet): The queryset to evaluate.
+
+    Returns:
+        list: The objects of the queryset.
+
+    Example:
+        >>> tags, reviews = await asyncio.gather(alist(article.tags.all()), alist(article.review_set.all()))
+    """
+    return [obj async for obj in queryset]
@@ -0,0 +1,194 @@
+import bisect
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from BlogStudentsBUT.cache import version_key
+from users.search import words
+
+# The suggested kinds of objects, with the cache namespace their signals bump when they change
+# and the name of the route showing an object.
+SECTIONS = {
+    'articles': ('articles', 'article'),
+    'tags': ('tags', 'tag'),
+    'profiles': ('profiles', 'user_profile'),
+    'skills': ('profiles', 'skill'),
+}
+
+# How many index entries a query may read past the ones it returns, when its further words filter them out.
+MAX_SCAN = 2000
+
+
+def load_articles():
+    from articles.models import Article
+    return Article.objects.exclude(slug=None).values_list('title', 'slug').iterator()
+
+
+def load_tags():
+    from articles.models import Tag
+    return Tag.objects.exclude(slug=None).values_list('name', 'slug').iterator()
+
+
+def load_profiles():
+    from users.models import Profile
+    return Profile.objects.exclude(username=None).values_list('name', 'username').iterator()
+
+
+def load_skills():
+    from users.models import Skill
+    return Skill.objects.exclude(slug=None).values_list('name', 'slug').iterator()
+
+
+LOADERS = {
+    'articles': load_articles,
+    'tags': load_tags,
+    'profiles': load_profiles,
+    'skills': load_skills,
+}
+
+
+class PrefixIndex:
+    """
+    An in-memory index answering word prefix queries with a binary search.
+
+    Attributes:
+        keys (list): Every word of every label, lowercase and without diacritics (see ``users.search.words``),
+            sorted, so the words starting with a prefix form one contiguous range.
+        entries (list): The label, the slug and all words of the item each key belongs to, in the order of ``keys``.
+
+    Example:
+        >>> index = PrefixIndex([('Computer Science', 'computer-science')])
+        >>> index.search(['sci'], 5)
+        [('Computer Science', 'computer-science')]
+    """
+    def __init__(self, items):
+        rows = []
+        for label, slug in items:
+            label_words = words(label)
+            for word in set(label_words):
+                rows.append((word, label, slug, label_words))
+        rows.sort()
+        self.keys = [row[0] for row in rows]
+        self.entries = [row[1:] for row in rows]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query_words, limit):
+        """
+        Returns the items with a word starting with each query word, in alphabetical order of the matched word.
+
+        Args:
+            query_words (list): The words of the query, the last one usually being typed.
+            limit (int): The maximum number of items to return.
+
+        Returns:
+            list: The label and the slug of the items.
+
+        The range of the longest query word is read, and its items are kept when each other query word
+        starts one of their words. At most ``MAX_SCAN`` entries are read, so a short but unselective
+        query cannot scan the whole index.
+        """
+        if not query_words or limit <= 0:
+            return []
+        prefix = max(query_words, key=len)
+        others = [word for word in query_words if word != prefix]
+
+        results, seen = [], set()
+        start = bisect.bisect_left(self.keys, prefix)
+        for position in range(start, min(start + MAX_SCAN, len(self.keys))):
+            if not self.keys[position].startswith(prefix):
+                break
+            label, slug, label_words = self.entries[position]
+            if slug in seen or not all(any(word.startswith(other) for word in label_words) for other in others):
+                continue
+            seen.add(slug)
+            results.append((label, slug))
+            if len(results) == limit:
+                break
+        return results
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def current_versions():
+    """
+    Returns the cache versions of the namespaces the suggestions depend on.
+
+    A missing version, after the cache was cleared or the key was evicted, is started at a random
+    number instead of the default 1, so an index built before cannot pass for a current one.
+
+    Returns:
+        dict: The version of each namespace of ``SECTIONS``.
+    """
+    namespaces = sorted({namespace for namespace, _ in SECTIONS.values()})
+    keys = {namespace: version_key(namespace) for namespace in namespaces}
+    found = cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, random.randint(2, 2 ** 31), None)
+        found.update(cache.get_many(missing))
+    return {namespace: found.get(key, 1) for namespace, key in keys.items()}
+
+
+def get_index(section, version):
+    """
+    Returns the prefix index of a section, rebuilding it if its namespace was bumped since it was built.
+
+    Every process keeps its own indexes. Only the sections whose data changed are rebuilt, under a lock,
+    so concurrent requests do not build the same index twice. A section is rebuilt at most once per
+    ``AUTOCOMPLETE_MAX_AGE`` seconds, as long as clients may reuse an answer anyway, so frequent changes
+    (e.g. every comment bumps 'articles') do not rebuild it for every request.
+
+    Args:
+        section (str): A key of ``SECTIONS``.
+        version (int): The current version of the section's namespace.
+
+    Returns:
+        tuple: The version the index was built from and the ``PrefixIndex``.
+    """
+    built = _indexes.get(section)
+    if built is not None and (built[0] == version or time.monotonic() - built[1] < settings.AUTOCOMPLETE_MAX_AGE):
+        return built[0], built[2]
+    with _lock:
+        built = _indexes.get(section)
+        if built is None or built[0] != version:
+            built = _indexes[section] = (version, time.monotonic(), PrefixIndex(LOADERS[section]()))
+    return built[0], built[2]
+
+
+def suggest(query, limit=None):
+    """
+    Suggests articles, faculties, profiles and skills whose names start with the typed words.
+
+    Args:
+        query (str): The text typed into a search field.
+        limit (int): The maximum number of suggestions per section, defaults to ``AUTOCOMPLETE_LIMIT``.
+
+    Returns:
+        tuple: The suggestions, a dict of lists of dicts with the 'label' and 'url' of the suggested
+        objects by section, and the namespace versions the indexes were built from, by section.
+
+    Example:
+        >>> suggestions, versions = suggest('comp sci')
+        >>> suggestions['skills']
+        [{'label': 'Computer Science', 'url': '/users/skill/computer-science'}]
+    """
+    limit = settings.AUTOCOMPLETE_LIMIT if limit is None else limit
+    query_words = list(dict.fromkeys(words(query)))
+    if not query_words:
+        return {section: [] for section in SECTIONS}, {}
+    versions = current_versions()
+    suggestions, built = {}, {}
+    for section, (namespace, route) in SECTIONS.items():
+        built[section], index = get_index(section, versions[namespace])
+        found = index.search(query_words, limit)
+        suggestions[section] = [{'label': label, 'url': reverse(route, args=[slug])} for label, slug in found]
+    return suggestions, built
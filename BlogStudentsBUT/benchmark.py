@@ -0,0 +1,340 @@
+import http.client
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.text import slugify
+
+from articles import search
+from articles.models import Article, Tag, Review
+from articles.urls import urlpatterns as article_urlpatterns
+from users import search as profile_search
+from users.models import Profile, Skill, Message
+from users.urls import urlpatterns as user_urlpatterns
+
+BATCH_SIZE = 1000
+
+# Routes that change the state of the benchmark client instead of rendering a page.
+SKIPPED_ROUTES = {'logout'}
+
+# Query strings of the routes that do nothing without one.
+ROUTE_QUERIES = {'autocomplete': 'q=bench'}
+
+
+def route_names():
+    """
+    Lists the named routes of ``articles.urls`` and ``users.urls``.
+
+    Returns:
+        list: The route names, in the order they are declared.
+    """
+    return [pattern.name for pattern in article_urlpatterns + user_urlpatterns
+            if pattern.name and pattern.name not in SKIPPED_ROUTES]
+
+
+def seed(size, batch_size=BATCH_SIZE):
+    """
+    Fills the database with a synthetic dataset for benchmarking.
+
+    The rows are inserted with ``bulk_create``, which skips the model signals, so the comment
+    counters and the full-text index are rebuilt once at the end.
+
+    Args:
+        size (int): The number of articles, comments and messages to create. One profile
+            is created per ten articles, with a minimum of ten.
+        batch_size (int): The number of rows inserted per query.
+
+    Returns:
+        Profile: The profile the benchmark requests are made as. It owns articles, comments,
+        a skill and received messages, so every route has an object to show.
+    """
+    password = make_password('benchmark')
+    profile_count = max(size // 10, 10)
+
+    users = User.objects.bulk_create([
+        User(username=f'bench{number}', email=f'bench{number}@example.com', password=password)
+        for number in range(profile_count)
+    ], batch_size=batch_size)
+    profiles = Profile.objects.bulk_create([
+        Profile(user=user, username=user.username, name=f'Student {number}', email=user.email,
+                intro='Benchmark profile', bio='Generated for benchmarking.')
+        for number, user in enumerate(users)
+    ], batch_size=batch_size)
+
+    skills = Skill.objects.bulk_create([
+        Skill(name=f'Skill {number}', slug=f'skill-{number}')
+        for number in range(20)
+    ])
+    Profile.skills.through.objects.bulk_create([
+        Profile.skills.through(profile=profile, skill=skills[number % len(skills)])
+        for number, profile in enumerate(profiles)
+    ], batch_size=batch_size)
+
+    tags = Tag.objects.bulk_create([
+        Tag(name=f'Faculty {number}', slug=slugify(f'Faculty {number}')) for number in range(10)
+    ])
+    articles = Article.objects.bulk_create([
+        Article(owner=profiles[number % profile_count], title=f'Benchmark article {number}',
+                slug=f'benchmark-article-{number}',
+                description=f'<p>Generated article number {number} about student life.</p>')
+        for number in range(size)
+    ], batch_size=batch_size)
+    Article.tags.through.objects.bulk_create([
+        Article.tags.through(article=article, tag=tags[(number + offset) % len(tags)])
+        for number, article in enumerate(articles) for offset in (0, 1)
+    ], batch_size=batch_size)
+
+    Review.objects.bulk_create([
+        Review(owner=profiles[(number + 1) % profile_count], article=articles[number % size],
+               body=f'Comment number {number}')
+        for number in range(size)
+    ], batch_size=batch_size)
+    Message.objects.bulk_create([
+        Message(sender=profiles[(number + 1) % profile_count], recipient=profiles[number % profile_count],
+                name='Benchmark', email='bench@example.com', subject=f'Message {number}',
+                body='Hello', is_read=number % 3 == 0)
+        for number in range(size)
+    ], batch_size=batch_size)
+
+    Article.objects.refresh_review_counts()
+    search.rebuild_index()
+    profile_search.rebuild_index()
+    return profiles[0]
+
+
+def route_kwargs(profile):
+    """
+    Picks the URL arguments of every route for the benchmark profile.
+
+    Args:
+        profile (Profile): The profile returned by ``seed``.
+
+    Returns:
+        dict: The keyword arguments of ``reverse`` by route name. Routes without arguments are missing.
+    """
+    article = Article.objects.filter(owner=profile).order_by('created', 'id').first()
+    review = Review.objects.filter(owner=profile).order_by('created', 'id').first()
+    skill = profile.skills.order_by('created', 'id').first()
+    message = profile.messages.order_by('created', 'id').first()
+    other = Profile.objects.exclude(pk=profile.pk).order_by('username').first()
+    tag = article.tags.order_by('slug').first()
+    return {
+        'article': {'article_slug': article.slug},
+        'generate_pdf': {'article_slug': article.slug},
+        'article_comments': {'article_slug': article.slug},
+        'update_article': {'pk': article.pk},
+        'delete_article': {'pk': article.pk},
+        'tag': {'tag_slug': tag.slug},
+        'edit_comment': {'review_id': review.pk},
+        'delete_comment': {'review_id': review.pk},
+        'user_profile': {'username': other.username},
+        'update-skill': {'skill_slug': skill.slug},
+        'delete-skill': {'skill_slug': skill.slug},
+        'skill': {'skill_slug': skill.slug},
+        'message': {'pk': message.pk},
+        'create-message': {'username': other.username},
+    }
+
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    response.close()
+    return response, time.perf_counter() - start
+
+
+def measure_route(client, url, repeats):
+    """
+    Measures one route.
+
+    Every measured request starts with an empty cache, so the numbers describe the
+    uncached path. The memory is measured in an extra request, because tracing the
+    allocations slows the request down.
+
+    Args:
+        client (Client): A logged-in test client.
+        url (str): The URL to request.
+        repeats (int): The number of timed requests.
+
+    Returns:
+        dict: The status code, the number of queries, the p50 and p95 latency
+        in milliseconds and the peak traced memory in KiB.
+    """
+    timed_get(client, url)
+
+    timings = []
+    queries = 0
+    for _ in range(repeats):
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response, elapsed = timed_get(client, url)
+        timings.append(elapsed * 1000)
+        queries = max(queries, len(captured))
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        timed_get(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    p95 = statistics.quantiles(timings, n=20)[18] if len(timings) > 1 else timings[0]
+    return {
+        'status': response.status_code,
+        'queries': queries,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(p95, 2),
+        'peak_kib': round(peak / 1024),
+    }
+
+
+def run(client, profile, repeats):
+    """
+    Measures every named route of the articles and users apps.
+
+    Args:
+        client (Client): A test client logged in as ``profile``.
+        profile (Profile): The profile returned by ``seed``.
+        repeats (int): The number of timed requests per route.
+
+    Returns:
+        dict: The results of ``measure_route`` by route name.
+    """
+    kwargs = route_kwargs(profile)
+    results = {}
+    for name in route_names():
+        url = reverse(name, kwargs=kwargs.get(name))
+        if name in ROUTE_QUERIES:
+            url = f'{url}?{ROUTE_QUERIES[name]}'
+        results[name] = measure_route(client, url, repeats)
+    return results
+
+
+def percentile_ms(timings, quantile):
+    if len(timings) < 2:
+        return round(timings[0] * 1000, 2) if timings else None
+    return round(statistics.quantiles(timings, n=100)[quantile - 1] * 1000, 2)
+
+
+def load(base_url, paths, concurrency=16, duration=10, headers=None):
+    """
+    Measures the throughput of a running server.
+
+    Every worker thread keeps one HTTP/1.1 connection open and requests the paths in turn
+    until the time is up, so the numbers describe the server, not the connection setup.
+
+    Args:
+        base_url (str): The address of the server, e.g. 'http://127.0.0.1:8001'.
+        paths (list): The paths to request, e.g. ['/', '/articles/'].
+        concurrency (int): The number of requests in flight at any time.
+        duration (float): How many seconds to keep requesting.
+        headers (dict): Headers sent with every request, e.g. the session cookie.
+
+    Returns:
+        dict: The number of successful requests and of errors (status 400 or more, or
+        connection failures), the requests per second and the p50/p95 latency in milliseconds.
+    """
+    address = urlsplit(base_url)
+    deadline = time.perf_counter() + duration
+
+    def worker(number):
+        connection = http.client.HTTPConnection(address.hostname, address.port, timeout=30)
+        timings, errors = [], 0
+        while time.perf_counter() < deadline:
+            path = paths[number % len(paths)]
+            number += 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                continue
+            if response.status >= 400:
+                errors += 1
+            else:
+                timings.append(time.perf_counter() - start)
+        connection.close()
+        return timings, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    timings = [timing for worker_timings, _ in results for timing in worker_timings]
+    return {
+        'requests': len(timings),
+        'errors': sum(errors for _, errors in results),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': percentile_ms(timings, 50),
+        'p95_ms': percentile_ms(timings, 95),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as baseline:
+        json.dump(results, baseline, indent=2, sort_keys=True)
+        baseline.write('\n')
+
+
+def find_regressions(results, baseline, tolerance=1.5, slack_ms=5, slack_kib=256):
+    """
+    Compares benchmark results with a stored baseline.
+
+    Args:
+        results (dict): Route results by dataset size, as strings, then by route name.
+        baseline (dict): The stored results in the same format.
+        tolerance (float): How many times slower or bigger a route may get before it counts as a regression.
+        slack_ms (float): An absolute latency allowance, so very fast routes do not fail on noise.
+        slack_kib (int): An absolute memory allowance.
+
+    Returns:
+        list: A description of every regression. Routes or sizes missing from the baseline are ignored.
+
+    This function performs the following tasks:
+        1. Fails a route whose status code differs from the baseline, e.g. a page that now fails
+           or redirects and so looks faster.
+        2. Fails a route as soon as it runs more queries than in the baseline.
+        3. Fails a route whose p95 latency exceeds the baseline times ``tolerance`` plus ``slack_ms``.
+        4. Fails a route whose peak memory exceeds the baseline times ``tolerance`` plus ``slack_kib``.
+    """
+    regressions = []
+    for size, routes in results.items():
+        for name, result in routes.items():
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                continue
+            if result['status'] != expected['status']:
+                regressions.append(f"{name} ({size}): status {result['status']}, baseline {expected['status']}")
+            if result['queries'] > expected['queries']:
+                regressions.append(f"{name} ({size}): {result['queries']} queries, baseline {expected['queries']}")
+            if result['p95_ms'] > expected['p95_ms'] * tolerance + slack_ms:
+                regressions.append(f"{name} ({size}): p95 {result['p95_ms']} ms, baseline {expected['p95_ms']} ms")
+            if result['peak_kib'] > expected['peak_kib'] * tolerance + slack_kib:
+                regressions.append(f"{name} ({size}): peak {result['peak_kib']} KiB, baseline {expected['peak_kib']} KiB")
+    return regressions
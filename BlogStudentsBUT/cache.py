@@ -0,0 +1,211 @@
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import cc_delim_re, get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+VERSION_KEY = 'cache-version:{}'
+
+
+def version_key(namespace):
+    return VERSION_KEY.format(namespace)
+
+
+def get_versions(namespaces):
+    """
+    Returns the current version of each cache namespace.
+
+    Namespaces group cached pages and fragments that depend on the same data, e.g. 'articles'
+    for every listing or 'article:<slug>' for one article page. Cache keys include the versions,
+    so bumping a namespace makes all entries built from the old version unreachable.
+
+    Args:
+        namespaces (list): The namespace names.
+
+    Returns:
+        list: The version numbers, in the order of ``namespaces``.
+    """
+    keys = [version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    return [found.get(key, 1) for key in keys]
+
+
+async def aget_versions(namespaces):
+    """
+    Async version of ``get_versions``.
+    """
+    keys = [version_key(namespace) for namespace in namespaces]
+    found = await cache.aget_many(keys)
+    return [found.get(key, 1) for key in keys]
+
+
+def bump(*namespaces):
+    """
+    Invalidates everything cached under the given namespaces by increasing their versions.
+
+    Args:
+        *namespaces (str): The namespace names.
+
+    Example:
+        >>> bump('articles', 'article:my-first-post')
+    """
+    for namespace in namespaces:
+        increment(version_key(namespace), 2)
+
+
+def increment(key, start, timeout=None):
+    """
+    Increases a counter kept in the shared cache and returns its new value.
+
+    Args:
+        key (str): The cache key of the counter.
+        start (int): The value stored when the counter is missing.
+        timeout (int): How long to keep the counter after this increase, None to keep it forever.
+
+    Returns:
+        int: The new value of the counter.
+
+    ``cache.incr`` keeps the expiry of the key on Redis and Memcached, but the file cache implements it
+    as a get and a set with the default timeout, so the counter is touched afterwards to give it
+    ``timeout`` on every backend.
+
+    Example:
+        >>> increment('article-access:127.0.0.1:*', 1, 900)
+        1
+    """
+    if cache.add(key, start, timeout):
+        return start
+    try:
+        value = cache.incr(key)
+    except ValueError:
+        cache.set(key, start, timeout)
+        return start
+    cache.touch(key, timeout)
+    return value
+
+
+def has_pending_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def is_cacheable(request, response):
+    """
+    Checks whether a response may be shared between anonymous visitors.
+
+    Args:
+        request (HttpRequest): The request that produced the response.
+        response (HttpResponse): The response to check.
+
+    Returns:
+        bool: False for non-200 or streaming responses, responses that set cookies or use
+        the CSRF token, and responses marked ``private`` or ``no-store``.
+    """
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or request.META.get('CSRF_COOKIE_USED'):
+        return False
+    directives = {directive.strip().split('=')[0].lower()
+                  for directive in cc_delim_re.split(response.get('Cache-Control', ''))}
+    return not directives & {'private', 'no-store', 'no-cache'}
+
+
+def revalidate(request, response):
+    """
+    Answers a conditional request with a cached page's own validators.
+
+    Pages built by views decorated with ``BlogStudentsBUT.conditional.conditional_page`` are stored
+    with their ETag and Last-Modified headers, which stay valid as long as the cache entry, so
+    revalidations of cached pages get 304 Not Modified without a query.
+
+    Args:
+        request (HttpRequest): The request, its If-None-Match and If-Modified-Since headers are checked.
+        response (HttpResponse): The cached response.
+
+    Returns:
+        HttpResponse: A 304 response if the visitor already has the page, ``response`` otherwise.
+    """
+    if not response.has_header('ETag') and not response.has_header('Last-Modified'):
+        return response
+    return get_conditional_response(request, etag=response.get('ETag'),
+                                    last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+                                    response=response)
+
+
+def cache_anonymous_page(*namespaces, timeout=None):
+    """
+    Caches a view's full response for anonymous visitors.
+
+    Args:
+        *namespaces (str | callable): The namespaces the page depends on. A callable receives the
+            view's arguments and returns a namespace, e.g. ``lambda request, slug: f'article:{slug}'``.
+        timeout (int): How long to keep the page, defaults to ``CACHE_PAGE_TIMEOUT``.
+
+    Returns:
+        callable: The decorator.
+
+    The decorated view is served from the cache only for GET/HEAD requests of anonymous users
+    without pending flash messages. Async views are wrapped with an async wrapper that uses the
+    async cache API and ``request.auser()``. The cache key is built from the absolute URL and the current
+    versions of the namespaces, so signals invalidate pages precisely by calling ``bump``.
+    Cached pages with validators answer conditional requests themselves, see ``revalidate``.
+
+    Example:
+        @cache_anonymous_page('articles', 'tags')
+        def articles(request):
+            ...
+    """
+    def names_for(request, args, kwargs):
+        return [namespace(request, *args, **kwargs) if callable(namespace) else namespace
+                for namespace in namespaces]
+
+    def page_key(request, names, versions):
+        fingerprint = '|'.join([request.method, request.build_absolute_uri()] +
+                               [f'{name}={version}' for name, version in zip(names, versions)])
+        return 'page:' + hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+
+    def bypasses_cache(request, user):
+        return request.method not in ('GET', 'HEAD') or user.is_authenticated or has_pending_messages(request)
+
+    def page_timeout():
+        return settings.CACHE_PAGE_TIMEOUT if timeout is None else timeout
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if bypasses_cache(request, await request.auser()):
+                    return await view_func(request, *args, **kwargs)
+
+                names = names_for(request, args, kwargs)
+                key = page_key(request, names, await aget_versions(names))
+                response = await cache.aget(key)
+                if response is not None:
+                    return revalidate(request, response)
+
+                response = await view_func(request, *args, **kwargs)
+                if is_cacheable(request, response):
+                    await cache.aset(key, response, page_timeout())
+                return response
+            return async_wrapper
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if bypasses_cache(request, request.user):
+                return view_func(request, *args, **kwargs)
+
+            names = names_for(request, args, kwargs)
+            key = page_key(request, names, get_versions(names))
+            response = cache.get(key)
+            if response is not None:
+                return revalidate(request, response)
+
+            response = view_func(request, *args, **kwargs)
+            if is_cacheable(request, response):
+                cache.set(key, response, page_timeout())
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,169 @@
+import functools
+import hashlib
+import json
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import patch_cache_control, quote_etag
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.http import condition
+
+from BlogStudentsBUT.cache import has_pending_messages
+
+VALIDATORS_ATTR = '_page_validators'
+
+
+def make_etag(*parts):
+    """
+    Hashes the parts of a page state into an entity tag.
+
+    Args:
+        *parts: JSON serializable values, datetimes and UUIDs are converted with ``str``.
+
+    Returns:
+        str: A hex digest, quoted by ``condition`` when it sets the ETag header.
+    """
+    return hashlib.md5(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+
+def latest(*times):
+    """
+    Returns the most recent of the given times, ignoring missing ones.
+
+    Args:
+        *times (datetime | None): Modification times, e.g. of an article and of its latest comment.
+
+    Returns:
+        datetime | None: The latest time, None if no time is given.
+    """
+    times = [time for time in times if time is not None]
+    return max(times) if times else None
+
+
+def visitor_parts(request):
+    """
+    Returns what a page looks like to the current visitor on top of the shown data.
+
+    The navbar shows the unread message count and the forms carry the CSRF token, so a page
+    cached by a browser is only reused by the same user with the same counter and CSRF cookie.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+
+    Returns:
+        list: The user ID, the unread message count and the CSRF cookie.
+    """
+    from users.utils import getUnreadCount
+
+    user = request.user
+    if not user.is_authenticated:
+        return [None, None, request.META.get('CSRF_COOKIE')]
+    return [user.pk, getUnreadCount(user), request.META.get('CSRF_COOKIE')]
+
+
+def if_range_matches(if_range, validators):
+    """
+    Checks whether the If-Range header of a request still names the current version of a page.
+
+    Args:
+        if_range (str): The value of the If-Range header, an entity tag or an HTTP date.
+        validators (tuple | None): The Last-Modified time and the ETag of the current version.
+
+    Returns:
+        bool: True if a Range request may be answered with a part of the current version.
+    """
+    if validators is None:
+        return False
+    last_modified, etag = validators
+    if if_range.startswith(('"', 'W/')):
+        return not if_range.startswith('W/') and if_range == quote_etag(etag)
+    return last_modified is not None and parse_http_date_safe(if_range) == int(last_modified.timestamp())
+
+
+def conditional_page(state_func):
+    """
+    Answers conditional GET requests of a view without running it.
+
+    Args:
+        state_func (callable): Receives the view's arguments and returns the state of the shown data,
+            a tuple of the last modification time and a list of the values the page depends on,
+            or None when the page should always be built (e.g. a missing or private object).
+            It should run a single query that does not touch the rendered rows.
+
+    Returns:
+        callable: The decorator.
+
+    This function performs the following tasks:
+        1. Computes the state once per request for GET and HEAD requests without pending flash messages.
+        2. Builds the ETag from the state and ``visitor_parts``, and uses the modification time as
+           Last-Modified for anonymous visitors, whose pages do not depend on the user.
+        3. Drops the Range header when If-Range names an older version, so resumed downloads get the whole
+           new file instead of a part of it glued to the old one.
+        4. Lets ``django.views.decorators.http.condition`` answer a matching If-None-Match or
+           If-Modified-Since with 304 Not Modified before the view (and the page cache) is called.
+        5. Marks the responses ``max-age=0, must-revalidate``, so browsers and CDNs revalidate every time
+           instead of guessing a freshness lifetime from Last-Modified, and ``private`` for logged-in users.
+
+    The decorator goes inside ``cache_anonymous_page``: pages are cached with their validators and
+    revalidated from the cache without a query, pages that are not cached cost one query for the state.
+    For async views the state is computed in the ORM thread with ``sync_to_async`` before ``condition``
+    reads it, since ``condition`` calls the validator functions synchronously.
+
+    Example:
+        @cache_anonymous_page('tags', lambda request, article_slug: f'article:{article_slug}')
+        @read_from_replica
+        @conditional_page(articleState)
+        def article(request, article_slug):
+            ...
+    """
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, VALIDATORS_ATTR):
+            found = None
+            if request.method in ('GET', 'HEAD') and not has_pending_messages(request):
+                state = state_func(request, *args, **kwargs)
+                if state is not None:
+                    last_modified, parts = state
+                    if request.user.is_authenticated:
+                        last_modified = None
+                    found = (last_modified, make_etag(*parts, *visitor_parts(request)))
+            setattr(request, VALIDATORS_ATTR, found)
+        return getattr(request, VALIDATORS_ATTR)
+
+    def last_modified(request, *args, **kwargs):
+        found = validators(request, *args, **kwargs)
+        return found and found[0]
+
+    def etag(request, *args, **kwargs):
+        found = validators(request, *args, **kwargs)
+        return found and found[1]
+
+    def check_range(request, *args, **kwargs):
+        if_range = request.headers.get('If-Range')
+        if if_range and 'HTTP_RANGE' in request.META and not if_range_matches(
+                if_range.strip(), validators(request, *args, **kwargs)):
+            del request.META['HTTP_RANGE']
+
+    def mark_revalidated(request, response):
+        if getattr(request, VALIDATORS_ATTR, None) is not None and response.status_code in (200, 206, 304):
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+        return response
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view_func)
+
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                await sync_to_async(validators)(request, *args, **kwargs)
+                check_range(request, *args, **kwargs)
+                return mark_revalidated(request, await conditional_view(request, *args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            check_range(request, *args, **kwargs)
+            return mark_revalidated(request, conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
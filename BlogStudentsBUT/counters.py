@@ -0,0 +1,30 @@
+def fields_to_save(instance, counters, update_fields=None, force_insert=False, **kwargs):
+    """
+    Returns the fields a ``save`` of a model with counter fields should write.
+
+    Counters, like ``Article.total_votes``, are only changed with atomic F() updates by the signals.
+    A full ``save`` of an object loaded before such an update would write the stale value back, e.g.
+    an article edited while a comment is posted would lose that comment in its count. So the save of
+    an existing object writes every loaded field except the counters, unless it names its fields.
+
+    Args:
+        instance (Model): The object being saved.
+        counters (tuple): The names of its counter fields.
+        update_fields (iterable | None): The fields passed to ``save``, if any.
+        force_insert (bool): The ``force_insert`` argument of ``save``.
+        **kwargs: The other arguments of ``save``, ignored.
+
+    Returns:
+        list | None: The fields to pass to ``Model.save`` as ``update_fields``. New objects, forced
+        inserts and saves naming their fields are left unchanged.
+
+    Example:
+        def save(self, *args, **kwargs):
+            kwargs['update_fields'] = fields_to_save(self, ('total_votes',), **kwargs)
+            super().save(*args, **kwargs)
+    """
+    if update_fields is not None or force_insert or instance._state.adding:
+        return update_fields
+    deferred = instance.get_deferred_fields()
+    return [field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in counters and field.attname not in deferred]
@@ -0,0 +1,73 @@
+# SQLite settings for serving the site from several worker threads and processes.
+# settings.py imports this module, so it must not import anything that needs configured settings.
+
+# Pragmas run on every new connection.
+#   journal_mode=WAL   readers no longer block the writer and the writer no longer blocks readers.
+#   synchronous=NORMAL is safe with WAL and avoids an fsync on every commit.
+#   mmap_size          lets readers map the database file instead of copying pages.
+#   temp_store=MEMORY  keeps sorts and temporary indexes out of temporary files.
+#   cache_size         is negative, i.e. in KiB instead of pages.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'cache_size': -16 * 1024,
+}
+
+# Seconds a connection waits for a lock held by another writer before raising "database is locked".
+SQLITE_BUSY_TIMEOUT = 20
+
+# Seconds a connection is kept open between requests.
+SQLITE_CONN_MAX_AGE = 600
+
+
+def init_command(pragmas=None):
+    """
+    Builds the statements run on every new SQLite connection.
+
+    Args:
+        pragmas (dict): The pragmas to set, defaults to ``SQLITE_PRAGMAS``.
+
+    Returns:
+        str: The PRAGMA statements separated by semicolons.
+    """
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
+def sqlite_database(name, read_only=False, **overrides):
+    """
+    Builds a ``DATABASES`` entry for an SQLite file tuned for concurrent access.
+
+    Args:
+        name (str | Path): The path of the database file.
+        read_only (bool): Whether connections refuse writes (``PRAGMA query_only``), used for replicas.
+        **overrides: Keys replacing the defaults of the entry, e.g. ``CONN_MAX_AGE=0``.
+
+    Returns:
+        dict: The database settings.
+
+    The entry performs the following tasks:
+        1. Runs the pragmas of ``SQLITE_PRAGMAS`` on every new connection (WAL, synchronous=NORMAL, mmap).
+        2. Waits up to ``SQLITE_BUSY_TIMEOUT`` seconds for locks instead of failing at once.
+        3. Starts transactions with BEGIN IMMEDIATE, so a transaction that reads before it writes
+           takes the write lock up front and cannot fail with "database is locked" halfway through.
+        4. Keeps connections open for ``SQLITE_CONN_MAX_AGE`` seconds and checks them before reuse.
+
+    Example:
+        DATABASES = {'default': sqlite_database(BASE_DIR / 'db.sqlite3')}
+    """
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': init_command({**SQLITE_PRAGMAS, 'query_only': 'ON'} if read_only else None),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        },
+    }
+    database.update(overrides)
+    return database
@@ -0,0 +1,294 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from django.db.models import Q
+
+
+class CursorPage:
+    """
+    A page of objects returned by ``CursorPaginator``.
+
+    It mirrors the parts of Django's ``Page`` that the templates use, so ``pagination.html``
+    can render it with ``previous_cursor``/``next_cursor`` links instead of page numbers.
+
+    Attributes:
+        object_list (list): The objects on this page.
+        paginator (CursorPaginator): The paginator that produced the page.
+        next_cursor (str): The token of the following page, or None on the last page.
+        previous_cursor (str): The token of the preceding page, or None on the first page.
+        is_cursor (bool): Always True, lets templates tell cursor pages from numbered pages.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def approximate_count(self):
+        return self.paginator.approximate_count()
+
+
+class CursorPaginator:
+    """
+    Paginates a queryset by keyset instead of by offset.
+
+    Every page is fetched with ``WHERE (created, id) > (last seen) ORDER BY created, id LIMIT n``,
+    so deep pages cost the same as the first one and no ``COUNT(*)`` is needed. The tokens stay
+    valid when rows are added or removed, because they point at a row position, not at an offset.
+
+    Attributes:
+        queryset (QuerySet): The queryset to paginate.
+        per_page (int): The number of objects on each page.
+        keys (tuple): The fields that define the order, prefix a field with '-' for descending order.
+            The last field must be unique.
+        count_limit (int): The number of rows after which ``approximate_count`` stops counting.
+    """
+
+    def __init__(self, queryset, per_page, keys=('created', 'id'), count_limit=10000):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+        self.count_limit = count_limit
+        self.names = [key.lstrip('-') for key in self.keys]
+
+    def approximate_count(self):
+        """
+        Counts the rows, but stops at ``count_limit`` so the query stays cheap on large tables.
+
+        Returns:
+            int: The number of rows, or ``count_limit`` if there are at least that many.
+        """
+        return self.queryset.order_by()[:self.count_limit].count()
+
+    def encode_cursor(self, direction, obj):
+        values = []
+        for name in self.names:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        data = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Decodes a page token.
+
+        Args:
+            cursor (str): The token taken from the request.
+
+        Returns:
+            tuple: The direction ('next' or 'previous') and the list of key values,
+            or None if the token is missing or malformed.
+        """
+        if not cursor:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, raw_values = json.loads(data)
+            if direction not in ('next', 'previous') or len(raw_values) != len(self.names):
+                return None
+            model = self.queryset.model
+            values = [model._meta.get_field(name).to_python(value) for name, value in zip(self.names, raw_values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return None
+        return direction, values
+
+    def _ordering(self, reverse):
+        if not reverse:
+            return self.keys
+        return tuple(key[1:] if key.startswith('-') else '-' + key for key in self.keys)
+
+    def _beyond(self, values, reverse):
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            lookup = 'gt' if key.startswith('-') == reverse else 'lt'
+            step = Q(**{f'{self.names[index]}__{lookup}': values[index]})
+            for name, value in zip(self.names[:index], values[:index]):
+                step &= Q(**{name: value})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None, number=None):
+        """
+        Returns the page that a token points to.
+
+        Args:
+            cursor (str): The token from a previous page, or None for the first page.
+                Malformed tokens are treated as None.
+            number (str): A page number, used when there is no token, e.g. from a link made while the
+                listing still had numbered pages. Invalid numbers are treated as 1.
+
+        Returns:
+            CursorPage: The requested page.
+
+        This method performs the following tasks:
+            1. Decodes the token into a direction and a row position.
+            2. Fetches one more row than needed beyond that position, in reverse order when going back.
+               Without a token, skips the rows of the pages before ``number`` with an OFFSET instead.
+            3. Uses the extra row to decide whether there is a page further in the same direction.
+            4. Builds the tokens of the next and previous pages from the first and last rows, so the
+               pages after a numbered one are fetched by keyset again.
+        """
+        decoded = self.decode_cursor(cursor)
+        if decoded is None and number is not None:
+            queryset, offset = self._numbered_window(number)
+            rows = list(queryset)
+            if not rows and offset:
+                return self._build_page(list(self._last_window()), True, False)
+            return self._build_page(rows, False, offset > 0)
+        queryset, values, reverse = self._window(decoded)
+        return self._build_page(list(queryset), reverse, values is not None)
+
+    async def apage(self, cursor=None, number=None):
+        """
+        Async version of ``page``, fetches the rows with async iteration.
+        """
+        decoded = self.decode_cursor(cursor)
+        if decoded is None and number is not None:
+            queryset, offset = self._numbered_window(number)
+            rows = [obj async for obj in queryset]
+            if not rows and offset:
+                return self._build_page([obj async for obj in self._last_window()], True, False)
+            return self._build_page(rows, False, offset > 0)
+        queryset, values, reverse = self._window(decoded)
+        return self._build_page([obj async for obj in queryset], reverse, values is not None)
+
+    def _window(self, decoded):
+        direction, values = decoded if decoded else ('next', None)
+        reverse = direction == 'previous'
+
+        queryset = self.queryset.order_by(*self._ordering(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._beyond(values, reverse))
+        return queryset[:self.per_page + 1], values, reverse
+
+    def _numbered_window(self, number):
+        try:
+            offset = (max(int(number), 1) - 1) * self.per_page
+        except (TypeError, ValueError):
+            offset = 0
+        return self.queryset.order_by(*self.keys)[offset:offset + self.per_page + 1], offset
+
+    def _last_window(self):
+        # Page numbers past the end get the last page, like Django's numbered pages.
+        return self.queryset.order_by(*self._ordering(True))[:self.per_page + 1]
+
+    def _build_page(self, rows, reverse, beyond):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        has_next = has_more if not reverse else beyond
+        has_previous = beyond if not reverse else has_more
+        next_cursor = self.encode_cursor('next', rows[-1]) if rows and has_next else None
+        previous_cursor = self.encode_cursor('previous', rows[0]) if rows and has_previous else None
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+def use_cursor_pagination(request, queryset, results):
+    """
+    Decides whether a listing should switch from page numbers to cursor pagination.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        queryset (QuerySet): The queryset to be paginated.
+        results (int): The number of objects to display per page.
+
+    Returns:
+        bool: True if the listing should use ``CursorPaginator``.
+
+    This function performs the following tasks:
+        1. Keeps page numbers for querysets with an explicit order (e.g. ranked search results),
+           because cursor pagination re-orders the rows by creation time.
+        2. Uses cursor pagination when the request already carries a 'cursor' parameter.
+        3. Otherwise counts at most ``PAGINATION_CURSOR_THRESHOLD`` pages of rows and uses cursor
+           pagination only if there are more, so small result sets keep the numbered pages.
+    """
+    if queryset.query.order_by:
+        return False
+    if request.GET.get('cursor'):
+        return True
+    limit = settings.PAGINATION_CURSOR_THRESHOLD * results
+    return queryset.order_by()[:limit + 1].count() > limit
+
+
+async def ause_cursor_pagination(request, queryset, results):
+    """
+    Async version of ``use_cursor_pagination``.
+    """
+    if queryset.query.order_by:
+        return False
+    if request.GET.get('cursor'):
+        return True
+    limit = settings.PAGINATION_CURSOR_THRESHOLD * results
+    return await queryset.order_by()[:limit + 1].acount() > limit
+
+
+async def apaginate(request, queryset, results):
+    """
+    Paginates a queryset with the async ORM, for the async views.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        queryset (QuerySet): The queryset to be paginated.
+        results (int): The number of objects to display per page.
+
+    Returns:
+        tuple: A tuple containing:
+            - custom_range (range): A range of page numbers for pagination controls.
+            - page (Page | CursorPage): The current page, its ``object_list`` is already fetched.
+
+    This function performs the following tasks:
+        1. Switches to cursor pagination like ``paginateArticles`` and ``paginateProfiles`` do
+           and fetches the page with ``CursorPaginator.apage``.
+        2. Otherwise counts the rows with ``acount()``, picks the requested page (the first page
+           for a missing or invalid number, the last page for a number out of range) and fetches
+           its rows with async iteration, so rendering the template runs no query for them.
+        3. Calculates the range of page numbers to display in pagination controls, the same way
+           as the sync helpers.
+
+    Example:
+        >>> custom_range, articles = await apaginate(request, articles, 6)
+    """
+    if await ause_cursor_pagination(request, queryset, results):
+        paginator = CursorPaginator(queryset, results, keys=('created', 'id'))
+        return range(0), await paginator.apage(request.GET.get('cursor'), request.GET.get('page'))
+
+    paginator = Paginator(queryset, results)
+    paginator.count = await queryset.acount()
+    try:
+        page = paginator.page(request.GET.get('page'))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    page.object_list = [obj async for obj in page.object_list]
+
+    leftIndex = max(page.number - 4, 1)
+    rightIndex = min(page.number + 5, paginator.num_pages + 1)
+    return range(leftIndex, rightIndex), page
@@ -0,0 +1,168 @@
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_patch_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    The measurements collected while one request is handled.
+
+    Attributes:
+        queries (list): The executed SQL statements as (sql, params, seconds) tuples.
+        template_time (float): The seconds spent rendering templates.
+        template_depth (int): The nesting depth of the template being rendered, included
+            templates are counted as part of their parent.
+    """
+    def __init__(self):
+        self.queries = []
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def duplicates(self):
+        """
+        Counts the statements that ran more than once with the same parameters.
+
+        Returns:
+            int: The number of executions that repeated an earlier identical query.
+        """
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        return sum(count - 1 for count in counts.values())
+
+    def repeated(self, threshold):
+        """
+        Finds statements that ran many times with different parameters, the usual sign of an N+1 query.
+
+        Args:
+            threshold (int): The number of executions from which a statement is reported.
+
+        Returns:
+            list: (sql, count) tuples, the most frequent statement first.
+        """
+        counts = Counter(sql for sql, _, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+
+def instrument_templates():
+    """
+    Wraps ``Template.render`` once so template rendering time is added to the active profile.
+    """
+    with _patch_lock:
+        if getattr(Template.render, 'profiled', False):
+            return
+        original = Template.render
+
+        @functools.wraps(original)
+        def render(self, context):
+            profile = getattr(_state, 'profile', None)
+            if profile is None:
+                return original(self, context)
+            profile.template_depth += 1
+            start = time.perf_counter()
+            try:
+                return original(self, context)
+            finally:
+                profile.template_depth -= 1
+                if profile.template_depth == 0:
+                    profile.template_time += time.perf_counter() - start
+
+        render.profiled = True
+        Template.render = render
+
+
+class ProfilingMiddleware:
+    """
+    Measures SQL queries, template rendering and total time of sampled requests.
+
+    The results are added to the response as a ``Server-Timing`` header, which browsers show in their
+    developer tools, and logged as one JSON line on the 'BlogStudentsBUT.profiling' logger.
+
+    The middleware is enabled with ``PROFILING_ENABLED`` and profiles the share of requests given by
+    ``PROFILING_SAMPLE_RATE``. When it is disabled, Django removes it from the middleware chain.
+    The middleware is synchronous only, so with profiling enabled Django runs the async views
+    in a thread under ASGI, as the database wrappers are installed per thread.
+
+    Example:
+        Server-Timing: db;dur=4.21;desc="9 queries, 0 duplicates", tpl;dur=11.8, total;dur=19.5
+    """
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        _state.profile = profile
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _state.profile = None
+        total = time.perf_counter() - start
+
+        self.report(request, response, profile, total)
+        return response
+
+    def report(self, request, response, profile, total):
+        """
+        Adds the ``Server-Timing`` header to the response and logs the measurements.
+
+        Args:
+            request (HttpRequest): The profiled request.
+            response (HttpResponse): The response of the view.
+            profile (RequestProfile): The collected measurements.
+            total (float): The seconds spent handling the request.
+        """
+        duplicates = profile.duplicates()
+        repeated = profile.repeated(settings.PROFILING_REPEATED_QUERY_THRESHOLD)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.db_time * 1000:.2f};desc="{len(profile.queries)} queries, {duplicates} duplicates"',
+            f'tpl;dur={profile.template_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': len(profile.queries),
+            'duplicates': duplicates,
+            'repeated': [{'sql': sql, 'count': count} for sql, count in repeated[:5]],
+            'db_ms': round(profile.db_time * 1000, 2),
+            'template_ms': round(profile.template_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }))
@@ -0,0 +1,105 @@
+import os
+import re
+
+from django.http import FileResponse, HttpResponse
+
+RANGE_RE = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$', re.IGNORECASE)
+
+
+class RangeFileWrapper:
+    """
+    A read-only view of a byte range of an open file.
+
+    ``FileResponse`` streams it in blocks like a regular file, so a range of a large file
+    is never loaded into memory. It has no ``fileno``, which keeps servers from sending
+    the whole file with ``sendfile``.
+
+    Attributes:
+        remaining (int): The number of bytes left to read.
+    """
+    def __init__(self, filelike, start, length):
+        self.filelike = filelike
+        self.filelike.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.filelike.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.filelike.close()
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range ``Range`` header.
+
+    Args:
+        header (str): The value of the Range header, e.g. 'bytes=0-1023' or 'bytes=-500'.
+        size (int): The size of the file in bytes.
+
+    Returns:
+        tuple | None: The first and last byte positions (inclusive), None if the header is
+        missing, malformed or asks for several ranges (the whole file is served then).
+
+    Raises:
+        ValueError: If the range lies outside the file.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = size - 1 if last == '' else min(int(last), size - 1)
+    if first >= size or first > last:
+        raise ValueError('Range not satisfiable')
+    return first, last
+
+
+def ranged_file_response(request, path, **kwargs):
+    """
+    Serves a file with support for single byte-range requests.
+
+    Args:
+        request (HttpRequest): The request, its Range header selects the part of the file.
+        path (str): The path of the file to serve.
+        **kwargs: Passed to ``FileResponse``, e.g. ``as_attachment`` and ``filename``.
+
+    Returns:
+        FileResponse | HttpResponse: A 200 response with the whole file, a 206 response with the
+        requested range or a 416 response if the range lies outside the file.
+
+    This function performs the following tasks:
+        1. Parses the Range header of GET requests, other requests get the whole file.
+        2. Streams the whole file, or only the requested range through ``RangeFileWrapper``,
+           in blocks, so memory use does not depend on the file size.
+        3. Advertises range support with the ``Accept-Ranges`` header.
+    """
+    size = os.path.getsize(path)
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size) if request.method == 'GET' else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    filelike = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(filelike, **kwargs)
+    else:
+        first, last = byte_range
+        response = FileResponse(RangeFileWrapper(filelike, first, last - first + 1), status=206, **kwargs)
+        response['Content-Length'] = str(last - first + 1)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
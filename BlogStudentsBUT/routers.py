@@ -0,0 +1,150 @@
+import contextvars
+import functools
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PRIMARY = 'default'
+
+# Apps whose tables are always read from the primary. The job queue changes while it is read,
+# a replica would hand out jobs that are already running or finished.
+PRIMARY_APPS = {'tasks'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_pinned = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+def replica_alias():
+    """
+    Picks the database alias that reads of the current request go to.
+
+    Returns:
+        str: A random alias of ``DATABASE_REPLICAS`` inside views decorated with ``read_from_replica``,
+        ``'default'`` otherwise, when no replicas are configured or when the client is pinned
+        to the primary database after a write.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or not _replica_reads.get() or _pinned.get():
+        return PRIMARY
+    return random.choice(replicas)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of read-heavy views to the replica databases and everything else to the primary.
+
+    Only views decorated with ``read_from_replica`` read from a replica, so sessions, authentication
+    and forms keep reading from the primary, as do the apps of ``PRIMARY_APPS``. Writes and migrations always use the primary; the replicas
+    are copies of it (see the ``sync_replicas`` command).
+    """
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def read_from_replica(view_func):
+    """
+    Lets a view read from the replica databases.
+
+    The user is loaded before switching, so the session and the account are always read from
+    the primary and a fresh login is never lost to replication lag. For async views the user is
+    loaded with ``request.auser()`` and stored on ``request.user``, so templates rendered later
+    do not load it again.
+
+    Args:
+        view_func (callable): The view to decorate.
+
+    Returns:
+        callable: The decorated view.
+
+    Example:
+        @read_from_replica
+        def articles(request):
+            ...
+    """
+    if iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if hasattr(request, 'auser'):
+                request.user = await request.auser()
+            token = _replica_reads.set(True)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if hasattr(request, 'user'):
+            request.user.is_authenticated
+        token = _replica_reads.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaPinningMiddleware:
+    """
+    Gives clients read-your-writes consistency while the replicas catch up.
+
+    A request with an unsafe method (e.g. a POST) reads from the primary and sets a cookie that keeps
+    the client's reads on the primary for the next ``REPLICA_PIN_SECONDS`` seconds, so the page shown
+    after a redirect already contains the change.
+
+    The middleware supports both WSGI and ASGI, so async views are not pushed into a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = self.is_write(request)
+        token = _pinned.set(writes or settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.pin(writes, response)
+
+    async def __acall__(self, request):
+        writes = self.is_write(request)
+        token = _pinned.set(writes or settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.pin(writes, response)
+
+    @staticmethod
+    def is_write(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    @staticmethod
+    def pin(writes, response):
+        if writes and settings.DATABASE_REPLICAS:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 import os
 
+from BlogStudentsBUT.database import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,11 +41,14 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'articles.apps.ArticlesConfig',
     'users.apps.UsersConfig',
+    'tasks.apps.TasksConfig',
     'captcha',
 ]
 
 MIDDLEWARE = [
+    'BlogStudentsBUT.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'BlogStudentsBUT.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,6 +72,10 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'users.context_processors.unread_messages_count',
             ],
+            'libraries': {
+                'thumbnails': 'BlogStudentsBUT.templatetags.thumbnails',
+                'cache_versions': 'BlogStudentsBUT.templatetags.cache_versions',
+            },
         },
     },
 ]
@@ -77,13 +86,70 @@ WSGI_APPLICATION = 'BlogStudentsBUT.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite runs in WAL mode with a busy timeout and persistent connections,
+# see BlogStudentsBUT/database.py. The DATABASE_PATH environment variable points the site
+# at another database file, e.g. the seeded copy served by `manage.py benchmark_servers`.
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3')),
 }
 
+# Read replicas
+# Views decorated with BlogStudentsBUT.routers.read_from_replica read from a random alias of
+# DATABASE_REPLICAS. After a POST the client reads from 'default' for REPLICA_PIN_SECONDS seconds.
+# To try it locally, add copies of db.sqlite3 and refresh them with `python manage.py sync_replicas`:
+#
+# DATABASES['replica1'] = sqlite_database(BASE_DIR / 'db.replica1.sqlite3', read_only=True,
+#                                         TEST={'MIRROR': 'default'})
+# DATABASE_REPLICAS = ['replica1']
+
+DATABASE_ROUTERS = ['BlogStudentsBUT.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Full pages are cached for anonymous visitors and invalidated by model signals,
+# see BlogStudentsBUT/cache.py.
+#
+# The cache must be shared by every process serving the site: a signal bumps a namespace in the
+# process that saved the model, and the management commands run in processes of their own.
+# By default the entries are files under CACHE_DIR. Set CACHE_URL to use a cache server instead:
+#   redis://127.0.0.1:6379/0      needs the redis package
+#   memcached://127.0.0.1:11211   needs the pymemcache package
+
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHE_DIR = os.environ.get('CACHE_DIR', BASE_DIR / 'cache')
+
+if CACHE_URL.startswith('redis://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_URL.removeprefix('memcached://'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
+    }
+
+CACHE_PAGE_TIMEOUT = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -124,10 +190,151 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
+
+# `python manage.py collectstatic` copies the static files to STATIC_ROOT. Outside DEBUG the copies get
+# content-hashed names and gzip/brotli variants (see BlogStudentsBUT/staticfiles.py), so they can be cached
+# forever. The WSGI application serves STATIC_ROOT itself with far-future cache headers; set the
+# SERVE_STATIC_FILES=0 environment variable when a front proxy serves it. Files without a hashed name
+# are cached for STATIC_MAX_AGE seconds. Brotli variants need the optional brotli package.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+                    else 'BlogStudentsBUT.staticfiles.CompressedManifestStaticFilesStorage'),
+    },
+}
+
+SERVE_STATIC_FILES = os.environ.get('SERVE_STATIC_FILES', '1') == '1'
+STATIC_MAX_AGE = 60
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Image uploads
+# Images uploaded through ArticleForm and ProfileForm are re-encoded without their EXIF data,
+# scaled down to fit UPLOAD_IMAGE_MAX_SIZE and stored in the smallest of UPLOAD_IMAGE_FORMATS
+# the installed Pillow can write (see BlogStudentsBUT/uploads.py). Images with more than
+# UPLOAD_IMAGE_MAX_PIXELS pixels are rejected before they are decoded.
+UPLOAD_IMAGE_MAX_SIZE = (2048, 2048)
+UPLOAD_IMAGE_MAX_PIXELS = 40_000_000
+UPLOAD_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+# PDF rendering
+# Rendered article PDFs are cached on disk per article version and rendered by background jobs.
+# With PDF_PRERENDER, saving an article queues the rendering of its new version right away.
+
+PDF_CACHE_ROOT = os.path.join(BASE_DIR, 'pdf_cache')
+PDF_PRERENDER = True
+
+# Background tasks
+# PDF renders, image variants and copying profile changes to the User are stored as jobs in the
+# database (tasks.models.Job) and run by `python manage.py run_tasks --workers 2`. With TASKS_EAGER
+# the jobs run right away in the process that queues them, so development and tests need no worker.
+# It is only on by default with DEBUG: a deployment queues the jobs and needs the workers running.
+# The TASKS_EAGER environment variable (1 or 0) overrides the default. Running jobs that are not finished
+# after TASKS_LOCK_TIMEOUT seconds are treated as abandoned by a crashed worker and queued again.
+
+TASKS_EAGER = os.environ.get('TASKS_EAGER', '1' if DEBUG else '0') == '1'
+TASKS_POLL_INTERVAL = 1
+TASKS_LOCK_TIMEOUT = 600
+
+# Pagination
+# Listings in their natural order switch from page numbers to cursor pagination
+# once they have more than this many pages.
+
+PAGINATION_CURSOR_THRESHOLD = 20
+
+# Article pages show the first REVIEWS_PER_PAGE comments, the following ones are loaded on demand
+# from the article's comments endpoint.
+REVIEWS_PER_PAGE = 20
+
+# Profile search
+# Profiles are found by the trigrams of the words of their name and skill names (see users/search.py),
+# so typos are tolerated. A word matches a query word when it contains at least this share of its trigrams.
+
+PROFILE_SEARCH_THRESHOLD = 0.5
+
+# Autocomplete
+# The autocomplete endpoint suggests up to AUTOCOMPLETE_LIMIT articles, faculties, profiles and skills
+# per query from in-memory prefix indexes (see BlogStudentsBUT/autocomplete.py). Browsers and proxies
+# may reuse an answer for AUTOCOMPLETE_MAX_AGE seconds.
+
+AUTOCOMPLETE_LIMIT = 5
+AUTOCOMPLETE_MAX_AGE = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Private articles
+# Password attempts are limited per IP address and article and per IP address within the
+# throttle window. The counters are kept in the shared cache, so the limits apply to the whole site
+# rather than to each worker process, and each failed attempt restarts the window.
+# A correct password grants a signed access token valid for PRIVATE_ARTICLE_TOKEN_AGE seconds.
+
+PRIVATE_ARTICLE_ATTEMPTS = 5
+PRIVATE_ARTICLE_IP_ATTEMPTS = 20
+PRIVATE_ARTICLE_THROTTLE_WINDOW = 900
+PRIVATE_ARTICLE_TOKEN_AGE = 3600
+
+# Messages
+# How long the unread message count shown in the navigation bar is cached. Saving or deleting
+# a message drops the cached count of its recipient right away, in every process, since the count
+# is kept in the shared cache. The timeout only bounds changes made without the Message signals.
+
+UNREAD_COUNT_TIMEOUT = 300
+
+# Benchmarks
+# Results of `python manage.py benchmark_routes --update-baseline`, the benchmark fails
+# when a route gets slower, bigger or runs more queries than recorded here.
+
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+# Async views
+# Serve the article listings, article pages, profile listing and profile pages with the views of
+# articles.async_views and users.async_views. Enable it when the site runs under an ASGI server
+# (uvicorn BlogStudentsBUT.asgi:application); under WSGI every async view gets its own event loop,
+# which makes it slower than the sync view. Set from the ASYNC_VIEWS=1 environment variable.
+
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+# Profiling
+# ProfilingMiddleware adds a Server-Timing header and logs a JSON line with the SQL count,
+# duplicate queries, DB, template and total time of the sampled share of requests.
+# Statements repeated PROFILING_REPEATED_QUERY_THRESHOLD times in one request are logged as likely N+1 queries.
+
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 1.0
+PROFILING_REPEATED_QUERY_THRESHOLD = 5
+
+# Logging
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+# The profiling lines and the failures of background jobs are logged at INFO on the console,
+# Python's default configuration would only show warnings. Add a handler here to keep them in a file.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'BlogStudentsBUT.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'tasks.queue': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
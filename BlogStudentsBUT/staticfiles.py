@@ -0,0 +1,179 @@
+import gzip
+import json
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, only gzip variants are written without it.
+    brotli = None
+
+# Text formats worth compressing, images and fonts are compressed already.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico')
+
+# Encodings in the order they are preferred, with the suffix of their precompressed variant.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+FAR_FUTURE = 60 * 60 * 24 * 365
+
+
+def compress_file(path, min_size=200):
+    """
+    Writes gzip and, when the brotli package is installed, brotli variants next to a file.
+
+    Args:
+        path (str): The path of the file to compress.
+        min_size (int): Files smaller than this many bytes are not compressed.
+
+    Returns:
+        list: The paths of the written variants. A variant is only kept when it is smaller than the file.
+    """
+    with open(path, 'rb') as source:
+        content = source.read()
+    if len(content) < min_size:
+        return []
+
+    variants = [(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((path + '.br', brotli.compress(content)))
+
+    written = []
+    for variant_path, compressed in variants:
+        if len(compressed) < len(content):
+            with open(variant_path, 'wb') as variant:
+                variant.write(compressed)
+            written.append(variant_path)
+    return written
+
+
+def read_blocks(filelike, block_size=8192):
+    with filelike:
+        while block := filelike.read(block_size):
+            yield block
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files storage that content-hashes file names and precompresses text files.
+
+    ``collectstatic`` copies every file to ``STATIC_ROOT``, stores a copy named after the hash of its
+    content (e.g. ``styles/app.3f2a1c9b.css``), rewrites the references between CSS files to the hashed
+    names and records them in ``staticfiles.json``. The ``{% static %}`` tag then links to the hashed
+    names, which never change content and can be cached forever. Afterwards ``.gz`` and ``.br``
+    variants of the text files are written for ``StaticFilesApplication`` or a front proxy to serve.
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for name in paths:
+            for stored in {name, self.stored_name(name)}:
+                if stored.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                    compress_file(self.path(stored))
+
+
+class StaticFilesApplication:
+    """
+    A WSGI middleware serving the collected static files, for deployments without a front proxy.
+
+    Requests under ``STATIC_URL`` are answered from ``STATIC_ROOT`` before they reach Django, every
+    other request is passed to the wrapped application.
+
+    Attributes:
+        application (callable): The wrapped WSGI application.
+        root (str): The directory the files are served from.
+        prefix (str): The URL path of the static files, e.g. '/static/'.
+        immutable (set): The hashed names listed in the manifest, served with far-future cache headers.
+
+    This class performs the following tasks:
+        1. Picks the brotli or gzip variant of the file when the client accepts it and one was written
+           by ``CompressedManifestStaticFilesStorage``, and adds ``Vary: Accept-Encoding``.
+        2. Serves hashed names with ``Cache-Control: public, max-age=31536000, immutable`` and other files
+           with ``STATIC_MAX_AGE``, with an ETag and Last-Modified to answer revalidations with 304.
+        3. Streams the file with the server's ``wsgi.file_wrapper`` when there is one.
+
+    Example:
+        application = StaticFilesApplication(get_wsgi_application())
+    """
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = os.path.abspath(root or settings.STATIC_ROOT)
+        prefix = prefix or settings.STATIC_URL
+        self.prefix = '/' + prefix.strip('/') + '/'
+        self.immutable = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.root, 'staticfiles.json'), encoding='utf-8') as manifest:
+                return set(json.load(manifest).get('paths', {}).values())
+        except (OSError, ValueError):
+            return set()
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD') and path.startswith(self.prefix):
+            name = self.resolve(path[len(self.prefix):])
+            if name is not None:
+                return self.serve(name, environ, start_response)
+        return self.application(environ, start_response)
+
+    def resolve(self, name):
+        """
+        Returns the normalized name of a static file, None if it does not exist or lies outside the root.
+        """
+        name = posixpath.normpath(unquote(name)).lstrip('/')
+        if name.startswith('..') or name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+            return None
+        path = os.path.join(self.root, name)
+        if not os.path.isfile(path):
+            return None
+        return name
+
+    def serve(self, name, environ, start_response):
+        path = os.path.join(self.root, name)
+        accepted = environ.get('HTTP_ACCEPT_ENCODING', '')
+        encoding = None
+        compressible = name.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+        if compressible:
+            for candidate, suffix in ENCODINGS:
+                if candidate in accepted and os.path.isfile(path + suffix):
+                    encoding, path = candidate, path + suffix
+                    break
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        if name in self.immutable:
+            cache_control = f'public, max-age={FAR_FUTURE}, immutable'
+        else:
+            cache_control = f'public, max-age={settings.STATIC_MAX_AGE}'
+        headers = [('Cache-Control', cache_control), ('ETag', etag), ('Last-Modified', last_modified)]
+        if compressible:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if_none_match = parse_etags(environ.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            start_response('304 Not Modified', headers)
+            return []
+
+        content_type, _ = mimetypes.guess_type(name)
+        headers += [('Content-Type', content_type or 'application/octet-stream'),
+                    ('Content-Length', str(stat.st_size))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        filelike = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(filelike, 8192)
+        return read_blocks(filelike)
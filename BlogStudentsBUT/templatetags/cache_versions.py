@@ -0,0 +1,19 @@
+from django import template
+
+from BlogStudentsBUT.cache import get_versions
+
+register = template.Library()
+
+
+@register.simple_tag
+def cache_version(*namespaces):
+    """
+    Returns a token made of the current versions of cache namespaces, for use as a
+    ``{% cache %}`` fragment key so that the fragments follow the model signals.
+
+    Example:
+        {% load cache cache_versions %}
+        {% cache_version 'articles' 'tags' as listing_version %}
+        {% cache 600 article_card article.id listing_version %} ... {% endcache %}
+    """
+    return '.'.join(str(version) for version in get_versions(namespaces))
@@ -0,0 +1,17 @@
+from django import template
+
+from BlogStudentsBUT import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image, variant):
+    """
+    Returns the URL of a size variant of an image, see ``BlogStudentsBUT.thumbnails.VARIANTS``.
+
+    Example:
+        {% load thumbnails %}
+        <img src="{% thumbnail_url article.image 'card' %}" />
+    """
+    return thumbnails.thumbnail_url(image, variant)
@@ -0,0 +1,172 @@
+import io
+import logging
+import os
+import threading
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Size variants of uploaded images. 'crop' variants are cut to the exact size (avatars),
+# the others are scaled down to fit inside the box. The 'pdf' variant targets an A4 page
+# at 150 DPI and is always JPEG, because xhtml2pdf cannot embed WebP or AVIF.
+VARIANTS = {
+    'card': {'size': (640, 400), 'crop': False, 'formats': ('AVIF', 'WEBP', 'JPEG')},
+    'avatar': {'size': (256, 256), 'crop': True, 'formats': ('AVIF', 'WEBP', 'JPEG')},
+    'pdf': {'size': (1240, 1754), 'crop': False, 'formats': ('JPEG',)},
+}
+
+EXTENSIONS = {'AVIF': 'avif', 'WEBP': 'webp', 'JPEG': 'jpg'}
+QUALITY = {'AVIF': 60, 'WEBP': 80, 'JPEG': 82}
+
+_resolved = {}
+_lock = threading.Lock()
+
+
+def available_formats(formats):
+    """
+    Filters output formats down to the ones the installed Pillow can encode.
+
+    Args:
+        formats (tuple): Pillow format names in order of preference.
+
+    Returns:
+        list: The supported format names.
+    """
+    return [name for name in formats if name == 'JPEG' or features.check(name.lower())]
+
+
+def variant_names(name, variant):
+    """
+    Lists the storage names a variant of an image can have, one per output format.
+
+    The variant is stored next to the original, e.g. ``article_img/photo.jpg`` becomes
+    ``article_img/photo.card.webp``.
+
+    Args:
+        name (str): The storage name of the original image.
+        variant (str): A key of ``VARIANTS``.
+
+    Returns:
+        list: The candidate storage names.
+    """
+    root, _ = os.path.splitext(name)
+    return [f'{root}.{variant}.{EXTENSIONS[fmt]}' for fmt in available_formats(VARIANTS[variant]['formats'])]
+
+
+def encode(image, fmt):
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=QUALITY[fmt], optimize=fmt == 'JPEG')
+    return buffer.getvalue()
+
+
+def create_variant(name, variant, storage=default_storage):
+    """
+    Creates one size variant of an image and saves it next to the original.
+
+    The image is encoded in every supported format of the variant and the smallest file is kept.
+
+    Args:
+        name (str): The storage name of the original image.
+        variant (str): A key of ``VARIANTS``.
+        storage (Storage): The storage holding the original image.
+
+    Returns:
+        str: The storage name of the created variant.
+
+    This function performs the following tasks:
+        1. Opens the original, applies the EXIF orientation and converts it to RGB(A).
+        2. Crops or scales it down to the variant size, images are never scaled up.
+        3. Encodes it in each supported format and picks the smallest result.
+        4. Saves the result under the name from ``variant_names``.
+    """
+    options = VARIANTS[variant]
+    with storage.open(name, 'rb') as original:
+        with Image.open(original) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+            if options['crop']:
+                image = ImageOps.fit(image, options['size'], Image.LANCZOS)
+            else:
+                image.thumbnail(options['size'], Image.LANCZOS)
+
+    candidates = dict(zip(available_formats(options['formats']), variant_names(name, variant)))
+    encoded = {fmt: encode(image, fmt) for fmt in candidates}
+    best = min(encoded, key=lambda fmt: len(encoded[fmt]))
+
+    variant_name = candidates[best]
+    if storage.exists(variant_name):
+        storage.delete(variant_name)
+    return storage.save(variant_name, ContentFile(encoded[best]))
+
+
+def get_thumbnail(name, variant, generate=True, storage=default_storage):
+    """
+    Returns the storage name of an image variant, creating it on first use.
+
+    Resolved names, and images that failed to convert, are remembered in memory,
+    so repeated lookups do not touch the storage.
+
+    Args:
+        name (str): The storage name of the original image.
+        variant (str): A key of ``VARIANTS``.
+        generate (bool): Whether to create the variant if it does not exist yet.
+        storage (Storage): The storage holding the original image.
+
+    Returns:
+        str | None: The storage name of the variant, or None if it does not exist and could not
+        be created (e.g. the original is missing or is not a readable image).
+    """
+    if not name:
+        return None
+    key = (storage.location if hasattr(storage, 'location') else id(storage), name, variant)
+    if key in _resolved:
+        return _resolved[key]
+
+    variant_name = next((candidate for candidate in variant_names(name, variant) if storage.exists(candidate)), None)
+    if variant_name is None and generate:
+        try:
+            variant_name = create_variant(name, variant, storage)
+        except Exception:
+            logger.warning('Could not create the %s variant of %s', variant, name, exc_info=True)
+
+    if variant_name is not None or generate:
+        with _lock:
+            _resolved[key] = variant_name
+    return variant_name
+
+
+def create_variants(name, storage=default_storage):
+    """
+    Creates all missing variants of an image, e.g. right after it was uploaded.
+
+    Args:
+        name (str): The storage name of the original image.
+        storage (Storage): The storage holding the original image.
+    """
+    for variant in VARIANTS:
+        get_thumbnail(name, variant, storage=storage)
+
+
+def thumbnail_url(image, variant):
+    """
+    Returns the URL of an image variant, falling back to the original image.
+
+    Args:
+        image (ImageFieldFile): The image field value, e.g. ``article.image``.
+        variant (str): A key of ``VARIANTS``.
+
+    Returns:
+        str: The URL of the variant, the URL of the original if no variant is available,
+        or an empty string if there is no image.
+    """
+    if not image:
+        return ''
+    variant_name = get_thumbnail(image.name, variant, storage=image.storage)
+    return image.storage.url(variant_name) if variant_name else image.url
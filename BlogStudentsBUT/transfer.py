@@ -0,0 +1,301 @@
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = (NDJSON, CSV)
+
+# CSV has no lists, the names of the faculties and skills of a row are joined with this separator.
+LIST_SEPARATOR = '|'
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+
+def detect_format(path, fmt=None):
+    """
+    Returns the format of a data file, the given one or the one named by the file extension.
+
+    Args:
+        path (str): The path of the file, '-' for the standard input or output.
+        fmt (str | None): The format chosen with ``--format``.
+
+    Returns:
+        str: ``CSV`` for '.csv' files, ``NDJSON`` (one JSON object per line) otherwise.
+    """
+    if fmt:
+        return fmt
+    return CSV if path.lower().endswith('.csv') else NDJSON
+
+
+@contextmanager
+def open_stream(path, mode='r'):
+    """
+    Opens a data file as UTF-8 text, or the standard input or output for '-'.
+
+    The file is read and written line by line, so its size does not matter.
+    """
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    with open(path, mode, encoding='utf-8', newline='') as stream:
+        yield stream
+
+
+def read_rows(stream, fmt, list_fields=()):
+    """
+    Reads the rows of a data file one by one.
+
+    Args:
+        stream (file): The opened file.
+        fmt (str): ``NDJSON`` or ``CSV``.
+        list_fields (tuple): The CSV columns holding lists joined with ``LIST_SEPARATOR``.
+
+    Yields:
+        tuple: The line number and the row as a dict. Blank values of CSV files are missing from the dict.
+
+    Raises:
+        ValueError: If a line of an NDJSON file is not a JSON object.
+    """
+    if fmt == CSV:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            row = {name: value for name, value in row.items() if name and value not in (None, '')}
+            for name in list_fields:
+                if name in row:
+                    row[name] = [value.strip() for value in row[name].split(LIST_SEPARATOR) if value.strip()]
+            yield reader.line_num, row
+        return
+
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f'Line {number} is not a JSON object.')
+        yield number, row
+
+
+class RowWriter:
+    """
+    Writes rows to a data file, one line per row.
+
+    Attributes:
+        stream (file): The opened file.
+        fmt (str): ``NDJSON`` or ``CSV``.
+        fields (list): The columns, in order. The CSV header is written before the first row.
+
+    Example:
+        writer = RowWriter(stream, CSV, ['title', 'tags'])
+        writer.write({'title': 'Robots', 'tags': ['Robotics']})
+    """
+    def __init__(self, stream, fmt, fields):
+        self.stream = stream
+        self.fmt = fmt
+        self.fields = list(fields)
+        self.csv = None
+        if fmt == CSV:
+            self.csv = csv.writer(stream)
+            self.csv.writerow(self.fields)
+
+    def write(self, row):
+        if self.csv is None:
+            self.stream.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+            return
+        values = []
+        for field in self.fields:
+            value = row.get(field)
+            if isinstance(value, (list, tuple)):
+                value = LIST_SEPARATOR.join(value)
+            values.append('' if value is None else value)
+        self.csv.writerow(values)
+
+
+def parse_text(value):
+    """
+    Reads a text of a row without surrounding whitespace, None for a missing or blank value.
+    """
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def parse_bool(value):
+    """
+    Reads a boolean of an NDJSON (true/false) or CSV ('1', 'true', 'yes', ...) row.
+    """
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def parse_time(value):
+    """
+    Reads a date and time of a row, in ISO 8601 format. Times without a timezone are in ``TIME_ZONE``.
+
+    Raises:
+        ValueError: If the value is not a date and time.
+    """
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise ValueError(f'{value!r} is not a date and time.')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def hash_password(value):
+    """
+    Returns a password of a row hashed like ``Article.save`` does, hashes are kept as they are.
+    """
+    if value and not value.startswith('pbkdf2_sha256$'):
+        return make_password(value)
+    return value or None
+
+
+def error_message(error):
+    """
+    Describes why a row was skipped, naming the invalid fields, e.g. "title: This field cannot be blank."
+    """
+    if hasattr(error, 'message_dict'):
+        return ' '.join(f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items())
+    return ' '.join(getattr(error, 'messages', [str(error)]))
+
+
+def store_image(storage, name, images_dir=None):
+    """
+    Finds the image a row refers to by its path.
+
+    Args:
+        storage (Storage): The storage of the image field.
+        name (str): The path of the image in the storage, e.g. 'article_img/robots.jpg'.
+        images_dir (str | None): A directory holding images to copy into the storage, under the same path.
+
+    Returns:
+        str | None: The name of the stored image, or None if it is neither in the storage nor in ``images_dir``.
+
+    Images are referenced, or copied, as they are. ``normalize_images`` re-encodes and measures them later.
+    """
+    try:
+        if storage.exists(name):
+            return name
+    except SuspiciousFileOperation:
+        return None
+    if images_dir:
+        root = os.path.abspath(images_dir)
+        source = os.path.abspath(os.path.join(root, name))
+        if source.startswith(root + os.sep) and os.path.isfile(source):
+            with open(source, 'rb') as image:
+                return storage.save(name, File(image))
+    return None
+
+
+def related_ids(model, names, known):
+    """
+    Returns the IDs of the faculties or skills with the given names, creating the missing ones.
+
+    Args:
+        model (type): ``Tag`` or ``Skill``.
+        names (iterable): The names of a batch of rows.
+        known (dict): The IDs found for earlier batches by name, updated in place. There are few
+            faculties, so it is kept for the whole import.
+
+    Returns:
+        dict: The ID of every name that has a slug.
+
+    A name is matched by the name, then by the slug it gives, generated like ``Tag.save`` does. The missing ones
+    are created with ``bulk_create``, which bypasses ``save``, so their slug is set here.
+    """
+    missing = {name for name in names if name not in known}
+    if missing:
+        known.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+        slugs = {name: slugify(name, allow_unicode=True) for name in missing if name not in known}
+        slugs = {name: slug for name, slug in slugs.items() if slug}
+        found = dict(model.objects.filter(slug__in=slugs.values()).values_list('slug', 'id'))
+        new = {}
+        for name, slug in slugs.items():
+            if slug not in found:
+                new.setdefault(slug, model(name=name, slug=slug))
+        model.objects.bulk_create(new.values(), ignore_conflicts=True)
+        found.update(model.objects.filter(slug__in=list(new)).values_list('slug', 'id'))
+        known.update((name, found[slug]) for name, slug in slugs.items() if slug in found)
+    return {name: known[name] for name in names if name in known}
+
+
+def update_rows(objects, fields):
+    """
+    Saves some fields of many objects of one model, like ``bulk_update`` but faster for large batches.
+
+    Args:
+        objects (list): The objects to save, e.g. imported articles.
+        fields (list): The names of the fields to save.
+
+    ``bulk_update`` sends one UPDATE with a CASE expression per field and a branch per object, which
+    Django takes longer to build than the database to run. Here one prepared UPDATE is run for every
+    object with ``executemany``. Like ``bulk_update``, it sends no signals and sets no ``auto_now`` field.
+    It is also used to write the created times of the objects saved with ``bulk_create``, which sets
+    ``auto_now_add`` fields to the current time.
+    """
+    if not objects:
+        return
+    meta = objects[0]._meta
+    fields = [meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f'{quote(field.column)} = %s' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {quote(meta.db_table)} SET {assignments} WHERE {quote(meta.pk.column)} = %s",
+            [[field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields]
+             + [meta.pk.get_db_prep_value(obj.pk, connection)] for obj in objects],
+        )
+
+
+def batched(iterable, size):
+    """
+    Splits an iterable into lists of at most ``size`` items, reading only one list at a time.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Throughput:
+    """
+    Measures the rate of a bulk import or export.
+
+    Attributes:
+        rows (int): The number of processed rows.
+        started (float): The ``time.perf_counter`` value when the measurement started.
+
+    Example:
+        throughput = Throughput()
+        throughput.add(len(batch))
+        self.stderr.write(throughput.summary('Exported', 'articles'))
+    """
+    def __init__(self):
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, rows):
+        self.rows += rows
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def summary(self, verb, noun):
+        return f'{verb} {self.rows} {noun} in {self.elapsed:.1f} s ({self.rate:.0f} rows/s).'
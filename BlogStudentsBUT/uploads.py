@@ -0,0 +1,86 @@
+import os
+import warnings
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+from BlogStudentsBUT import thumbnails
+
+
+def normalize_image(source, name):
+    """
+    Re-encodes an uploaded image into the form that is stored.
+
+    Args:
+        source (file): The uploaded file, opened for reading.
+        name (str): The uploaded file name, the stored name keeps its stem.
+
+    Returns:
+        tuple: The normalized image as a named ``ContentFile``, its width and its height.
+
+    Raises:
+        ValidationError: If the file is not an image Pillow can read, or if it has more than
+            ``UPLOAD_IMAGE_MAX_PIXELS`` pixels (a decompression bomb, i.e. a small file that
+            decodes to gigabytes of pixels).
+
+    This function performs the following tasks:
+        1. Reads the image size from the header and rejects oversized images before any pixel is decoded.
+        2. Applies the EXIF orientation and converts the image to RGB(A). Only the pixels are encoded again,
+           so EXIF data such as the camera model and GPS position is dropped.
+        3. Scales the image down to fit ``UPLOAD_IMAGE_MAX_SIZE``, images are never scaled up.
+        4. Encodes it in every supported format of ``UPLOAD_IMAGE_FORMATS`` and keeps the smallest result.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(source) as image:
+                width, height = image.size
+                if width * height > settings.UPLOAD_IMAGE_MAX_PIXELS:
+                    raise ValidationError(
+                        'The image is too large (%(width)s×%(height)s pixels).',
+                        code='image_too_large', params={'width': width, 'height': height})
+                image = ImageOps.exif_transpose(image)
+                image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    except (Image.DecompressionBombWarning, Image.DecompressionBombError):
+        raise ValidationError('The image is too large.', code='image_too_large')
+    except (OSError, ValueError, SyntaxError):
+        raise ValidationError('Upload a valid image.', code='invalid_image')
+
+    image.thumbnail(settings.UPLOAD_IMAGE_MAX_SIZE, Image.LANCZOS)
+    encoded = {fmt: thumbnails.encode(image, fmt)
+               for fmt in thumbnails.available_formats(settings.UPLOAD_IMAGE_FORMATS)}
+    best = min(encoded, key=lambda fmt: len(encoded[fmt]))
+
+    stem, _ = os.path.splitext(os.path.basename(name))
+    return ContentFile(encoded[best], name=f'{stem}.{thumbnails.EXTENSIONS[best]}'), image.width, image.height
+
+
+def normalize_form_image(form, field='image'):
+    """
+    Normalizes a newly uploaded image in the ``clean_<field>`` method of a model form.
+
+    Args:
+        form (ModelForm): The form, its instance gets the ``<field>_width`` and ``<field>_height`` of the image.
+        field (str): The name of the image field.
+
+    Returns:
+        File: The normalized upload to store, or the field's value if no new file was uploaded.
+
+    Raises:
+        ValidationError: If the upload is rejected by ``normalize_image``.
+
+    Example:
+        def clean_image(self):
+            return normalize_form_image(self)
+    """
+    upload = form.cleaned_data.get(field)
+    if not isinstance(upload, UploadedFile):
+        return upload
+    upload.seek(0)
+    image, width, height = normalize_image(upload, upload.name)
+    setattr(form.instance, f'{field}_width', width)
+    setattr(form.instance, f'{field}_height', height)
+    return image
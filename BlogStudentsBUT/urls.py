@@ -28,6 +28,6 @@ urlpatterns = [
     path('contact/', views.contact, name='contact'),
     path('about_us/', views.about_us, name='about_us'),
 ]
-# Append static and media URL patterns
+# Append the media URL patterns, only served in DEBUG. Static files are served by runserver in DEBUG
+# and by BlogStudentsBUT.staticfiles.StaticFilesApplication or a front proxy otherwise.
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'BlogStudentsBUT.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402, settings are configured by get_wsgi_application
+from BlogStudentsBUT.staticfiles import StaticFilesApplication  # noqa: E402
+
+if settings.SERVE_STATIC_FILES:
+    application = StaticFilesApplication(application)
@@ -0,0 +1,180 @@
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.crypto import salted_hmac
+
+from BlogStudentsBUT.cache import increment
+
+TOKEN_SALT = 'articles.access'
+ATTEMPTS_KEY = 'article-access:{}:{}'
+
+
+class AccessThrottled(Exception):
+    """
+    Raised when a client made too many wrong password attempts for private articles.
+
+    Attributes:
+        retry_after (int): The number of seconds after which the client may try again.
+    """
+    def __init__(self, retry_after):
+        super().__init__('Too many attempts, please try again later.')
+        self.retry_after = retry_after
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def attempt_keys(request, article):
+    """
+    Returns the cache keys counting the failed password attempts of a client.
+
+    Args:
+        request (HttpRequest): The request of the client.
+        article (Article): The private article.
+
+    Returns:
+        list: The key counting the attempts on this article and the key counting
+        the attempts on all articles, both for the client's IP address.
+    """
+    ip = client_ip(request)
+    return [ATTEMPTS_KEY.format(ip, article.pk.hex), ATTEMPTS_KEY.format(ip, '*')]
+
+
+def is_throttled(request, article):
+    """
+    Checks whether a client has used up its password attempts.
+
+    Args:
+        request (HttpRequest): The request of the client.
+        article (Article): The private article.
+
+    Returns:
+        bool: True if the client reached ``PRIVATE_ARTICLE_ATTEMPTS`` on the article
+        or ``PRIVATE_ARTICLE_IP_ATTEMPTS`` on all articles within the throttle window.
+    """
+    article_key, ip_key = attempt_keys(request, article)
+    attempts = cache.get_many([article_key, ip_key])
+    return (attempts.get(article_key, 0) >= settings.PRIVATE_ARTICLE_ATTEMPTS
+            or attempts.get(ip_key, 0) >= settings.PRIVATE_ARTICLE_IP_ATTEMPTS)
+
+
+def register_failure(request, article):
+    """
+    Counts a wrong password attempt of a client.
+
+    The counters live in the shared cache, so the limits hold across all worker processes.
+    Every failure restarts the throttle window of both counters.
+
+    Args:
+        request (HttpRequest): The request of the client.
+        article (Article): The private article.
+    """
+    for key in attempt_keys(request, article):
+        increment(key, 1, settings.PRIVATE_ARTICLE_THROTTLE_WINDOW)
+
+
+def verify_password(request, article, raw_password):
+    """
+    Checks the password of a private article, limiting how often a client may try.
+
+    Args:
+        request (HttpRequest): The request of the client.
+        article (Article): The private article.
+        raw_password (str): The password entered by the client.
+
+    Returns:
+        bool: True if the password is correct.
+
+    Raises:
+        AccessThrottled: If the client used up its attempts. The password is not hashed in that case,
+            so repeated attempts cost a cache lookup instead of a full PBKDF2 run.
+
+    This function performs the following tasks:
+        1. Rejects the attempt if the client is throttled.
+        2. Checks the password with ``Article.check_password``.
+        3. Counts failed attempts per IP address and article and per IP address,
+           and resets the article counter after a successful attempt.
+    """
+    if is_throttled(request, article):
+        raise AccessThrottled(settings.PRIVATE_ARTICLE_THROTTLE_WINDOW)
+    if article.check_password(raw_password):
+        cache.delete(attempt_keys(request, article)[0])
+        return True
+    register_failure(request, article)
+    return False
+
+
+def cookie_name(article):
+    return f'article_access_{article.pk.hex}'
+
+
+def password_fingerprint(article):
+    return salted_hmac(TOKEN_SALT, article.password or '').hexdigest()[:16]
+
+
+def make_token(article):
+    """
+    Creates a signed token granting access to a private article.
+
+    The token contains a fingerprint of the article's password hash, so changing
+    the password revokes all issued tokens.
+
+    Args:
+        article (Article): The private article.
+
+    Returns:
+        str: The signed token.
+    """
+    return signing.dumps([article.pk.hex, password_fingerprint(article)], salt=TOKEN_SALT, compress=True)
+
+
+def has_access(request, article):
+    """
+    Checks whether a request carries a valid access token for a private article.
+
+    Verifying the token costs one HMAC, unlike checking the password.
+
+    Args:
+        request (HttpRequest): The request of the client.
+        article (Article): The private article.
+
+    Returns:
+        bool: True if the token is present, not older than ``PRIVATE_ARTICLE_TOKEN_AGE``
+        and issued for the current password of the article.
+    """
+    token = request.COOKIES.get(cookie_name(article))
+    if not token:
+        return False
+    try:
+        article_id, fingerprint = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PRIVATE_ARTICLE_TOKEN_AGE)
+    except (signing.BadSignature, ValueError, TypeError):
+        return False
+    return article_id == article.pk.hex and fingerprint == password_fingerprint(article)
+
+
+def grant_access(response, article):
+    """
+    Attaches an access token for a private article to a response.
+
+    The token is stored in an HTTP-only cookie limited to the article's URLs, which also
+    covers its PDF download.
+
+    Args:
+        response (HttpResponse): The response to attach the cookie to.
+        article (Article): The private article.
+
+    Returns:
+        HttpResponse: The same response.
+    """
+    response.set_cookie(
+        cookie_name(article),
+        make_token(article),
+        max_age=settings.PRIVATE_ARTICLE_TOKEN_AGE,
+        path=reverse('article', args=[article.slug]),
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
@@ -0,0 +1,114 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from . import views
+from .forms import ReviewForm
+from .models import Article
+from .utils import searchArticles, filterArticlesByTags, apaginateReviews, articleState
+from BlogStudentsBUT.async_utils import arender, alist
+from BlogStudentsBUT.cache import cache_anonymous_page
+from BlogStudentsBUT.conditional import conditional_page
+from BlogStudentsBUT.pagination import apaginate
+from BlogStudentsBUT.routers import read_from_replica
+
+
+async def listing(request, template_name, results, faceted=False):
+    """
+    Builds a page of the article listings with the async ORM.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        template_name (str): The template to render.
+        results (int): The number of articles per page.
+        faceted (bool): Whether the listing is filtered by the faculties chosen in the request.
+
+    Returns:
+        HttpResponse: The rendered listing.
+
+    This function performs the following tasks:
+        1. Retrieves articles based on a search query using the searchArticles function. The full-text
+           lookup is a raw SQLite query, so it runs in the ORM thread.
+        2. For faceted listings, filters them by the chosen faculties with the filterArticlesByTags function,
+           in the ORM thread as well.
+        3. Paginates the articles with ``apaginate``, which counts them with ``acount()`` and fetches the page
+           with async iteration. The articles are loaded with ``for_listing()``, so the cards run no queries.
+        4. Renders the template with the articles, search query, custom pagination range and faculty filters.
+    """
+    articles, search_query = await sync_to_async(searchArticles)(request)
+    facets = {}
+    if faceted:
+        articles, facets = await sync_to_async(filterArticlesByTags)(request, articles)
+    custom_range, articles = await apaginate(request, articles.for_listing(), results)
+    context = {'articles': articles, 'search_query': search_query, 'custom_range': custom_range, **facets}
+    return await arender(request, template_name, context)
+
+
+@cache_anonymous_page('articles', 'tags')
+@read_from_replica
+async def articles_main(request):
+    """
+    Async version of ``articles.views.articles_main``, displays 12 articles per page.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+
+    Returns:
+        HttpResponse: The HTTP response object with the rendered 'articles/articles_main.html' template.
+    """
+    return await listing(request, 'articles/articles_main.html', 12)
+
+
+@cache_anonymous_page('articles', 'tags')
+@read_from_replica
+async def articles(request):
+    """
+    Async version of ``articles.views.articles``, displays 6 articles per page.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+
+    Returns:
+        HttpResponse: The HTTP response object with the rendered 'articles/articles.html' template.
+    """
+    return await listing(request, 'articles/articles.html', 6, faceted=True)
+
+
+@cache_anonymous_page('tags', lambda request, article_slug: f'article:{article_slug}')
+@read_from_replica
+@conditional_page(articleState)
+async def article(request, article_slug):
+    """
+    Async version of ``articles.views.article`` for reading public articles.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        article_slug (str): The slug identifier for the article to be displayed.
+
+    Returns:
+        HttpResponse: The HTTP response object with the rendered article template.
+
+    This view function performs the following tasks:
+        1. Retrieves the article and its owner with ``aget()`` or raises a 404 if not found.
+        2. Hands private articles and posted comments over to the synchronous view, which checks
+           passwords, throttles attempts and saves comments.
+        3. Fetches the tags and the first page of comments of the article concurrently with ``asyncio.gather``.
+        4. Renders the article with its details, tags, comments and a blank review form.
+           The following pages of comments are loaded from ``articles.views.article_comments``.
+    """
+    try:
+        article = await Article.objects.select_related('owner').aget(slug=article_slug)
+    except Article.DoesNotExist:
+        raise Http404('No Article matches the given query.')
+
+    if article.is_private or request.method not in ('GET', 'HEAD'):
+        return await sync_to_async(views.article)(request, article_slug)
+
+    tags, reviews = await asyncio.gather(
+        alist(article.tags.all()),
+        apaginateReviews(article),
+    )
+    context = {'article': article, 'form': ReviewForm(), 'tags': tags, 'reviews': reviews}
+    return await arender(request, 'articles/single_article.html', context)
+
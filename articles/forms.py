@@ -3,6 +3,7 @@ from .models import Article, Review, Tag
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.html import format_html
+from BlogStudentsBUT.uploads import normalize_form_image
 
 
 class ArticleForm(ModelForm):
@@ -20,6 +21,7 @@ class ArticleForm(ModelForm):
 
     Methods:
         clean_slug(): Validates the uniqueness of the slug, excluding the current instance.
+        clean_image(): Normalizes a newly uploaded image, see ``BlogStudentsBUT.uploads.normalize_image``.
         clean(): Validates that a password is provided if the article is marked as private.
         __init__(*args, **kwargs): Initializes the form with custom CSS classes for fields.
     """
@@ -64,6 +66,18 @@ class ArticleForm(ModelForm):
             raise ValidationError("An article with such a link already exists.")
         return slug
 
+    def clean_image(self):
+        """
+        Re-encodes a newly uploaded image and records its dimensions on the article.
+
+        Returns:
+            File: The normalized image, or the current image if none was uploaded.
+
+        Raises:
+            ValidationError: If the file is not a readable image or has too many pixels.
+        """
+        return normalize_form_image(self)
+
     def clean(self):
         """
         Validates the form fields, ensuring a password is provided if the article is private.
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from articles.models import Tag
+from users.models import Skill
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the article counter of every faculty (``Tag.article_count``) and the profile
+    counter of every skill (``Skill.profile_count``).
+
+    The counters are maintained by the m2m_changed and pre_delete signals; this command repairs them
+    after relations were imported or deleted with bulk queries that bypass the signals.
+
+    Example:
+        python manage.py backfill_facet_counts
+    """
+    help = 'Recomputes the article counters of the faculties and the profile counters of the skills.'
+
+    def handle(self, *args, **options):
+        tags = Tag.objects.refresh_article_counts()
+        skills = Skill.objects.refresh_profile_counts()
+        self.stdout.write(self.style.SUCCESS(f'Updated the counters of {tags} faculties and {skills} skills.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the ``total_votes`` comment counter of every article.
+
+    The counter is maintained by the Review signals; this command fills it for existing data,
+    e.g. after comments were imported or deleted with bulk queries that bypass the signals.
+
+    Example:
+        python manage.py backfill_review_counts
+    """
+    help = 'Recomputes the comment counter (total_votes) of every article.'
+
+    def handle(self, *args, **options):
+        updated = Article.objects.refresh_review_counts()
+        self.stdout.write(self.style.SUCCESS(f'Updated the comment counter of {updated} articles.'))
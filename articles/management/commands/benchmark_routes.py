@@ -0,0 +1,84 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from BlogStudentsBUT import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks every named route of the articles and users apps on synthetic datasets.
+
+    The command creates a separate test database, so the development database is never touched.
+    For each dataset size it seeds articles, comments, profiles and messages, requests every route
+    as a logged-in user and records the query count, the p50/p95 latency and the peak memory.
+    The results are compared with the baseline stored in ``BENCHMARK_BASELINE``, and the command
+    fails if a route regressed.
+
+    Example:
+        python manage.py benchmark_routes --sizes 1000 10000 100000
+        python manage.py benchmark_routes --update-baseline
+    """
+    help = 'Measures queries, latency and memory of every route and compares them with the stored baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000],
+                            help='The numbers of articles to seed, one benchmark run per size.')
+        parser.add_argument('--repeats', type=int, default=20, help='The number of timed requests per route.')
+        parser.add_argument('--tolerance', type=float, default=1.5,
+                            help='How many times slower or bigger a route may get before it fails.')
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE, help='The baseline file.')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store the results as the new baseline instead of comparing them.')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as pdf_cache, \
+                    override_settings(PDF_CACHE_ROOT=pdf_cache, PDF_PRERENDER=False):
+                results = {str(size): self.run_size(size, options['repeats']) for size in options['sizes']}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        if options['update_baseline']:
+            baseline = benchmark.load_baseline(options['baseline'])
+            baseline.update(results)
+            benchmark.save_baseline(options['baseline'], baseline)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}."))
+            return
+
+        regressions = benchmark.find_regressions(results, benchmark.load_baseline(options['baseline']),
+                                                 options['tolerance'])
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'{len(regressions)} routes regressed past the baseline.')
+        self.stdout.write(self.style.SUCCESS('No route regressed past the baseline.'))
+
+    def run_size(self, size, repeats):
+        call_command('flush', interactive=False, verbosity=0)
+        self.stdout.write(f'Seeding {size} articles...')
+        profile = benchmark.seed(size)
+
+        client = Client(raise_request_exception=False)
+        client.force_login(profile.user)
+        results = benchmark.run(client, profile, repeats)
+
+        self.stdout.write(f"{'route':<20} {'status':>6} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>9}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<20} {result['status']:>6} {result['queries']:>8} "
+                              f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['peak_kib']:>9}")
+        return results
@@ -0,0 +1,152 @@
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from BlogStudentsBUT import benchmark
+
+# The read-only pages that have an async view, see ASYNC_VIEWS.
+ROUTES = ['articles_main', 'articles', 'article', 'profiles', 'user_profile']
+
+
+class Command(BaseCommand):
+    """
+    Compares the throughput of the site under a WSGI server with the sync views and under
+    an ASGI server with the async views.
+
+    The command seeds a temporary SQLite database, starts each server on it in turn and keeps
+    ``--concurrency`` requests in flight against the pages that have an async view for
+    ``--duration`` seconds. Requests are made as a logged-in user, because anonymous visitors
+    are mostly served from the page cache, which both servers answer equally fast.
+
+    The servers are started with ``python -m`` followed by ``--wsgi-server`` and ``--asgi-server``,
+    where ``{port}`` and ``{workers}`` are replaced. The defaults need gunicorn and uvicorn.
+
+    Example:
+        python manage.py benchmark_servers --size 10000 --concurrency 64
+        python manage.py benchmark_servers --workers 4 --output servers.json
+    """
+    help = 'Measures the throughput of the WSGI server with sync views and of uvicorn with async views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000, help='The number of articles to seed.')
+        parser.add_argument('--concurrency', type=int, default=32, help='The number of requests in flight.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per server.')
+        parser.add_argument('--workers', type=int, default=1, help='The number of server processes.')
+        parser.add_argument('--port', type=int, default=8765, help='The port the servers listen on.')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Request the pages as an anonymous visitor, i.e. mostly from the page cache.')
+        parser.add_argument('--wsgi-server',
+                            default='gunicorn BlogStudentsBUT.wsgi:application --bind 127.0.0.1:{port} '
+                                    '--workers {workers} --worker-class gthread --threads 8 --log-level warning',
+                            help='The WSGI server module and its arguments.')
+        parser.add_argument('--asgi-server',
+                            default='uvicorn BlogStudentsBUT.asgi:application --host 127.0.0.1 --port {port} '
+                                    '--workers {workers} --log-level warning',
+                            help='The ASGI server module and its arguments.')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            connection.settings_dict['TEST']['NAME'] = path
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.stdout.write(f"Seeding {options['size']} articles...")
+                paths, headers = self.prepare(benchmark.seed(options['size']), options['anonymous'])
+                connection.close()
+
+                results = {}
+                for name, server, async_views in (('wsgi', options['wsgi_server'], False),
+                                                  ('asgi', options['asgi_server'], True)):
+                    command = server.format(port=options['port'], workers=options['workers'])
+                    results[name] = self.measure(command, path, async_views, paths, headers, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(f"{'server':<8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<8} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9} "
+                              f"{result['p50_ms']:>9} {result['p95_ms']:>9}")
+        if results['wsgi']['rps']:
+            self.stdout.write(f"asgi/wsgi throughput: {results['asgi']['rps'] / results['wsgi']['rps']:.2f}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+    def prepare(self, profile, anonymous):
+        """
+        Picks the benchmarked paths and logs the benchmark user in.
+
+        Args:
+            profile (Profile): The profile returned by ``benchmark.seed``.
+            anonymous (bool): Whether to skip the login.
+
+        Returns:
+            tuple: The paths to request and the headers to send with every request.
+        """
+        kwargs = benchmark.route_kwargs(profile)
+        paths = [reverse(name, kwargs=kwargs.get(name)) for name in ROUTES]
+        if anonymous:
+            return paths, {}
+
+        client = Client()
+        client.force_login(profile.user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        return paths, {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session}'}
+
+    def measure(self, command, database, async_views, paths, headers, options):
+        """
+        Starts one server on the seeded database, loads it and stops it.
+
+        Args:
+            command (str): The server module and its arguments.
+            database (str): The path of the seeded database.
+            async_views (bool): Whether the server uses the async views.
+            paths (list): The paths to request.
+            headers (dict): The headers to send with every request.
+            options (dict): The command options.
+
+        Returns:
+            dict: The results of ``benchmark.load``.
+        """
+        environment = {**os.environ, 'DATABASE_PATH': database, 'ASYNC_VIEWS': '1' if async_views else '0',
+                       'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'BlogStudentsBUT.settings')}
+        self.stdout.write(f'Starting {command}')
+        server = subprocess.Popen([sys.executable, '-m', *shlex.split(command)], cwd=settings.BASE_DIR,
+                                  env=environment)
+        try:
+            self.wait_until_listening(server, options['port'])
+            base_url = f"http://127.0.0.1:{options['port']}"
+            benchmark.load(base_url, paths, options['concurrency'], duration=1, headers=headers)
+            return benchmark.load(base_url, paths, options['concurrency'], options['duration'], headers)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+    def wait_until_listening(self, server, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'The server exited with status {server.returncode}, is it installed?')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'The server did not listen on port {port} within {timeout} seconds.')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    """
+    Compares the ``total_votes`` comment counters with the real number of comments.
+
+    Without ``--repair`` the command lists the articles whose counter is wrong and fails,
+    so it can be used as a periodic consistency check. With ``--repair`` the wrong counters are fixed.
+
+    Example:
+        python manage.py check_review_counts --repair
+    """
+    help = 'Checks the comment counters (total_votes) of the articles and optionally repairs them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Fix the counters that are out of sync.')
+
+    def handle(self, *args, **options):
+        mismatched = (Article.objects.with_counted_reviews()
+                      .exclude(total_votes=F('counted_reviews'))
+                      .values_list('pk', 'slug', 'total_votes', 'counted_reviews'))
+        mismatched = list(mismatched)
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS('All comment counters are correct.'))
+            return
+
+        for pk, slug, stored, counted in mismatched:
+            self.stdout.write(f'{slug}: stored {stored}, counted {counted}')
+
+        if not options['repair']:
+            raise CommandError(f'{len(mismatched)} comment counters are out of sync, run with --repair to fix them.')
+
+        Article.objects.filter(pk__in=[row[0] for row in mismatched]).refresh_review_counts()
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(mismatched)} comment counters.'))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from articles.models import Article
+from BlogStudentsBUT.transfer import FORMATS, RowWriter, Throughput, batched, detect_format, open_stream
+
+FIELDS = ['id', 'title', 'slug', 'owner', 'description', 'source_link', 'demo_link', 'image',
+          'is_private', 'password', 'created', 'tags']
+
+
+class Command(BaseCommand):
+    """
+    Writes all articles to an NDJSON or CSV file that ``import_articles`` reads back.
+
+    Every row holds the article's fields, its owner's username, the stored path of its image and
+    the names of its faculties. Passwords of private articles are written as hashes. The articles are
+    read in (created, id) order in batches of ``--batch-size`` rows, with one extra query per batch for
+    the faculties, and every row is written as soon as it is read, so memory use stays constant.
+
+    Example:
+        python manage.py export_articles articles.ndjson
+        python manage.py export_articles articles.csv --batch-size 5000
+        python manage.py export_articles - --format csv > articles.csv
+    """
+    help = 'Writes the articles to an NDJSON or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The file to write, '-' for the standard output.")
+        parser.add_argument('--format', choices=FORMATS, help='The file format, by default named by the extension.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='The number of articles read per query.')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        articles = (Article.objects.order_by('created', 'id')
+                    .values('id', 'title', 'slug', 'owner__username', 'description', 'source_link',
+                            'demo_link', 'image', 'is_private', 'password', 'created')
+                    .iterator(chunk_size=options['batch_size']))
+
+        throughput = Throughput()
+        with open_stream(options['path'], 'w') as stream:
+            writer = RowWriter(stream, fmt, FIELDS)
+            for batch in batched(articles, options['batch_size']):
+                tags = {}
+                for article_id, name in (Article.tags.through.objects
+                                         .filter(article_id__in=[row['id'] for row in batch])
+                                         .order_by('tag__name').values_list('article_id', 'tag__name')):
+                    tags.setdefault(article_id, []).append(name)
+                for row in batch:
+                    row['owner'] = row.pop('owner__username')
+                    row['tags'] = tags.get(row['id'], [])
+                    writer.write(row)
+                throughput.add(len(batch))
+
+        self.stderr.write(self.style.SUCCESS(throughput.summary('Exported', 'articles')))
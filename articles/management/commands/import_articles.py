@@ -0,0 +1,182 @@
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import reset_queries, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from articles import search
+from articles.models import Article, Tag
+from users.models import Profile
+from BlogStudentsBUT import cache
+from BlogStudentsBUT.transfer import (FORMATS, Throughput, batched, detect_format, error_message, hash_password,
+                                      open_stream, parse_bool, parse_text, parse_time, read_rows, related_ids,
+                                      store_image, update_rows)
+
+TEXT_FIELDS = ('title', 'slug', 'description', 'source_link', 'demo_link')
+
+
+class Command(BaseCommand):
+    """
+    Creates or updates articles from an NDJSON or CSV file, like the ones written by ``export_articles``.
+
+    The rows are read in batches of ``--batch-size``. Each batch is saved in one transaction with a few
+    queries whatever its size: the existing articles, owners and faculties are loaded with one query
+    each, the new articles and their faculty links are written with ``bulk_create`` and the changed
+    articles with ``update_rows``, a faster ``bulk_update``. Only the current batch is kept in memory,
+    so files of any size can be imported.
+
+    Rows:
+        - id: The UUID of the article. A row updates the article with this ID if there is one, and only
+          the fields present in the row. Without an ID a new article is created.
+        - title: Required for new articles. The slug defaults to the slugified title.
+        - owner: The username of the owner's profile.
+        - description, source_link, demo_link, is_private, created.
+        - password: A hash, or a raw password that is hashed.
+        - image: The path of the image in the media storage. Images missing from the storage are copied
+          from ``--images-dir`` under the same path, otherwise the default image is used.
+        - tags: The names of the faculties, a list in NDJSON files and joined with '|' in CSV files.
+          Missing faculties are created. A row with tags replaces the faculties of the article.
+
+    Bulk queries bypass the signals, so the command updates the search index per batch, and the faculty
+    counters and the cached pages at the end. Imported images are not measured, ``normalize_images``
+    re-encodes them and creates their size variants.
+
+    The cached pages are invalidated through the shared cache, so the command must run with the same
+    ``CACHE_URL`` or ``CACHE_DIR`` as the site. Otherwise the workers serve the old pages until they expire.
+
+    Example:
+        python manage.py import_articles articles.ndjson
+        python manage.py import_articles articles.csv --images-dir /backup/media --batch-size 5000
+    """
+    help = 'Creates or updates articles from an NDJSON or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The file to read, '-' for the standard input.")
+        parser.add_argument('--format', choices=FORMATS, help='The file format, by default named by the extension.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='The number of rows saved per transaction.')
+        parser.add_argument('--images-dir', help='A directory to copy the images missing from the media storage from.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.tag_ids = {}
+        self.counts = {'created': 0, 'updated': 0, 'skipped': 0}
+        throughput = Throughput()
+
+        with open_stream(options['path']) as stream:
+            rows = read_rows(stream, detect_format(options['path'], options['format']), list_fields=('tags',))
+            for batch in batched(rows, options['batch_size']):
+                with transaction.atomic():
+                    self.import_batch(batch)
+                # With DEBUG on, the connection logs every query, and the bulk ones are long.
+                reset_queries()
+                throughput.add(len(batch))
+                if options['verbosity'] > 1:
+                    self.stderr.write(throughput.summary('Read', 'rows'))
+
+        Tag.objects.refresh_article_counts()
+        cache.bump('articles', 'tags')
+        self.stdout.write(self.style.SUCCESS(
+            f"{throughput.summary('Imported', 'rows')} Created {self.counts['created']} articles, "
+            f"updated {self.counts['updated']}, skipped {self.counts['skipped']} rows."))
+
+    def skip(self, number, reason):
+        self.counts['skipped'] += 1
+        self.stderr.write(f'Line {number}: skipped, {reason}')
+
+    def import_batch(self, batch):
+        rows = {}
+        for number, row in batch:
+            try:
+                pk = uuid.UUID(str(row['id'])) if row.get('id') else uuid.uuid4()
+            except ValueError:
+                self.skip(number, f"{row['id']!r} is not a UUID.")
+                continue
+            rows[pk] = (number, row)
+
+        existing = Article.objects.in_bulk(list(rows))
+        owners = dict(Profile.objects.filter(username__in={row['owner'] for _, row in rows.values() if row.get('owner')})
+                      .values_list('username', 'id'))
+        tag_ids = related_ids(Tag, {name for _, row in rows.values() for name in row.get('tags', [])}, self.tag_ids)
+
+        now = timezone.now()
+        created, updated, links, namespaces = [], [], [], set()
+        for pk, (number, row) in rows.items():
+            article = existing.get(pk)
+            if article is not None:
+                namespaces.add(f'article:{article.slug}')
+            try:
+                article = self.build(article or Article(id=pk), number, row, owners, now)
+            except (ValueError, ValidationError) as error:
+                self.skip(number, error_message(error))
+                continue
+            if pk in existing:
+                namespaces.add(f'article:{article.slug}')
+                updated.append((article, row))
+            else:
+                created.append((article, row))
+            if 'tags' in row:
+                links.extend(Article.tags.through(article_id=pk, tag_id=tag_ids[name])
+                             for name in row['tags'] if name in tag_ids)
+
+        if created:
+            # bulk_create sets the auto_now_add time, the created time of the rows is written afterwards.
+            times = {article.pk: article.created for article, row in created if row.get('created')}
+            Article.objects.bulk_create([article for article, _ in created])
+            dated = [article for article, _ in created if article.pk in times]
+            for article in dated:
+                article.created = times[article.pk]
+            update_rows(dated, ['created'])
+        if updated:
+            fields = ['owner', 'title', 'slug', 'description', 'source_link', 'demo_link', 'image', 'image_width',
+                      'image_height', 'is_private', 'password', 'created', 'updated']
+            update_rows([article for article, _ in updated], fields)
+
+        retagged = [article.pk for article, row in updated if 'tags' in row]
+        Article.tags.through.objects.filter(article_id__in=retagged).delete()
+        Article.tags.through.objects.bulk_create(links, ignore_conflicts=True)
+
+        search.index_articles([article.pk for article, _ in created + updated])
+        owner_ids = {article.owner_id for article, _ in created + updated if article.owner_id}
+        namespaces.update(f'profile:{username}' for username in
+                          Profile.objects.filter(pk__in=owner_ids).values_list('username', flat=True))
+        cache.bump(*namespaces)
+        self.counts['created'] += len(created)
+        self.counts['updated'] += len(updated)
+
+    def build(self, article, number, row, owners, now):
+        """
+        Sets the fields of an article from a row.
+
+        Raises:
+            ValueError: If a value cannot be read.
+            ValidationError: If a field is invalid, e.g. a new article without a title or a too long title.
+        """
+        for field in TEXT_FIELDS:
+            if field in row:
+                setattr(article, field, parse_text(row[field]))
+        if not article.slug and article.title:
+            article.slug = slugify(article.title)[:50]
+        if 'owner' in row:
+            article.owner_id = owners.get(row['owner'])
+            if row['owner'] and article.owner_id is None:
+                self.stderr.write(f"Line {number}: there is no profile {row['owner']!r}, the article has no owner.")
+        if 'is_private' in row:
+            article.is_private = parse_bool(row['is_private'])
+        if 'password' in row:
+            article.password = hash_password(row['password'])
+        if row.get('created'):
+            article.created = parse_time(row['created'])
+        if row.get('image'):
+            field = Article._meta.get_field('image')
+            name = store_image(field.storage, row['image'], self.options['images_dir'])
+            if name is None:
+                if row['image'] != field.get_default():
+                    self.stderr.write(f"Line {number}: the image {row['image']} was not found, the default image is used.")
+                name = field.get_default()
+            if name != article.image.name:
+                article.image, article.image_width, article.image_height = name, None, None
+        article.updated = now
+        article.clean_fields(exclude=['owner', 'image', 'password'])
+        return article
@@ -0,0 +1,71 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from articles.models import Article
+from users.models import Profile
+from BlogStudentsBUT import thumbnails
+from BlogStudentsBUT.uploads import normalize_image
+
+
+class Command(BaseCommand):
+    """
+    Normalizes the article and profile images stored before uploads were normalized.
+
+    Every image without recorded dimensions, except the default images, is re-encoded like a new
+    upload (see ``BlogStudentsBUT.uploads.normalize_image``) and saved with its dimensions. The
+    article or profile is saved, so its cached pages, PDF and size variants are refreshed by the
+    signals. The original file and its variants are deleted unless ``--keep-originals`` is given.
+
+    Example:
+        python manage.py normalize_images
+        python manage.py normalize_images --dry-run
+    """
+    help = 'Re-encodes, scales down and measures the images uploaded before uploads were normalized.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the images that would be normalized.')
+        parser.add_argument('--keep-originals', action='store_true', help='Do not delete the original files.')
+
+    def handle(self, *args, **options):
+        normalized = failed = 0
+        for model in (Article, Profile):
+            default = model._meta.get_field('image').get_default()
+            objects = model.objects.exclude(image='').exclude(image=default).filter(image_width__isnull=True)
+            for obj in objects.iterator():
+                if options['dry_run']:
+                    self.stdout.write(obj.image.name)
+                    continue
+                if self.normalize(obj, options['keep_originals']):
+                    normalized += 1
+                else:
+                    failed += 1
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Normalized {normalized} images, {failed} could not be read.'))
+
+    def normalize(self, obj, keep_original):
+        """
+        Replaces the image of an article or profile with its normalized version.
+
+        Returns:
+            bool: False if the image is missing or could not be normalized.
+        """
+        original = obj.image.name
+        storage = obj.image.storage
+        try:
+            with obj.image.open('rb') as source:
+                image, obj.image_width, obj.image_height = normalize_image(source, original)
+        except (OSError, ValidationError) as error:
+            self.stderr.write(f'Skipped {original}: {error}')
+            return False
+
+        obj.image.save(image.name, image, save=False)
+        obj.save(update_fields=['image', 'image_width', 'image_height', 'updated'])
+
+        if not keep_original:
+            for variant in thumbnails.VARIANTS:
+                for name in thumbnails.variant_names(original, variant):
+                    if storage.exists(name):
+                        storage.delete(name)
+            storage.delete(original)
+        return True
@@ -0,0 +1,45 @@
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from BlogStudentsBUT.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    """
+    Copies the primary SQLite database into the replica databases.
+
+    SQLite has no built-in replication, so local replicas are refreshed with its online backup API.
+    The copy is consistent even while the site is writing to the primary, and readers of a replica
+    keep working while it is being refreshed. Run it periodically, e.g. every few seconds from cron
+    or a loop, to keep the replicas close to the primary.
+
+    Example:
+        python manage.py sync_replicas
+        python manage.py sync_replicas --path /tmp/snapshot.sqlite3
+    """
+    help = 'Copies the primary SQLite database into every alias of DATABASE_REPLICAS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', default=[],
+                            help='Copy into this file instead of the configured replicas. Can be repeated.')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='The number of pages copied per step, the primary stays writable between steps.')
+
+    def handle(self, *args, **options):
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replicas only supports SQLite databases.')
+
+        paths = options['path'] or [str(connections.settings[alias]['NAME']) for alias in settings.DATABASE_REPLICAS]
+        if not paths:
+            raise CommandError('No replicas configured, set DATABASE_REPLICAS or pass --path.')
+
+        primary.ensure_connection()
+        for path in paths:
+            with closing(sqlite3.connect(path)) as replica:
+                primary.connection.backup(replica, pages=options['pages'])
+            self.stdout.write(self.style.SUCCESS(f'Copied the primary database to {path}.'))
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from articles import search
+
+
+def create_search_index(apps, schema_editor):
+    if search.fts_supported(schema_editor.connection):
+        search.create_index(schema_editor.connection)
+        search.rebuild_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0015_alter_tag_slug'),
+        ('users', '0007_alter_message_created'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
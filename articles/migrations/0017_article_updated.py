@@ -0,0 +1,18 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0016_article_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
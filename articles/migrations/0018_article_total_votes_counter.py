@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_review_counts(apps, schema_editor):
+    Article = apps.get_model('articles', 'Article')
+    Review = apps.get_model('articles', 'Review')
+    counted = Review.objects.filter(article=models.OuterRef('pk')).order_by().values('article')
+    counted = counted.annotate(total=models.Count('pk')).values('total')
+    Article.objects.update(total_votes=Coalesce(models.Subquery(counted), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0017_article_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_review_counts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='article',
+            name='total_votes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
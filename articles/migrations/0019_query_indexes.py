@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0018_article_total_votes_counter'),
+        ('users', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['created']},
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['created', 'id'], name='article_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['article', 'created'], name='review_article_created_idx'),
+        ),
+    ]
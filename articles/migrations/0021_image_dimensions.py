@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0020_review_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -3,6 +3,27 @@ import uuid
 from users.models import Profile
 from django.utils.text import slugify
 from django.contrib.auth.hashers import make_password, check_password
+from BlogStudentsBUT.counters import fields_to_save
+
+
+class TagQuerySet(models.QuerySet):
+    """
+    A queryset for faculties.
+
+    Methods:
+        refresh_article_counts(): Recomputes the ``article_count`` counters with a single UPDATE.
+    """
+    def refresh_article_counts(self):
+        """
+        Sets ``article_count`` of the faculties to their real number of articles.
+
+        Returns:
+            int: The number of updated faculties.
+        """
+        through = Article.tags.through
+        counted = through.objects.filter(tag=models.OuterRef('pk')).order_by().values('tag')
+        counted = counted.annotate(total=models.Count('pk')).values('total')
+        return self.update(article_count=models.functions.Coalesce(models.Subquery(counted), 0))
 
 
 class Tag(models.Model):
@@ -12,27 +33,74 @@ class Tag(models.Model):
     Attributes:
         name (str): The name of the Faculty.
         slug (str): A URL-friendly, unique identifier generated from the name.
+        article_count (int): The number of articles of the faculty, shown next to the listing filters.
+            It is kept up to date by the signals, see ``articles.signals.countTaggedArticles``.
         created (datetime): The date and time when the faculty was created.
         id (UUID): A unique identifier for the faculty, generated automatically.
 
     Methods:
         save(*args, **kwargs): Overrides the save method to ensure the slug is generated from the name.
+            Saves of existing faculties leave ``article_count`` alone unless ``update_fields`` names it.
         __str__(): Returns the name of the faculty as its string representation.
     """
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True)
+    article_count = models.IntegerField(default=0, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
 
+    objects = TagQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         value = self.name
         self.slug = slugify(value, allow_unicode=True)
+        kwargs['update_fields'] = fields_to_save(self, ('article_count',), **kwargs)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
+class ArticleQuerySet(models.QuerySet):
+    """
+    A queryset for articles with helpers for the listing pages.
+
+    Methods:
+        for_listing(): Loads everything an article card needs in a fixed number of queries.
+        with_counted_reviews(): Annotates the real number of comments as ``counted_reviews``.
+        refresh_review_counts(): Recomputes the ``total_votes`` counters with a single UPDATE.
+    """
+    def for_listing(self):
+        """
+        Prepares the queryset for rendering article cards.
+
+        Returns:
+            QuerySet: The articles with the owner joined and the tags prefetched in one extra query.
+            The number of comments is read from the ``total_votes`` counter, so it needs no query.
+        """
+        return self.select_related('owner').prefetch_related('tags')
+
+    def with_counted_reviews(self):
+        """
+        Counts the comments of each article, bypassing the ``total_votes`` counter.
+
+        Returns:
+            QuerySet: The articles with the number of comments annotated as ``counted_reviews``.
+        """
+        return self.annotate(counted_reviews=models.Count('review', distinct=True))
+
+    def refresh_review_counts(self):
+        """
+        Sets ``total_votes`` of the articles to their real number of comments.
+
+        Returns:
+            int: The number of updated articles.
+        """
+        counted = Review.objects.filter(article=models.OuterRef('pk')).order_by().values('article')
+        counted = counted.annotate(total=models.Count('pk')).values('total')
+        return self.update(total_votes=models.functions.Coalesce(models.Subquery(counted), 0))
+
+
 class Article(models.Model):
     """
     A model representing an article.
@@ -42,13 +110,17 @@ class Article(models.Model):
         title (str): The title of the article.
         slug (str): A URL-friendly identifier for the article.
         image (ImageField): An optional image associated with the article. Defaults to 'article_img/default.jpg'.
+        image_width (int): The width of the stored image in pixels, set when the upload is normalized.
+        image_height (int): The height of the stored image in pixels, set when the upload is normalized.
         description (TextField): An optional description of the article.
         tags (ManyToManyField): A set of faculty associated with the article.
         total_votes (int): The total number of comments received by the article. Default value is 0.
+            It is kept up to date by the Review signals, see ``articles.signals.countReview``.
         votes_ratio (int): The ratio of votes the article has received. Defaults to 0. (Not used on the site!)
         demo_link (str): An optional demo link related to the article. (Not used on the site!)
         source_link (str): An optional source link related to the article.
         created (datetime): The date and time when the article was created.
+        updated (datetime): The date and time when the article or its faculties last changed.
         id (UUID): A unique identifier for the article, generated automatically.
         is_private (bool): A flag indicating if the article is private. Defaults to False.
         password (str): An optional password for the article. Can be null or blank.
@@ -57,25 +129,41 @@ class Article(models.Model):
         set_password(raw_password): Sets the password for the article using Django's password hashing.
         check_password(raw_password): Checks if a given raw password matches the article's password.
         save(*args, **kwargs): Overrides the save method to ensure passwords are hashed before saving.
+            Saves of existing articles leave ``total_votes`` alone unless ``update_fields`` names it,
+            see ``BlogStudentsBUT.counters.fields_to_save``.
         __str__(): Returns the title of the article as its string representation.
-        review_count(): Returns the count of reviews associated with the article.
+        review_count(): Returns the count of reviews associated with the article, read from ``total_votes``.
         reviewers(): Returns a queryset of IDs of the reviewers who have reviewed the article.
+
+    Meta:
+        indexes (list): An index for the cursor pagination of the listings by (created, id).
+            The slug needs no extra index, SlugField is indexed by default.
     """
     owner = models.ForeignKey(Profile, null=True, blank=True, on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
     slug = models.SlugField()
     image = models.ImageField(null=True, blank=True, default='article_img/default.jpg', upload_to='article_img')
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     description = models.TextField(null=True, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
-    total_votes = models.IntegerField(default=0, null=True,blank=True)
+    total_votes = models.IntegerField(default=0, editable=False)
     votes_ratio = models.IntegerField(default=0, null=True, blank=True)
     demo_link = models.CharField(max_length=500, null=True, blank=True)
     source_link = models.CharField(max_length=500, null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
     is_private = models.BooleanField(default=False)
     password = models.CharField(max_length=255, blank=True, null=True)
 
+    objects = ArticleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created', 'id'], name='article_created_id_idx'),
+        ]
+
     def set_password(self, raw_password):
         self.password = make_password(raw_password)
 
@@ -85,6 +173,7 @@ class Article(models.Model):
     def save(self, *args, **kwargs):
         if self.password and not self.password.startswith('pbkdf2_sha256$'):
             self.set_password(self.password)
+        kwargs['update_fields'] = fields_to_save(self, ('total_votes',), **kwargs)
         super(Article, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -92,7 +181,7 @@ class Article(models.Model):
 
     @property
     def review_count(self):
-        return self.review_set.count()
+        return self.total_votes
 
     @property
     def reviewers(self):
@@ -109,16 +198,28 @@ class Review(models.Model):
         article (ForeignKey): The article that the comment is associated with.
         body (TextField): The content of the comment. Can be null or blank.
         created (datetime): The date and time when the comment was created.
+        updated (datetime): The date and time when the comment was last saved.
         id (UUID): A unique identifier for the comment, generated automatically.
 
     Methods:
         __str__(): Returns a string representation of the comment, including the owner's profile and the associated article.
+
+    Meta:
+        ordering (list): Comments are shown in the order they were written.
+        indexes (list): An index matching the comments of one article in that order.
     """
     owner = models.ForeignKey(Profile, on_delete=models.CASCADE, null=True)
     article = models.ForeignKey(Article, on_delete=models.CASCADE)
     body = models.TextField(null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['article', 'created'], name='review_article_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.owner}'s review on {self.article}"
\ No newline at end of file
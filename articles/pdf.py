@@ -0,0 +1,255 @@
+import hashlib
+import os
+import shutil
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import render_to_string
+from xhtml2pdf import pisa
+
+from BlogStudentsBUT import thumbnails
+from tasks.models import Job
+from . import tasks
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff')
+
+
+class PDFRenderError(Exception):
+    """
+    Raised when xhtml2pdf reports errors while rendering an article.
+
+    Attributes:
+        err (int): The error count reported by pisa, None when the error comes from a failed render job.
+    """
+    def __init__(self, err, message=None):
+        super().__init__(message or f'We had some errors with code {err}')
+        self.err = err
+
+
+class PDFPending(Exception):
+    """
+    Raised when the PDF of an article is queued for rendering but not ready yet.
+    """
+
+
+def link_callback(uri, rel):
+    """
+    Converts URIs in the PDF generation HTML to the appropriate absolute file system paths.
+
+    Args:
+        uri (str): The URI that needs to be converted to a file path.
+        rel (str): A relative path, typically unused in this context.
+
+    Returns:
+        str: The absolute file system path corresponding to the given URI.
+
+    This function performs the following tasks:
+        1. Determines the base URL and root directory for static and media files from the Django settings.
+        2. Checks if the URI starts with the media or static URL, and converts it to the corresponding file system path.
+           Static files are looked up in ``STATIC_ROOT`` (with their hashed names once collected) and,
+           before ``collectstatic`` ran, in the static directories of the project and the apps.
+           Media images are replaced by their 'pdf' size variant (see ``print_image_name``), so pisa never
+           decodes a full-resolution upload.
+        3. If the URI does not match media or static URLs, returns the URI as is (for absolute URLs).
+        4. Raises an exception if the converted path does not correspond to an existing file.
+
+    Raises:
+        Exception: If the URI does not start with the media or static URL, or if the file does not exist at the converted path.
+    """
+    sUrl = settings.STATIC_URL  # Typically /static/
+    sRoot = settings.STATIC_ROOT  # Typically /var/www/example.com/static/
+    mUrl = settings.MEDIA_URL  # Typically /media/
+    mRoot = settings.MEDIA_ROOT  # Typically /var/www/example.com/media/
+
+    if uri.startswith(mUrl):
+        path = os.path.join(mRoot, print_image_name(uri.replace(mUrl, "")))
+    elif uri.startswith(sUrl):
+        name = uri.replace(sUrl, "")
+        path = os.path.join(sRoot, name)
+        if not os.path.isfile(path):
+            path = finders.find(name) or path  # not collected yet, e.g. in development
+    else:
+        return uri  # handle absolute uri (i.e. http://some.tld/foo.png)
+
+    if not os.path.isfile(path):
+        raise Exception(
+            'media URI must start with {} or {}'.format(sUrl, mUrl)
+        )
+    return path
+
+
+def print_image_name(name):
+    """
+    Returns the media name of the print-sized variant of an image.
+
+    Args:
+        name (str): The storage name of a media file.
+
+    Returns:
+        str: The name of the 'pdf' variant, scaled down to fit an A4 page at 150 DPI,
+        or ``name`` itself for other files and images that could not be converted.
+    """
+    if not name.lower().endswith(IMAGE_EXTENSIONS):
+        return name
+    return thumbnails.get_thumbnail(name, 'pdf') or name
+
+
+def pdf_version(article):
+    """
+    Computes a content hash identifying the rendered version of an article.
+
+    Args:
+        article (Article): The article to hash.
+
+    Returns:
+        str: A hex digest of the title, description, image name and update time.
+    """
+    digest = hashlib.sha256()
+    for part in (article.title, article.description or '', article.image.name if article.image else '',
+                 article.updated.isoformat() if article.updated else ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+def article_cache_dir(article_id):
+    return os.path.join(settings.PDF_CACHE_ROOT, str(article_id))
+
+
+def cached_pdf_path(article):
+    """
+    Returns the path where the current version of an article's PDF is stored.
+
+    Args:
+        article (Article): The article the PDF belongs to.
+
+    Returns:
+        str: ``PDF_CACHE_ROOT/<article id>/<version>.pdf``.
+    """
+    return os.path.join(article_cache_dir(article.id), f'{pdf_version(article)}.pdf')
+
+
+def render_pdf_html(article):
+    """
+    Renders the HTML that xhtml2pdf turns into the article's PDF.
+
+    The article image is referenced through its print-sized variant, which keeps the memory
+    used by a render bounded regardless of the size of the uploaded image.
+
+    Args:
+        article (Article): The article to render.
+
+    Returns:
+        str: The rendered 'articles/pdf_template.html' template.
+    """
+    image_path = os.path.join(settings.MEDIA_ROOT, print_image_name(article.image.name)) if article.image else None
+    return render_to_string('articles/pdf_template.html', {
+        'article': article,
+        'image_path': image_path,
+    })
+
+
+def write_pdf(html_content, path):
+    """
+    Renders HTML to a PDF file, replacing the target atomically.
+
+    The PDF is written to a temporary file next to the target and moved into place only when
+    rendering succeeded, so readers never see a partially written file.
+
+    Args:
+        html_content (str): The HTML to render.
+        path (str): The path of the PDF file to create.
+
+    Returns:
+        str: The path of the created file.
+
+    Raises:
+        PDFRenderError: If xhtml2pdf reports errors.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as dest:
+            pisa_status = pisa.CreatePDF(html_content, dest=dest, link_callback=link_callback)
+        if pisa_status.err:
+            raise PDFRenderError(pisa_status.err)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def render_key(article):
+    return f'pdf:{article.id}:{pdf_version(article)}'
+
+
+def submit_render(article):
+    """
+    Queues the rendering of an article's current PDF version as a background job.
+
+    Requests for the same version share a single job.
+
+    Args:
+        article (Article): The article to render.
+
+    Returns:
+        Job | None: The render job, see ``articles.tasks.render_pdf``, or None inside a transaction,
+        which queues the job when it commits.
+    """
+    return tasks.render_pdf.enqueue([str(article.id)], key=render_key(article))
+
+
+def get_pdf(article):
+    """
+    Returns the path of an article's PDF, queueing its rendering if it is not cached yet.
+
+    Args:
+        article (Article): The article to get the PDF for.
+
+    Returns:
+        str: The path of the cached PDF file.
+
+    Raises:
+        PDFPending: If the PDF is queued or being rendered by a worker, a later request
+            finds the file in the cache.
+        PDFRenderError: If the render job failed on its last attempt.
+    """
+    path = cached_pdf_path(article)
+    if os.path.isfile(path):
+        return path
+    job = submit_render(article)
+    if os.path.isfile(path):
+        return path
+    if job is not None and job.status == Job.FAILED:
+        raise PDFRenderError(None, job.error)
+    raise PDFPending
+
+
+def invalidate(article):
+    """
+    Removes outdated PDF versions of an article and, if ``PDF_PRERENDER`` is enabled,
+    queues the rendering of the current version as a background job.
+
+    Args:
+        article (Article): The article that was changed.
+    """
+    current = os.path.basename(cached_pdf_path(article))
+    directory = article_cache_dir(article.id)
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if not name.startswith(current):
+                os.remove(os.path.join(directory, name))
+    if settings.PDF_PRERENDER:
+        submit_render(article)
+
+
+def remove(article_id):
+    """
+    Removes all cached PDF versions of an article.
+
+    Args:
+        article_id (UUID): The ID of the deleted article.
+    """
+    shutil.rmtree(article_cache_dir(article_id), ignore_errors=True)
@@ -0,0 +1,199 @@
+import re
+import uuid
+
+from django.db import connection
+from django.utils.html import strip_tags
+
+FTS_TABLE = 'articles_article_fts'
+CHUNK_SIZE = 500
+
+# bm25() weights, in the column order of the FTS table.
+COLUMN_WEIGHTS = (0.0, 10.0, 1.0, 3.0, 5.0)
+
+_fts_databases = {}
+
+
+def fts_supported(conn=connection):
+    """
+    Checks whether the database behind a connection can host an FTS5 index.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to inspect.
+
+    Returns:
+        bool: True if the connection is SQLite and was compiled with FTS5.
+    """
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def fts_enabled(conn=connection):
+    """
+    Checks whether the full-text index table exists in the database.
+
+    The result is remembered per database name, so the check costs a query only once per process.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to inspect.
+
+    Returns:
+        bool: True if the FTS table is available for searching.
+    """
+    name = str(conn.settings_dict['NAME'])
+    if name not in _fts_databases:
+        _fts_databases[name] = conn.vendor == 'sqlite' and FTS_TABLE in conn.introspection.table_names()
+    return _fts_databases[name]
+
+
+def create_index(conn=connection):
+    """
+    Creates the FTS5 virtual table holding one row per article.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to create the table in.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "article_id UNINDEXED, title, description, owner_name, tags, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    _fts_databases.pop(str(conn.settings_dict['NAME']), None)
+
+
+def drop_index(conn=connection):
+    """
+    Drops the FTS5 virtual table.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to drop the table from.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _fts_databases.pop(str(conn.settings_dict['NAME']), None)
+
+
+def _select_rows(cursor, where='', params=()):
+    cursor.execute(
+        "SELECT a.id, a.title, a.description, p.name, group_concat(t.name, ' ') "
+        "FROM articles_article a "
+        "LEFT JOIN users_profile p ON p.id = a.owner_id "
+        "LEFT JOIN articles_article_tags at ON at.article_id = a.id "
+        "LEFT JOIN articles_tag t ON t.id = at.tag_id "
+        f"{where} GROUP BY a.id",
+        params,
+    )
+    return [
+        (article_id, title or '', strip_tags(description or ''), owner_name or '', tags or '')
+        for article_id, title, description, owner_name, tags in cursor.fetchall()
+    ]
+
+
+def _insert_rows(cursor, rows):
+    cursor.executemany(
+        f"INSERT INTO {FTS_TABLE} (article_id, title, description, owner_name, tags) VALUES (%s, %s, %s, %s, %s)",
+        rows,
+    )
+
+
+def rebuild_index(conn=connection):
+    """
+    Rebuilds the whole full-text index from the article, profile and tag tables.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+    """
+    if not fts_enabled(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        _insert_rows(cursor, _select_rows(cursor))
+
+
+def index_articles(article_ids, conn=connection):
+    """
+    Refreshes the index rows of the given articles.
+
+    Articles that no longer exist are simply removed from the index.
+
+    Args:
+        article_ids (iterable): Primary keys (UUID) of the articles to reindex.
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+    """
+    if not fts_enabled(conn):
+        return
+    keys = [uuid.UUID(str(pk)).hex for pk in article_ids]
+    with conn.cursor() as cursor:
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE article_id IN ({placeholders})", chunk)
+            _insert_rows(cursor, _select_rows(cursor, f"WHERE a.id IN ({placeholders})", chunk))
+
+
+def remove_articles(article_ids, conn=connection):
+    """
+    Removes the index rows of the given articles.
+
+    Args:
+        article_ids (iterable): Primary keys (UUID) of the articles to remove.
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+    """
+    if not fts_enabled(conn):
+        return
+    keys = [uuid.UUID(str(pk)).hex for pk in article_ids]
+    with conn.cursor() as cursor:
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE article_id IN ({placeholders})", chunk)
+
+
+def build_match_query(search_query):
+    """
+    Converts a free-text search query into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so the words are matched in any order and
+    partial words still find results, e.g. ``comp sci`` becomes ``"comp"* "sci"*``.
+
+    Args:
+        search_query (str): The search query entered by the user.
+
+    Returns:
+        str: The MATCH expression, or an empty string if the query has no words.
+    """
+    words = re.findall(r'\w+', search_query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def rank_articles(articles, search_query, conn=connection):
+    """
+    Narrows a queryset of articles to the matches of a search query, best match first.
+
+    The queryset is joined with the full-text index and ordered by bm25(). Matches in the title weigh
+    the most, followed by tags, the author's name and the description. The database counts and slices
+    every match, so a paginator over the result reports the real number of matches and pages through
+    all of them.
+
+    Args:
+        articles (QuerySet): The articles to search.
+        search_query (str): The search query entered by the user.
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+
+    Returns:
+        QuerySet | None: The matching articles ordered by relevance, or None if the index cannot
+        answer the query and the caller should fall back to a plain lookup.
+    """
+    match = build_match_query(search_query)
+    if not match or not fts_enabled(conn):
+        return None
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    return articles.extra(
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.article_id = {articles.model._meta.db_table}.id", f"{FTS_TABLE} MATCH %s"],
+        params=[match],
+        select={'search_rank': f"bm25({FTS_TABLE}, {weights})"},
+    ).order_by('search_rank')
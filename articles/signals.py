@@ -0,0 +1,363 @@
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.utils import timezone
+
+from users.models import Profile
+from BlogStudentsBUT import cache
+from .models import Article, Tag, Review
+from . import search, pdf, tasks
+
+
+def indexArticle(sender, instance, **kwargs):
+    """
+    Refreshes the full-text index row of an article after it is saved.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article): The article that was saved.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(indexArticle, sender=Article)
+    """
+    search.index_articles([instance.pk])
+
+
+def createArticleThumbnails(sender, instance, **kwargs):
+    """
+    Queues the creation of the missing size variants of an article's image after the article is saved.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article): The article that was saved.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(createArticleThumbnails, sender=Article)
+    """
+    if instance.image:
+        tasks.create_article_thumbnails.enqueue([str(instance.pk)], key=f'thumbnails:{instance.image.name}')
+
+
+def unindexArticle(sender, instance, **kwargs):
+    """
+    Removes an article from the full-text index after it is deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article): The article that was deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_delete.connect(unindexArticle, sender=Article)
+    """
+    search.remove_articles([instance.pk])
+
+
+def removeArticlePDFs(sender, instance, **kwargs):
+    """
+    Removes the cached PDFs of an article after it is deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article): The article that was deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_delete.connect(removeArticlePDFs, sender=Article)
+    """
+    pdf.remove(instance.pk)
+
+
+def indexArticleTags(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Refreshes the index rows of articles whose faculties were changed.
+
+    Args:
+        sender (type): The intermediate model of the Article.tags relation.
+        instance (Article | Tag): The instance whose relation was changed.
+        action (str): The type of change, only the ``post_*`` actions are handled.
+        reverse (bool): True if the change was made from the Tag side of the relation.
+        pk_set (set): The primary keys of the related objects that were added or removed.
+        **kwargs: Additional keyword arguments.
+
+    This function performs the following tasks:
+        1. Ignores the ``pre_*`` actions.
+        2. If the change was made from the Article side, reindexes that article.
+        3. If the change was made from the Tag side, reindexes the affected articles.
+           For ``post_clear`` the affected articles are the ones remembered by ``rememberTagArticles``.
+
+    Example:
+        m2m_changed.connect(indexArticleTags, sender=Article.tags.through)
+    """
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        search.index_articles([instance.pk])
+    elif action == 'post_clear':
+        search.index_articles(instance.__dict__.pop('_search_article_ids', []))
+    else:
+        search.index_articles(pk_set or [])
+
+
+def rememberTagArticles(sender, instance, action=None, **kwargs):
+    """
+    Stores the IDs of a faculty's articles before its relations are removed.
+
+    Deleting a tag or clearing it from the Tag side removes the m2m rows without naming the articles,
+    so the IDs are kept on the instance for ``reindexTagArticles`` and ``indexArticleTags``.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article | Tag): The instance that is about to lose its relations.
+        action (str): The type of m2m change, or None when sent by ``pre_delete``.
+        **kwargs: Additional keyword arguments.
+    """
+    if isinstance(instance, Tag) and action in (None, 'pre_clear'):
+        instance._search_article_ids = list(instance.article_set.values_list('id', flat=True))
+
+
+def reindexTagArticles(sender, instance, **kwargs):
+    """
+    Refreshes the index rows of all articles of a faculty after it is renamed or deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Tag): The tag that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(reindexTagArticles, sender=Tag)
+    """
+    article_ids = instance.__dict__.pop('_search_article_ids', None)
+    if article_ids is None:
+        article_ids = instance.article_set.values_list('id', flat=True)
+    search.index_articles(article_ids)
+
+
+def reindexOwnerArticles(sender, instance, created, **kwargs):
+    """
+    Refreshes the index rows of a profile's articles after the profile is saved, so that
+    searching by the author's name stays up to date.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Profile): The profile that was saved.
+        created (bool): A boolean indicating whether a new record was created.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(reindexOwnerArticles, sender=Profile)
+    """
+    if not created:
+        search.index_articles(instance.article_set.values_list('id', flat=True))
+
+
+def rememberArticleSlug(sender, instance, **kwargs):
+    """
+    Remembers the stored slug of an article before it is saved, so that the cached page
+    under the old address can be invalidated when the slug changes.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article): The article that is about to be saved.
+        **kwargs: Additional keyword arguments.
+    """
+    if not instance._state.adding:
+        instance._cached_slug = Article.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+def invalidateArticlePages(sender, instance, **kwargs):
+    """
+    Invalidates the cached pages showing an article after it is saved or deleted:
+    the listings, the article page (under the new and the old slug) and the owner's profile page.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article): The article that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(invalidateArticlePages, sender=Article)
+    """
+    namespaces = ['articles', f'article:{instance.slug}']
+    old_slug = instance.__dict__.pop('_cached_slug', None)
+    if old_slug and old_slug != instance.slug:
+        namespaces.append(f'article:{old_slug}')
+    owner = Profile.objects.filter(pk=instance.owner_id).values_list('username', flat=True).first()
+    if owner:
+        namespaces.append(f'profile:{owner}')
+    cache.bump(*namespaces)
+
+
+def countReview(sender, instance, created=True, **kwargs):
+    """
+    Keeps the ``total_votes`` comment counter of an article in sync when a comment is added or deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Review): The comment that was saved or deleted.
+        created (bool): Whether the comment was created, always True for post_delete.
+        **kwargs: Additional keyword arguments.
+
+    This function performs the following tasks:
+        1. Ignores saves of existing comments, which do not change the count.
+        2. Increments or decrements the counter with an ``F()`` expression, so concurrent
+           comments cannot overwrite each other's update.
+
+    Example:
+        post_save.connect(countReview, sender=Review)
+    """
+    if not created:
+        return
+    step = -1 if kwargs.get('signal') is post_delete else 1
+    Article.objects.filter(pk=instance.article_id).update(total_votes=F('total_votes') + step)
+
+
+def invalidateReviewPages(sender, instance, **kwargs):
+    """
+    Invalidates the cached pages showing a comment or the comment count after a comment
+    is saved or deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Review): The comment that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(invalidateReviewPages, sender=Review)
+    """
+    article = Article.objects.filter(pk=instance.article_id).values_list('slug', 'owner__username').first()
+    if article is None:
+        cache.bump('articles')
+        return
+    slug, owner = article
+    cache.bump('articles', f'article:{slug}', f'profile:{owner}')
+
+
+def invalidateTagPages(sender, instance, action=None, **kwargs):
+    """
+    Invalidates the cached pages showing faculty names after a faculty, or the faculties
+    of an article, change.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Tag | Article): The changed instance.
+        action (str): The m2m_changed action, None for post_save and post_delete.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(invalidateTagPages, sender=Tag)
+    """
+    if action is None or action.startswith('post_'):
+        cache.bump('tags')
+
+
+def touchTaggedArticles(sender, instance, action=None, reverse=False, pk_set=None, **kwargs):
+    """
+    Moves the ``updated`` time of articles forward when their faculties change, so the validators
+    of the article pages (see ``articles.utils.articleState``) change with them.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Tag | Article): The changed instance.
+        action (str): The m2m_changed action, None for post_save and pre_delete.
+        reverse (bool): True if the relation was changed from the Tag side.
+        pk_set (set): The primary keys of the related objects that were added or removed.
+        **kwargs: Additional keyword arguments.
+
+    This function performs the following tasks:
+        1. If a tag is renamed or about to be deleted, touches all of its articles.
+        2. If the faculties of an article change, touches the article.
+        3. If the articles of a tag change, touches the added or removed articles, or all articles
+           of the tag before it is cleared.
+
+    The articles are updated with a single query, which sends no signals.
+
+    Example:
+        m2m_changed.connect(touchTaggedArticles, sender=Article.tags.through)
+    """
+    if action is None or (reverse and action == 'pre_clear'):
+        articles = Article.objects.filter(tags=instance)
+    elif action.startswith('post_') and not reverse:
+        articles = Article.objects.filter(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        articles = Article.objects.filter(pk__in=pk_set or [])
+    else:
+        return
+    articles.update(updated=timezone.now())
+
+
+def countTaggedArticles(sender, instance, action=None, reverse=False, pk_set=None, **kwargs):
+    """
+    Keeps the ``article_count`` counters of the faculties in sync when articles are tagged,
+    untagged or deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Article | Tag): The changed instance.
+        action (str): The m2m_changed action, None for pre_delete of an article.
+        reverse (bool): True if the relation was changed from the Tag side.
+        pk_set (set): The primary keys of the related objects that were added or removed.
+        **kwargs: Additional keyword arguments.
+
+    This function performs the following tasks:
+        1. Before an article is deleted, decrements the counters of its faculties. The relation rows
+           are deleted with the article without an m2m_changed signal.
+        2. Before relations are removed or cleared, remembers which of them exist, because ``pk_set``
+           of a removal may name objects that were not related.
+        3. After relations are added, removed or cleared, moves the counters by the number of changed
+           relations with ``F()`` expressions, so concurrent changes cannot overwrite each other's update.
+           Django only passes the newly related objects to ``post_add``.
+
+    Example:
+        m2m_changed.connect(countTaggedArticles, sender=Article.tags.through)
+    """
+    if action is None:
+        Tag.objects.filter(article=instance).update(article_count=F('article_count') - 1)
+        return
+    if action in ('pre_remove', 'pre_clear'):
+        related = instance.article_set if reverse else instance.tags
+        if action == 'pre_remove':
+            related = related.filter(pk__in=pk_set or [])
+        instance._counted_ids = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_add':
+        changed, step = pk_set or [], 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, step = instance.__dict__.pop('_counted_ids', []), -1
+    else:
+        return
+    if not changed:
+        return
+    if reverse:
+        Tag.objects.filter(pk=instance.pk).update(article_count=F('article_count') + step * len(changed))
+    else:
+        Tag.objects.filter(pk__in=changed).update(article_count=F('article_count') + step)
+
+
+post_save.connect(indexArticle, sender=Article)
+post_save.connect(createArticleThumbnails, sender=Article)
+post_delete.connect(unindexArticle, sender=Article)
+post_delete.connect(removeArticlePDFs, sender=Article)
+m2m_changed.connect(rememberTagArticles, sender=Article.tags.through)
+m2m_changed.connect(indexArticleTags, sender=Article.tags.through)
+post_save.connect(reindexTagArticles, sender=Tag)
+pre_delete.connect(rememberTagArticles, sender=Tag)
+post_delete.connect(reindexTagArticles, sender=Tag)
+post_save.connect(reindexOwnerArticles, sender=Profile)
+pre_save.connect(rememberArticleSlug, sender=Article)
+post_save.connect(invalidateArticlePages, sender=Article)
+post_delete.connect(invalidateArticlePages, sender=Article)
+post_save.connect(countReview, sender=Review)
+post_delete.connect(countReview, sender=Review)
+post_save.connect(invalidateReviewPages, sender=Review)
+post_delete.connect(invalidateReviewPages, sender=Review)
+post_save.connect(invalidateTagPages, sender=Tag)
+post_delete.connect(invalidateTagPages, sender=Tag)
+m2m_changed.connect(invalidateTagPages, sender=Article.tags.through)
+post_save.connect(touchTaggedArticles, sender=Tag)
+pre_delete.connect(touchTaggedArticles, sender=Tag)
+m2m_changed.connect(touchTaggedArticles, sender=Article.tags.through)
+pre_delete.connect(countTaggedArticles, sender=Article)
+m2m_changed.connect(countTaggedArticles, sender=Article.tags.through)
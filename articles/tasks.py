@@ -0,0 +1,39 @@
+import os
+
+from BlogStudentsBUT import thumbnails
+from tasks.queue import task
+from . import pdf
+from .models import Article
+
+
+@task(max_attempts=3, retry_delay=10)
+def render_pdf(article_id):
+    """
+    Renders the current version of an article's PDF into the PDF cache.
+
+    Args:
+        article_id (str): The ID of the article. Deleted articles and versions that are
+            already cached are skipped.
+
+    Raises:
+        PDFRenderError: If xhtml2pdf reports errors, the job is then retried.
+    """
+    article = Article.objects.filter(pk=article_id).first()
+    if article is None:
+        return
+    path = pdf.cached_pdf_path(article)
+    if not os.path.isfile(path):
+        pdf.write_pdf(pdf.render_pdf_html(article), path)
+
+
+@task
+def create_article_thumbnails(article_id):
+    """
+    Creates the missing size variants of an article's image.
+
+    Args:
+        article_id (str): The ID of the article.
+    """
+    article = Article.objects.filter(pk=article_id).first()
+    if article is not None and article.image:
+        thumbnails.create_variants(article.image.name, article.image.storage)
@@ -1,8 +1,45 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, LiveServerTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections, transaction
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from io import StringIO
+from django.conf import settings
+from django.urls import reverse, resolve, clear_url_caches
+from django.http import HttpResponse
+from django.test import RequestFactory, AsyncRequestFactory
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+import gzip
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import sqlite3
+from contextlib import closing
 from .models import Article, Tag, Review
-from users.models import Profile
-from django.contrib.auth.models import User
+from . import pdf, access, search
+from BlogStudentsBUT import thumbnails, benchmark
+from BlogStudentsBUT import cache as page_cache
+from BlogStudentsBUT.profiling import RequestProfile
+from BlogStudentsBUT.database import sqlite_database
+from BlogStudentsBUT import routers
+from BlogStudentsBUT.staticfiles import StaticFilesApplication
+from BlogStudentsBUT.facets import filter_by_facets, MATCH_ALL
+from BlogStudentsBUT import autocomplete
+from PIL import Image
+from users.models import Profile, Skill
+from django.contrib.auth.models import User, AnonymousUser
+from django.http import Http404
+from . import async_views, views, urls
+from .forms import ArticleForm
+from BlogStudentsBUT.pagination import apaginate
+from tasks.models import Job
+from tasks import queue
 
 class ArticlesViewsTest(TestCase):
 
@@ -75,24 +112,1406 @@ class ArticlesViewsTest(TestCase):
         self.assertTemplateUsed(response, 'articles/delete_comment.html')
 
 
-class GeneratePDFTest(TestCase):
+# The render jobs are queued when the request's transaction commits, so the tests need real commits.
+class GeneratePDFTest(TransactionTestCase):
 
-    @classmethod
-    def setUpTestData(cls):
-        cls.user = User.objects.create_user(username='testuser', password='12345')
-        cls.profile, created = Profile.objects.get_or_create(user=cls.user)
-        cls.article = Article.objects.create(
-            owner=cls.profile,
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.profile, created = Profile.objects.get_or_create(user=self.user)
+        self.article = Article.objects.create(
+            owner=self.profile,
             title="Test Article",
             slug="test-article",
             description="A description of the test article",
             is_private=False
         )
-
-    def setUp(self):
         self.client = Client()
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        override = self.settings(PDF_CACHE_ROOT=cache_dir, PDF_PRERENDER=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def download(self):
+        response = self.client.get(reverse('generate_pdf', args=[self.article.slug]))
+        content = b''.join(response.streaming_content)
+        response.close()
+        return response, content
 
     def test_generate_pdf_view(self):
         response = self.client.get(reverse('generate_pdf', args=[self.article.slug]))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/pdf')
+        response.close()
+
+    def test_pdf_is_rendered_once_per_version(self):
+        with mock.patch('articles.pdf.pisa.CreatePDF', wraps=pdf.pisa.CreatePDF) as create_pdf:
+            first_response, first = self.download()
+            second_response, second = self.download()
+        self.assertEqual(create_pdf.call_count, 1)
+        self.assertTrue(first.startswith(b'%PDF'))
+        self.assertEqual(first, second)
+        self.assertIn('filename="test-article.pdf"', second_response['Content-Disposition'])
+
+    def test_changed_article_invalidates_cached_pdf(self):
+        self.download()
+        old_path = pdf.cached_pdf_path(self.article)
+
+        self.article.title = "Renamed Article"
+        self.article.save()
+        pdf.invalidate(self.article)
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertNotEqual(pdf.cached_pdf_path(self.article), old_path)
+        with mock.patch('articles.pdf.pisa.CreatePDF', wraps=pdf.pisa.CreatePDF) as create_pdf:
+            self.download()
+        self.assertEqual(create_pdf.call_count, 1)
+
+    def test_pdf_supports_range_requests(self):
+        response, content = self.download()
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        url = reverse('generate_pdf', args=[self.article.slug])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-3/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF')
+        response.close()
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), content[-10:])
+        response.close()
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_pdf_revalidation_and_if_range(self):
+        self.download()
+        response, content = self.download()
+        etag = response['ETag']
+        url = reverse('generate_pdf', args=[self.article.slug])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response.close()
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        response.close()
+
+    def test_pdf_embeds_print_sized_image(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        os.makedirs(os.path.join(media_root, 'article_img'))
+        Image.new('RGB', (4000, 3000), (30, 30, 200)).save(os.path.join(media_root, 'article_img', 'large.jpg'))
+
+        with self.settings(MEDIA_ROOT=media_root):
+            self.article.image = 'article_img/large.jpg'
+            html = pdf.render_pdf_html(self.article)
+            path = pdf.link_callback('/media/article_img/large.jpg', None)
+        self.assertIn('large.pdf.jpg', html)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (1240, 930))
+
+    @override_settings(TASKS_EAGER=False)
+    def test_download_queues_render_job(self):
+        url = reverse('generate_pdf', args=[self.article.slug])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.client.get(url)
+        self.assertEqual(Job.objects.filter(name='articles.tasks.render_pdf').count(), 1)
+
+        queue.work(burst=True)
+        response, content = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    def test_failed_render_job_is_reported(self):
+        with mock.patch('articles.pdf.pisa.CreatePDF', side_effect=pdf.PDFRenderError(3)):
+            response = self.client.get(reverse('generate_pdf', args=[self.article.slug]))
+        self.assertEqual(response.content, b'We had some errors with code 3')
+
+    def test_pending_render_returns_accepted(self):
+        with mock.patch('articles.pdf.get_pdf', side_effect=pdf.PDFPending):
+            response = self.client.get(reverse('generate_pdf', args=[self.article.slug]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+class ArticleSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='searchuser', password='12345', first_name='Marta')
+        cls.profile = cls.user.profile
+        cls.tag = Tag.objects.create(name="Computer Science")
+        cls.title_match = Article.objects.create(
+            owner=cls.profile,
+            title="Robotics club",
+            slug="robotics-club",
+            description="<p>Weekly meetings</p>",
+        )
+        cls.description_match = Article.objects.create(
+            owner=cls.profile,
+            title="Campus news",
+            slug="campus-news",
+            description="<p>The robotics lab is open again, bring C++ notes</p>",
+        )
+        cls.description_match.tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        response = self.client.get(reverse('articles'), {'search_query': query})
+        return list(response.context['articles'])
+
+    def test_search_ranks_title_matches_first(self):
+        self.assertEqual(self.search('robotics'), [self.title_match, self.description_match])
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual(self.search('robot'), [self.title_match, self.description_match])
+
+    def test_search_by_tag_and_owner_name(self):
+        self.assertEqual(self.search('computer'), [self.description_match])
+        self.assertEqual(len(self.search('marta')), 2)
+
+    def test_index_follows_updates(self):
+        self.tag.name = "Architecture"
+        self.tag.save()
+        self.profile.name = "Joanna"
+        self.profile.save()
+        self.title_match.title = "Chess club"
+        self.title_match.save()
+
+        self.assertEqual(self.search('architecture'), [self.description_match])
+        self.assertEqual(len(self.search('joanna')), 2)
+        self.assertEqual(self.search('chess'), [self.title_match])
+        self.assertEqual(self.search('computer'), [])
+
+    def test_index_follows_tag_changes_and_deletes(self):
+        self.description_match.tags.clear()
+        self.assertEqual(self.search('computer'), [])
+        self.tag.article_set.add(self.title_match)
+        self.assertEqual(self.search('computer'), [self.title_match])
+        self.title_match.delete()
+        self.assertEqual(self.search('computer'), [])
+
+    def test_search_without_words_falls_back(self):
+        self.assertEqual(self.search('++'), [self.description_match])
+
+    @override_settings(PAGINATION_CURSOR_THRESHOLD=1)
+    def test_search_pages_through_every_match(self):
+        for number in range(12):
+            Article.objects.create(owner=self.profile, title=f"Notes {number}", slug=f"notes-{number}",
+                                   description="<p>Robotics workshop</p>")
+
+        pages = [self.client.get(reverse('articles'), {'search_query': 'robotics', 'page': page}).context['articles']
+                 for page in (1, 2, 3)]
+        self.assertEqual(pages[0].paginator.count, 14)
+        self.assertEqual(pages[0][0], self.title_match)
+        self.assertEqual(len(pages[2]), 2)
+        self.assertEqual(len({article.pk for page in pages for article in page}), 14)
+
+
+class ArticleListingQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='listinguser', password='12345')
+        cls.profile = cls.user.profile
+        cls.tag = Tag.objects.create(name="Architecture")
+        cls.other_tag = Tag.objects.create(name="Civil Engineering")
+
+    def create_articles(self, count):
+        for number in range(count):
+            article = Article.objects.create(
+                owner=self.profile,
+                title=f"Listing article {number}",
+                slug=f"listing-article-{Article.objects.count()}",
+            )
+            article.tags.add(self.tag, self.other_tag)
+            Review.objects.create(owner=self.profile, article=article, body="Nice")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_listing_queries_do_not_grow_with_articles(self):
+        urls = [reverse('articles_main'), reverse('articles'), reverse('tag', args=[self.tag.slug])]
+        self.client.login(username='listinguser', password='12345')
+
+        self.create_articles(1)
+        for url in urls:
+            self.client.get(url)
+        expected = [self.count_queries(url) for url in urls]
+        self.create_articles(5)
+        self.assertEqual([self.count_queries(url) for url in urls], expected)
+
+    def test_listing_reads_review_count_from_counter(self):
+        self.create_articles(2)
+        response = self.client.get(reverse('articles'))
+        with self.assertNumQueries(0):
+            self.assertEqual([article.review_count for article in response.context['articles']], [1, 1])
+
+
+@override_settings(PAGINATION_CURSOR_THRESHOLD=1)
+class ArticleCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cursoruser', password='12345')
+        cls.articles = [
+            Article.objects.create(owner=cls.user.profile, title=f"Cursor article {number}", slug=f"cursor-{number}")
+            for number in range(15)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(PAGINATION_CURSOR_THRESHOLD=2)
+    def test_small_result_sets_keep_page_numbers(self):
+        response = self.client.get(reverse('articles_main'))
+        self.assertFalse(getattr(response.context['articles'], 'is_cursor', False))
+        self.assertEqual(list(response.context['custom_range']), [1, 2])
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        seen, pages, cursor = [], [], None
+        while True:
+            response = self.client.get(reverse('articles'), {'cursor': cursor} if cursor else {})
+            page = response.context['articles']
+            self.assertTrue(page.is_cursor)
+            pages.append(page)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        expected = sorted(self.articles, key=lambda article: (article.created, article.id))
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page) for page in pages], [6, 6, 3])
+        self.assertFalse(pages[0].has_previous())
+
+        response = self.client.get(reverse('articles'), {'cursor': pages[2].previous_cursor})
+        self.assertEqual(list(response.context['articles']), list(pages[1]))
+        self.assertContains(response, f"cursor={pages[1].next_cursor}")
+
+    def test_page_numbers_open_cursor_pages(self):
+        expected = sorted(self.articles, key=lambda article: (article.created, article.id))
+
+        page = self.client.get(reverse('articles'), {'page': 2}).context['articles']
+        self.assertTrue(page.is_cursor)
+        self.assertEqual(list(page), expected[6:12])
+        self.assertTrue(page.has_previous())
+        response = self.client.get(reverse('articles'), {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['articles']), expected[12:])
+        response = self.client.get(reverse('articles'), {'cursor': page.previous_cursor})
+        self.assertEqual(list(response.context['articles']), expected[:6])
+
+        page = self.client.get(reverse('articles'), {'page': 99}).context['articles']
+        self.assertEqual(list(page), expected[9:])
+        self.assertFalse(page.has_next())
+        self.assertEqual(list(self.client.get(reverse('articles'), {'page': 'x'}).context['articles']), expected[:6])
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('articles'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(len(response.context['articles']), 6)
+        self.assertFalse(response.context['articles'].has_previous())
+
+
+class ThumbnailTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(media_root, 'article_img'))
+        Image.new('RGB', (2000, 1500), (200, 30, 30)).save(os.path.join(media_root, 'article_img', 'photo.jpg'))
+        self.media_root = media_root
+        self.user = User.objects.create_user(username='thumbuser', password='12345')
+
+    def open_variant(self, name, variant):
+        variant_name = thumbnails.get_thumbnail(name, variant, generate=False)
+        self.assertIsNotNone(variant_name)
+        return Image.open(os.path.join(self.media_root, variant_name))
+
+    def test_variants_are_created_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.create(owner=self.user.profile, title="Photo", slug="photo", image='article_img/photo.jpg')
+
+        with self.open_variant('article_img/photo.jpg', 'card') as card:
+            self.assertEqual(card.size, (533, 400))
+        with self.open_variant('article_img/photo.jpg', 'avatar') as avatar:
+            self.assertEqual(avatar.size, (256, 256))
+        with self.open_variant('article_img/photo.jpg', 'pdf') as pdf_image:
+            self.assertEqual(pdf_image.format, 'JPEG')
+            self.assertEqual(pdf_image.size, (1240, 930))
+
+    def test_listing_uses_card_variant(self):
+        Article.objects.create(owner=self.user.profile, title="Photo", slug="photo", image='article_img/photo.jpg')
+        response = self.client.get(reverse('articles'))
+        card_name = thumbnails.get_thumbnail('article_img/photo.jpg', 'card', generate=False)
+        self.assertTrue(card_name.startswith('article_img/photo.card.'))
+        self.assertContains(response, f'/media/{card_name}')
+
+    def test_missing_image_falls_back_to_original(self):
+        article = Article.objects.create(owner=self.user.profile, title="Gone", slug="gone", image='article_img/gone.jpg')
+        self.assertEqual(thumbnails.thumbnail_url(article.image, 'card'), '/media/article_img/gone.jpg')
+
+
+def jpeg_upload(size, name='photo.jpg', orientation=None):
+    image = Image.new('RGB', size, (30, 120, 200))
+    exif = Image.Exif()
+    exif[0x0110] = 'Test Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageUploadTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader', password='12345')
+        cls.tag = Tag.objects.create(name="Upload Faculty")
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def form(self, image):
+        data = {'title': 'Uploaded', 'slug': 'uploaded', 'tag': self.tag.pk, 'description': 'Text'}
+        return ArticleForm(data, {'image': image})
+
+    def test_upload_is_scaled_rotated_and_stripped(self):
+        form = self.form(jpeg_upload((4000, 3000), orientation=6))
+        self.assertTrue(form.is_valid(), form.errors)
+        article = form.save(commit=False)
+        article.owner = self.user.profile
+        article.save()
+
+        self.assertEqual((article.image_width, article.image_height), (1536, 2048))
+        self.assertTrue(article.image.name.startswith('article_img/photo'))
+        with Image.open(article.image.path) as stored:
+            self.assertEqual(stored.size, (1536, 2048))
+            self.assertNotIn(0x0110, stored.getexif())
+        with mock.patch('articles.views.Image.open') as image_open:
+            self.assertEqual(views.get_image_size(article), (1536, 2048))
+        image_open.assert_not_called()
+
+    @override_settings(UPLOAD_IMAGE_MAX_PIXELS=10000)
+    def test_oversized_image_is_rejected(self):
+        form = self.form(jpeg_upload((200, 200)))
+        self.assertFalse(form.is_valid())
+        self.assertIn('too large', form.errors['image'][0])
+
+    def test_existing_images_are_normalized_by_command(self):
+        upload = jpeg_upload((3000, 1000), name='legacy.jpg')
+        article = Article.objects.create(owner=self.user.profile, title="Legacy", slug="legacy", image=upload)
+        original = article.image.path
+
+        out = StringIO()
+        call_command('normalize_images', stdout=out, stderr=StringIO())
+        self.assertIn('Normalized 1 images', out.getvalue())
+        article.refresh_from_db()
+        self.assertEqual((article.image_width, article.image_height), (2048, 683))
+        self.assertFalse(os.path.exists(original))
+        self.assertTrue(os.path.exists(article.image.path))
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='etaguser', password='12345')
+        cls.tag = Tag.objects.create(name="Validated Faculty")
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Validated article", slug="validated-article")
+        cls.article.tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_pages_carry_validators(self):
+        for url in (reverse('article', args=[self.article.slug]), reverse('tag', args=[self.tag.slug])):
+            response = self.client.get(url)
+            self.assertTrue(response.has_header('ETag'))
+            self.assertTrue(response.has_header('Last-Modified'))
+            self.assertIn('must-revalidate', response['Cache-Control'])
+
+    def test_revalidation_costs_one_query(self):
+        url = reverse('article', args=[self.article.slug])
+        etag = self.etag(url)
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_changes_change_the_validators(self):
+        url = reverse('article', args=[self.article.slug])
+        etag = self.etag(url)
+
+        review = Review.objects.create(owner=self.user.profile, article=self.article, body="New comment")
+        self.assertNotEqual(self.etag(url), etag)
+        etag = self.etag(url)
+        review.delete()
+        self.assertNotEqual(self.etag(url), etag)
+        etag = self.etag(url)
+
+        self.tag.name = "Renamed Validated Faculty"
+        self.tag.save()
+        self.assertNotEqual(self.etag(url), etag)
+
+        tag_url = reverse('tag', args=[self.tag.slug])
+        tag_etag = self.etag(tag_url)
+        Article.objects.create(owner=self.user.profile, title="Second article", slug="second").tags.add(self.tag)
+        self.assertNotEqual(self.etag(tag_url), tag_etag)
+
+    def test_logged_in_pages_depend_on_the_user(self):
+        url = reverse('article', args=[self.article.slug])
+        anonymous_etag = self.etag(url)
+        self.client.login(username='etaguser', password='12345')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], anonymous_etag)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_private_and_missing_articles_have_no_validators(self):
+        Article.objects.create(owner=self.user.profile, title="Hidden", slug="hidden", is_private=True)
+        self.assertFalse(self.client.get(reverse('article', args=['hidden'])).has_header('ETag'))
+        self.assertEqual(self.client.get(reverse('tag', args=['missing'])).status_code, 404)
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='asyncetag', password='12345')
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Async validated", slug="async-validated")
+
+    def setUp(self):
+        cache.clear()
+        # The URLs pick the async views when they are imported, see ASYNC_VIEWS.
+        self.addCleanup(self.reload_urls)
+        self.reload_urls()
+
+    def reload_urls(self):
+        importlib.reload(urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    async def test_async_article_page_answers_conditional_requests(self):
+        url = reverse('article', args=[self.article.slug])
+        self.assertIs(resolve(url).func, async_views.article)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('must-revalidate', response['Cache-Control'])
+
+        await cache.aclear()
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        await Review.objects.acreate(owner=self.user.profile, article=self.article, body="New comment")
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+
+class PageCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cacheuser', password='12345')
+        cls.tag = Tag.objects.create(name="Cached Faculty")
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Cached article", slug="cached-article")
+        cls.article.tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        for url in (reverse('articles'), reverse('article', args=[self.article.slug]),
+                    reverse('user_profile', args=['cacheuser'])):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_article_changes_invalidate_pages(self):
+        self.client.get(reverse('articles'))
+        self.client.get(reverse('article', args=[self.article.slug]))
+
+        self.article.title = "Renamed article"
+        self.article.save()
+        self.assertContains(self.client.get(reverse('articles')), "Renamed article")
+        self.assertContains(self.client.get(reverse('article', args=[self.article.slug])), "Renamed article")
+
+        Review.objects.create(owner=self.user.profile, article=self.article, body="Fresh comment")
+        self.assertContains(self.client.get(reverse('article', args=[self.article.slug])), "Fresh comment")
+
+        self.tag.name = "Renamed Faculty"
+        self.tag.save()
+        self.assertContains(self.client.get(reverse('articles')), "Renamed Faculty")
+
+    def test_profile_changes_invalidate_pages(self):
+        self.client.get(reverse('articles'))
+        profile = self.user.profile
+        profile.name = "New Author Name"
+        profile.save()
+        self.assertContains(self.client.get(reverse('articles')), "New Author Name")
+        self.assertContains(self.client.get(reverse('user_profile', args=['cacheuser'])), "New Author Name")
+
+    def test_username_change_invalidates_the_old_profile_page(self):
+        profile = Profile.objects.create(username='renamed-user', name="Renamed User")
+        old_url = reverse('user_profile', args=['renamed-user'])
+        self.assertEqual(self.client.get(old_url).status_code, 200)
+
+        profile.username = 'new-username'
+        profile.save()
+        with self.assertRaises(Profile.DoesNotExist):
+            self.client.get(old_url)
+
+    def test_profile_changes_hidden_from_articles_keep_article_pages(self):
+        profile = self.user.profile
+        with mock.patch('users.signals.cache.bump') as bump:
+            profile.bio = "A new bio"
+            profile.save()
+        self.assertEqual(bump.call_args.args, ('profiles', 'profile:cacheuser'))
+
+        with mock.patch('users.signals.cache.bump') as bump:
+            profile.name = "Another Name"
+            profile.save()
+        self.assertIn('article:cached-article', bump.call_args.args)
+
+    def test_bumped_versions_do_not_expire(self):
+        page_cache.bump('articles')
+        page_cache.bump('articles')
+        with mock.patch('time.time', return_value=time.time() + 24 * 3600):
+            self.assertEqual(page_cache.get_versions(['articles']), [3])
+
+    def test_increment_keeps_the_given_timeout(self):
+        self.assertEqual(page_cache.increment('counter', 1, 60), 1)
+        self.assertEqual(page_cache.increment('counter', 1, 60), 2)
+        with mock.patch('time.time', return_value=time.time() + 3600):
+            self.assertIsNone(cache.get('counter'))
+
+    def test_authenticated_and_private_pages_are_not_cached(self):
+        self.client.login(username='cacheuser', password='12345')
+        self.client.get(reverse('articles'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('articles'))
+        self.assertGreater(len(queries), 0)
+        self.client.logout()
+
+        private = Article.objects.create(owner=self.user.profile, title="Secret", slug="secret", is_private=True)
+        private.set_password('pass')
+        private.save()
+        self.client.cookies[access.cookie_name(private)] = access.make_token(private)
+        self.assertContains(self.client.get(reverse('article', args=['secret'])), "Secret")
+        self.client.cookies.clear()
+        self.assertTemplateUsed(self.client.get(reverse('article', args=['secret'])), 'articles/password_form.html')
+
+
+class ReviewCounterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='counteruser', password='12345')
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Counted", slug="counted")
+
+    def refresh(self):
+        self.article.refresh_from_db()
+        return self.article.total_votes
+
+    def test_counter_follows_reviews(self):
+        first = Review.objects.create(owner=self.user.profile, article=self.article, body="One")
+        Review.objects.create(owner=self.user.profile, article=self.article, body="Two")
+        self.assertEqual(self.refresh(), 2)
+
+        first.body = "Edited"
+        first.save()
+        self.assertEqual(self.refresh(), 2)
+
+        first.delete()
+        self.assertEqual(self.refresh(), 1)
+        self.assertEqual(self.article.review_count, 1)
+
+    def test_saving_a_loaded_article_keeps_newer_comments(self):
+        loaded = Article.objects.get(pk=self.article.pk)
+        Review.objects.create(owner=self.user.profile, article=self.article, body="Posted meanwhile")
+        loaded.title = "Edited"
+        loaded.save()
+        self.assertEqual(self.refresh(), 1)
+        self.assertEqual(self.article.title, "Edited")
+
+        loaded.total_votes = 5
+        loaded.save(update_fields=['total_votes'])
+        self.assertEqual(self.refresh(), 5)
+
+    def test_check_and_repair_commands(self):
+        Review.objects.create(owner=self.user.profile, article=self.article, body="One")
+        Article.objects.filter(pk=self.article.pk).update(total_votes=7)
+
+        with self.assertRaises(CommandError):
+            call_command('check_review_counts', stdout=StringIO())
+        call_command('check_review_counts', '--repair', stdout=StringIO())
+        self.assertEqual(self.refresh(), 1)
+        call_command('check_review_counts', stdout=StringIO())
+
+        Article.objects.update(total_votes=0)
+        call_command('backfill_review_counts', stdout=StringIO())
+        self.assertEqual(self.refresh(), 1)
+
+
+class FacetCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='facetuser', password='12345')
+        cls.science = Tag.objects.create(name="Science")
+        cls.arts = Tag.objects.create(name="Arts")
+        cls.both = Article.objects.create(owner=cls.user.profile, title="Both", slug="both")
+        cls.both.tags.add(cls.science, cls.arts)
+        cls.science_only = Article.objects.create(owner=cls.user.profile, title="Science only", slug="science-only")
+        cls.science_only.tags.add(cls.science)
+        cls.untagged = Article.objects.create(owner=cls.user.profile, title="Untagged", slug="untagged")
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return dict(Tag.objects.values_list('name', 'article_count'))
+
+    def test_counters_follow_relations(self):
+        self.assertEqual(self.counts(), {'Science': 2, 'Arts': 1})
+
+        self.both.tags.add(self.arts)
+        self.untagged.tags.remove(self.science)
+        self.assertEqual(self.counts(), {'Science': 2, 'Arts': 1})
+
+        self.arts.article_set.add(self.science_only, self.untagged)
+        self.assertEqual(self.counts(), {'Science': 2, 'Arts': 3})
+
+        self.science_only.tags.clear()
+        self.assertEqual(self.counts(), {'Science': 1, 'Arts': 2})
+
+        self.both.delete()
+        self.assertEqual(self.counts(), {'Science': 0, 'Arts': 1})
+
+        self.arts.article_set.clear()
+        self.assertEqual(self.counts(), {'Science': 0, 'Arts': 0})
+
+    def test_saving_a_loaded_faculty_keeps_newer_counts(self):
+        loaded = Tag.objects.get(pk=self.arts.pk)
+        self.untagged.tags.add(self.arts)
+        loaded.name = "Fine Arts"
+        loaded.save()
+        self.assertEqual(self.counts(), {'Science': 2, 'Fine Arts': 2})
+
+    def test_backfill_command(self):
+        Tag.objects.update(article_count=9)
+        call_command('backfill_facet_counts', stdout=StringIO())
+        self.assertEqual(self.counts(), {'Science': 2, 'Arts': 1})
+
+    def listed(self, *tags, match=None):
+        params = {'tag': [tag.slug for tag in tags]}
+        if match:
+            params['match'] = match
+        response = self.client.get(reverse('articles'), params)
+        return response, {article.title for article in response.context['articles']}
+
+    def test_listing_filters_by_any_or_all_tags(self):
+        response, titles = self.listed(self.science, self.arts)
+        self.assertEqual(titles, {"Both", "Science only"})
+        response, titles = self.listed(self.science, self.arts, match='all')
+        self.assertEqual(titles, {"Both"})
+        self.assertEqual(self.listed(self.arts, match='all')[1], {"Both"})
+        response = self.client.get(reverse('articles'), {'tag': ['arts', 'missing'], 'match': 'all'})
+        self.assertEqual(list(response.context['articles']), [])
+
+    def test_listing_shows_counts_and_toggle_links(self):
+        response, _ = self.listed(self.science)
+        facets = {facet['name']: facet for facet in response.context['facets']}
+        self.assertEqual((facets['Science']['count'], facets['Science']['selected']), (2, True))
+        self.assertEqual(facets['Arts']['query'], 'tag=science&tag=arts')
+        self.assertEqual(facets['Science']['query'], '')
+        self.assertEqual(response.context['facet_all_query'], 'tag=science&match=all')
+        self.assertContains(response, 'Arts <small>1</small>', html=False)
+
+    def test_tag_page_shows_counts(self):
+        response = self.client.get(reverse('tag', args=[self.arts.slug]))
+        self.assertEqual({article.title for article in response.context['articles']}, {"Both"})
+        self.assertContains(response, 'Science <small>2</small>', html=False)
+
+    def test_tag_page_etag_follows_other_counts(self):
+        url = reverse('tag', args=[self.arts.slug])
+        etag = self.client.get(url)['ETag']
+        self.untagged.tags.add(self.science)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_filter_uses_covering_index(self):
+        queryset = filter_by_facets(Article.objects.all(), 'tags', [self.science.pk, self.arts.pk], MATCH_ALL)
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('COVERING INDEX article_tags_tag_article_idx', plan)
+
+
+@override_settings(REVIEWS_PER_PAGE=5)
+class ReviewPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commenter', password='12345')
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Discussed", slug="discussed")
+        cls.others = [User.objects.create_user(username=f'reader{index}', password='12345') for index in range(3)]
+        for index in range(12):
+            Review.objects.create(owner=cls.others[index % 3].profile, article=cls.article, body=f"Comment {index:02}")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_article_page_shows_first_page_of_comments(self):
+        response = self.client.get(reverse('article', args=[self.article.slug]))
+        self.assertContains(response, 'Comment 04')
+        self.assertNotContains(response, 'Comment 05')
+        self.assertContains(response, reverse('article_comments', args=[self.article.slug]) + '?cursor=')
+
+    def test_page_queries_do_not_depend_on_comment_count(self):
+        url = reverse('article', args=[self.article.slug])
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for index in range(20):
+            Review.objects.create(owner=self.others[0].profile, article=self.article, body=f"Later {index}")
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(before), len(after))
+
+    def test_fragment_endpoint_follows_the_cursor(self):
+        bodies = []
+        url = reverse('article_comments', args=[self.article.slug])
+        while url:
+            response = self.client.get(url)
+            self.assertTemplateUsed(response, 'articles/review_list.html')
+            page = response.context['reviews']
+            bodies.extend(review.body for review in page)
+            url = f"{reverse('article_comments', args=[self.article.slug])}?cursor={page.next_cursor}" if page.has_next() else None
+        self.assertEqual(bodies, [f"Comment {index:02}" for index in range(12)])
+
+    def test_json_endpoint(self):
+        self.client.login(username='reader0', password='12345')
+        data = self.client.get(reverse('article_comments', args=[self.article.slug]), {'format': 'json'}).json()
+        self.assertEqual([review['body'] for review in data['reviews']], [f"Comment {index:02}" for index in range(5)])
+        self.assertEqual([review['editable'] for review in data['reviews']], [True, False, False, True, False])
+        self.assertEqual(data['reviews'][1]['username'], 'reader1')
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual(data['reviews'][0]['body'], "Comment 05")
+
+    def test_private_article_comments_need_access(self):
+        private = Article.objects.create(owner=self.user.profile, title="Closed", slug="closed", is_private=True,
+                                         password='secret')
+        self.assertEqual(self.client.get(reverse('article_comments', args=[private.slug])).status_code, 403)
+
+    def test_private_comments_are_not_cached_for_other_visitors(self):
+        private = Article.objects.create(owner=self.user.profile, title="Closed", slug="closed", is_private=True,
+                                         password='secret')
+        Review.objects.create(owner=self.others[0].profile, article=private, body="Members only")
+        url = reverse('article_comments', args=[private.slug])
+
+        reader = Client()
+        reader.post(reverse('article', args=[private.slug]), {'password': 'secret'}, follow=True)
+        for params in ({}, {'format': 'json'}):
+            response = reader.get(url, params)
+            self.assertContains(response, 'Members only')
+            self.assertEqual(self.client.get(url, params).status_code, 403)
+            self.assertIn('private', response['Cache-Control'])
+
+
+class PrivateArticleAccessTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='privateuser', password='12345')
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Hidden", slug="hidden",
+                                             is_private=True, password='secret')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('article', args=[self.article.slug])
+
+    def test_correct_password_grants_token(self):
+        response = self.client.post(self.url, {'password': 'secret'})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertIn(access.cookie_name(self.article), response.cookies)
+        self.assertTemplateUsed(self.client.get(self.url), 'articles/single_article.html')
+
+    def test_token_is_revoked_by_password_change(self):
+        self.client.post(self.url, {'password': 'secret'})
+        self.article.password = 'changed'
+        self.article.save()
+        self.assertTemplateUsed(self.client.get(self.url), 'articles/password_form.html')
+
+    def test_pdf_requires_token(self):
+        response = self.client.get(reverse('generate_pdf', args=[self.article.slug]))
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+
+    @override_settings(PRIVATE_ARTICLE_ATTEMPTS=2)
+    def test_attempts_are_throttled_without_hashing(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post(self.url, {'password': 'wrong'}).status_code, 200)
+
+        with mock.patch.object(Article, 'check_password') as check_password:
+            response = self.client.post(self.url, {'password': 'secret'})
+        self.assertEqual(response.status_code, 429)
+        check_password.assert_not_called()
+
+    @override_settings(PRIVATE_ARTICLE_ATTEMPTS=2, PRIVATE_ARTICLE_THROTTLE_WINDOW=900)
+    def test_throttle_lasts_for_the_whole_window(self):
+        for _ in range(2):
+            self.client.post(self.url, {'password': 'wrong'})
+
+        request = RequestFactory().get(self.url)
+        with mock.patch('time.time', return_value=time.time() + 600):
+            self.assertTrue(access.is_throttled(request, self.article))
+        with mock.patch('time.time', return_value=time.time() + 1000):
+            self.assertFalse(access.is_throttled(request, self.article))
+
+
+class BenchmarkHarnessTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        override = self.settings(PDF_CACHE_ROOT=cache_dir, PDF_PRERENDER=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_every_route_is_measured(self):
+        profile = benchmark.seed(30)
+        self.assertEqual(Article.objects.count(), 30)
+        self.assertEqual(Article.objects.get(slug='benchmark-article-0').total_votes, 1)
+
+        client = Client(raise_request_exception=False)
+        client.force_login(profile.user)
+        results = benchmark.run(client, profile, repeats=2)
+
+        self.assertEqual(list(results), benchmark.route_names())
+        self.assertEqual(results['article']['status'], 200)
+        self.assertGreater(results['article']['queries'], 0)
+
+    def test_regressions_are_reported(self):
+        baseline = {'1000': {'articles': {'status': 200, 'queries': 5, 'p50_ms': 10, 'p95_ms': 20, 'peak_kib': 100}}}
+        same = {'1000': {'articles': {'status': 200, 'queries': 5, 'p50_ms': 12, 'p95_ms': 24, 'peak_kib': 120}}}
+        worse = {'1000': {'articles': {'status': 200, 'queries': 6, 'p50_ms': 50, 'p95_ms': 90, 'peak_kib': 900}}}
+        failing = {'1000': {'articles': {'status': 500, 'queries': 1, 'p50_ms': 2, 'p95_ms': 3, 'peak_kib': 10}}}
+
+        self.assertEqual(benchmark.find_regressions(same, baseline), [])
+        self.assertEqual(len(benchmark.find_regressions(worse, baseline)), 3)
+        self.assertEqual(benchmark.find_regressions(failing, baseline), ['articles (1000): status 500, baseline 200'])
+        self.assertEqual(benchmark.find_regressions(worse, {}), [])
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_REPEATED_QUERY_THRESHOLD=2)
+class ProfilingMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='profiler', password='12345')
+        Article.objects.create(owner=cls.user.profile, title="Profiled", slug="profiled")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('BlogStudentsBUT.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('article', args=['profiled']))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries, \d+ duplicates", '
+                                                     r'tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'article')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+
+    def test_repeated_queries_are_reported(self):
+        profile = RequestProfile()
+        for pk in (1, 2, 2):
+            profile(lambda *args: None, 'SELECT * FROM x WHERE id = %s', (pk,), False, {})
+        self.assertEqual(profile.duplicates(), 1)
+        self.assertEqual(profile.repeated(2), [('SELECT * FROM x WHERE id = %s', 3)])
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_profiled(self):
+        response = self.client.get(reverse('article', args=['profiled']))
+        self.assertNotIn('Server-Timing', response)
+
+
+class SQLiteConcurrencyTest(SimpleTestCase):
+    alias = 'concurrency'
+    writers = 8
+    writes = 25
+
+    @classmethod
+    def setUpClass(cls):
+        # The database exists only for this test, so it is registered here instead of in DATABASES.
+        directory = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, directory, ignore_errors=True)
+        database = sqlite_database(os.path.join(directory, 'concurrency.sqlite3'))
+        connections.settings[cls.alias] = connections.configure_settings({
+            'default': connections.settings['default'], cls.alias: database,
+        })[cls.alias]
+        cls.addClassCleanup(connections.settings.pop, cls.alias)
+        cls.databases = {cls.alias}
+        super().setUpClass()
+
+    def setUp(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, total INTEGER NOT NULL)')
+            cursor.execute('CREATE TABLE review (id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT)')
+            cursor.execute('INSERT INTO counter (id, total) VALUES (1, 0)')
+        connections[self.alias].close()
+
+    def write(self, errors):
+        try:
+            for number in range(self.writes):
+                # Reads before it writes, which fails with "database is locked" under deferred transactions.
+                with transaction.atomic(using=self.alias), connections[self.alias].cursor() as cursor:
+                    cursor.execute('SELECT total FROM counter WHERE id = 1')
+                    total = cursor.fetchone()[0]
+                    cursor.execute('INSERT INTO review (body) VALUES (%s)', [f'comment {number}'])
+                    cursor.execute('UPDATE counter SET total = %s WHERE id = 1', [total + 1])
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connections[self.alias].close()
+
+    def test_parallel_writers(self):
+        errors = []
+        threads = [threading.Thread(target=self.write, args=(errors,)) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('SELECT total, (SELECT COUNT(*) FROM review) FROM counter')
+            self.assertEqual(cursor.fetchone(), (self.writers * self.writes, self.writers * self.writes))
+        connections[self.alias].close()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.router = routers.ReplicaRouter()
+
+    def route_read(self, request):
+        return routers.read_from_replica(lambda request: self.router.db_for_read(Article))(request)
+
+    def test_reads_of_decorated_views_go_to_replicas(self):
+        request = RequestFactory().get('/')
+        self.assertEqual(self.route_read(request), 'replica')
+        self.assertEqual(self.router.db_for_read(Article), 'default')
+        self.assertEqual(self.router.db_for_write(Article), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'articles'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.assertEqual(self.route_read(RequestFactory().get('/')), 'default')
+
+    def test_writes_pin_the_client_to_primary(self):
+        seen = []
+        middleware = routers.ReplicaPinningMiddleware(lambda request: seen.append(self.route_read(request)) or HttpResponse())
+
+        response = middleware(RequestFactory().post('/'))
+        self.assertIn('primary_pin', response.cookies)
+
+        pinned = RequestFactory().get('/')
+        pinned.COOKIES['primary_pin'] = '1'
+        middleware(pinned)
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(seen, ['default', 'default', 'replica'])
+
+    async def test_async_views_read_from_replicas(self):
+        @routers.read_from_replica
+        async def view(request):
+            return HttpResponse(self.router.db_for_read(Article))
+
+        async def get_response(request):
+            return await view(request)
+
+        middleware = routers.ReplicaPinningMiddleware(get_response)
+        request = AsyncRequestFactory().get('/')
+        response = await middleware(request)
+        self.assertEqual(response.content, b'replica')
+
+        response = await middleware(AsyncRequestFactory().post('/'))
+        self.assertEqual(response.content, b'default')
+        self.assertIn('primary_pin', response.cookies)
+
+
+class SyncReplicasTest(TransactionTestCase):
+
+    def test_sync_replicas_copies_the_primary(self):
+        Tag.objects.create(name="Replicated Faculty")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'replica.sqlite3')
+
+        call_command('sync_replicas', '--path', path, stdout=StringIO())
+        with closing(sqlite3.connect(path)) as replica:
+            names = [row[0] for row in replica.execute('SELECT name FROM articles_tag')]
+        self.assertIn("Replicated Faculty", names)
+
+
+class QueryPlanTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='12345')
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Planned", slug="planned")
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def test_article_lookup_by_slug_uses_index(self):
+        self.assertIn('(slug=?)', self.query_plan(Article.objects.filter(slug='planned')))
+
+    def test_listing_pagination_uses_index(self):
+        plan = self.query_plan(Article.objects.order_by('created', 'id')[:13])
+        self.assertIn('article_created_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_article_comments_use_index(self):
+        plan = self.query_plan(self.article.review_set.all())
+        self.assertIn('review_article_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class AsyncViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='asyncuser', password='12345')
+        cls.tag = Tag.objects.create(name="Async")
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Async Article", slug="async-article")
+        cls.article.tags.add(cls.tag)
+        Review.objects.create(owner=cls.user.profile, article=cls.article, body="Awaited comment")
+        cls.private = Article.objects.create(owner=cls.user.profile, title="Hidden", slug="hidden", is_private=True)
+        cls.private.set_password('secret')
+        cls.private.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def async_request(self, path, user=None):
+        request = AsyncRequestFactory().get(path)
+        request.user = user or AnonymousUser()
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    async def test_listing_matches_sync_view(self):
+        response = await async_views.articles(self.async_request(reverse('articles')))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Async Article')
+        self.assertContains(response, 'Hidden')
+
+    async def test_article_page_shows_tags_and_comments(self):
+        request = self.async_request(reverse('article', args=[self.article.slug]))
+        response = await async_views.article(request, article_slug=self.article.slug)
+        self.assertContains(response, 'Async')
+        self.assertContains(response, 'Awaited comment')
+
+    async def test_private_article_is_handed_to_sync_view(self):
+        request = self.async_request(reverse('article', args=[self.private.slug]))
+        response = await async_views.article(request, article_slug=self.private.slug)
+        self.assertContains(response, 'This article is private.')
+
+    async def test_missing_article_raises_404(self):
+        with self.assertRaises(Http404):
+            await async_views.article(self.async_request('/article/missing/'), article_slug='missing')
+
+    async def test_anonymous_pages_are_cached(self):
+        path = reverse('article', args=[self.article.slug])
+        await async_views.article(self.async_request(path), article_slug=self.article.slug)
+        await Article.objects.filter(pk=self.article.pk).aupdate(title="Renamed without signals")
+        response = await async_views.article(self.async_request(path), article_slug=self.article.slug)
+        self.assertContains(response, 'Async Article')
+
+        await Review.objects.acreate(owner=self.user.profile, article=self.article, body="Second comment")
+        response = await async_views.article(self.async_request(path), article_slug=self.article.slug)
+        self.assertContains(response, 'Second comment')
+
+    async def test_apaginate_falls_back_to_the_last_page(self):
+        request = self.async_request('/?page=99')
+        custom_range, page = await apaginate(request, Article.objects.order_by('created'), 1)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(custom_range), [1, 2])
+        self.assertIsInstance(page.object_list, list)
+
+
+class ServerLoadTest(LiveServerTestCase):
+
+    def test_load_counts_requests_and_errors(self):
+        result = benchmark.load(self.live_server_url, ['/articles/', '/missing-page/'], concurrency=2, duration=0.5)
+        self.assertGreater(result['requests'], 0)
+        self.assertGreater(result['errors'], 0)
+        self.assertGreater(result['rps'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+
+class StaticFilesPipelineTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.root, ignore_errors=True)
+        override = override_settings(STATIC_ROOT=cls.root, STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'BlogStudentsBUT.staticfiles.CompressedManifestStaticFilesStorage'},
+        })
+        override.enable()
+        cls.addClassCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root, 'staticfiles.json')) as manifest:
+            cls.hashed = json.load(manifest)['paths']['styles/style.css']
+
+    def request(self, path, **headers):
+        called = {}
+
+        def start_response(status, response_headers):
+            called['status'] = status
+            called['headers'] = dict(response_headers)
+
+        def django_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/html')])
+            return [b'django']
+
+        application = StaticFilesApplication(django_app)
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, **headers}
+        body = b''.join(application(environ, start_response))
+        return called['status'], called['headers'], body
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        self.assertRegex(self.hashed, r'^styles/style\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, self.hashed), 'rb') as original, \
+                gzip.open(os.path.join(self.root, self.hashed + '.gz')) as compressed:
+            self.assertEqual(original.read(), compressed.read())
+
+    def test_hashed_files_are_served_compressed_and_cached_forever(self):
+        status, headers, body = self.request('/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertIn(b'.auth', gzip.decompress(body))
+
+        status, headers, body = self.request('/static/' + self.hashed, HTTP_IF_NONE_MATCH=headers['ETag'],
+                                             HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+
+    def test_unhashed_and_unknown_paths(self):
+        status, headers, body = self.request('/static/styles/style.css')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertNotIn('immutable', headers['Cache-Control'])
+        self.assertEqual(self.request('/static/missing.css')[2], b'django')
+        self.assertEqual(self.request('/static/../manage.py')[2], b'django')
+        self.assertEqual(self.request('/articles/')[2], b'django')
+
+
+@override_settings(AUTOCOMPLETE_MAX_AGE=0)
+class AutocompleteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='wisniewska', password='12345', first_name='Łucja Wiśniewska')
+        cls.robotics = Tag.objects.create(name="Robotics Club")
+        Skill.objects.create(name='Computer Science', slug='computer-science')
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Building Robots", slug="building-robots")
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._indexes.clear()
+
+    def suggest(self, query):
+        response = self.client.get(reverse('autocomplete'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return {section: [item['label'] for item in items]
+                for section, items in response.json().items() if section != 'query'}
+
+    def test_suggests_every_section_by_word_prefix(self):
+        self.assertEqual(self.suggest('rob'), {'articles': ['Building Robots'], 'tags': ['Robotics Club'],
+                                               'profiles': [], 'skills': []})
+        self.assertEqual(self.suggest('łuc wis')['profiles'], ['Łucja Wiśniewska'])
+        self.assertEqual(self.suggest('sci comp')['skills'], ['Computer Science'])
+        self.assertEqual(self.suggest('robotx')['tags'], [])
+        self.assertEqual(self.suggest(' '), {'articles': [], 'tags': [], 'profiles': [], 'skills': []})
+
+        response = self.client.get(reverse('autocomplete'), {'q': 'build'})
+        self.assertEqual(response.json()['articles'], [{'label': 'Building Robots', 'url': '/article/building-robots/'}])
+
+    def test_lookups_run_no_query_once_built(self):
+        self.suggest('rob')
+        with self.assertNumQueries(0):
+            self.suggest('robo')
+
+    def test_changed_sections_are_rebuilt(self):
+        self.suggest('rob')
+        self.article.title = 'Flying Drones'
+        self.article.save()
+        with self.assertNumQueries(1):
+            suggestions = self.suggest('rob')
+        self.assertEqual(suggestions['articles'], [])
+        self.assertEqual(suggestions['tags'], ['Robotics Club'])
+        self.assertEqual(self.suggest('drone')['articles'], ['Flying Drones'])
+
+        cache.clear()
+        self.article.title = 'Swimming Robots'
+        self.article.save()
+        cache.clear()
+        self.assertEqual(self.suggest('swim')['articles'], ['Swimming Robots'])
+
+    @override_settings(AUTOCOMPLETE_MAX_AGE=60)
+    def test_answers_are_cacheable(self):
+        response = self.client.get(reverse('autocomplete'), {'q': 'rob'})
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        etag = response['ETag']
+
+        response = self.client.get(reverse('autocomplete'), {'q': 'rob'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get(reverse('autocomplete'), {'q': 'robo'})['ETag'], etag)
+
+        # Within AUTOCOMPLETE_MAX_AGE the index built before a change is still served, with its ETag.
+        Tag.objects.create(name="Robot Wars")
+        response = self.client.get(reverse('autocomplete'), {'q': 'rob'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class TransferCommandsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='12345', first_name='Ewa')
+        cls.tag = Tag.objects.create(name="Computer Science")
+        cls.article = Article.objects.create(owner=cls.user.profile, title="Robotics club", slug="robotics-club",
+                                             description="<p>Weekly meetings</p>", is_private=True, password='secret')
+        cls.article.tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def path(self, name, lines=None):
+        path = os.path.join(self.directory, name)
+        if lines is not None:
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write('\n'.join(lines) + '\n')
+        return path
+
+    def run_command(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command(*args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_export_and_import_round_trip(self):
+        created = self.article.created
+        for name in ('articles.ndjson', 'articles.csv'):
+            path = self.path(name)
+            self.run_command('export_articles', path)
+            Article.objects.filter(pk=self.article.pk).update(title='Changed', password=None)
+            self.article.tags.clear()
+
+            out, _ = self.run_command('import_articles', path, '--batch-size', '1')
+            self.assertIn('Created 0 articles, updated 1, skipped 0 rows.', out)
+            self.assertIn('rows/s', out)
+            article = Article.objects.get(pk=self.article.pk)
+            self.assertEqual((article.title, article.owner, article.created), ("Robotics club", self.user.profile, created))
+            self.assertTrue(article.check_password('secret'))
+            self.assertEqual(list(article.tags.all()), [self.tag])
+
+        with open(self.path('articles.csv'), encoding='utf-8') as stream:
+            self.assertEqual(stream.readline().strip(), ','.join(
+                ['id', 'title', 'slug', 'owner', 'description', 'source_link', 'demo_link', 'image',
+                 'is_private', 'password', 'created', 'tags']))
+
+    def test_import_creates_articles_and_skips_invalid_rows(self):
+        path = self.path('new.csv', [
+            'title,owner,tags,created,is_private',
+            'Flying drones,exporter,Computer Science|Aviation,2020-01-02T03:04:05+00:00,no',
+            'No owner,nobody,,,',
+            ',exporter,,,',
+            'Bad time,exporter,,yesterday,',
+        ])
+        out, err = self.run_command('import_articles', path)
+        self.assertIn('Created 2 articles, updated 0, skipped 2 rows.', out)
+        self.assertIn("Line 3: there is no profile 'nobody'", err)
+        self.assertIn('Line 4: skipped, title: This field cannot be blank.', err)
+        self.assertIn("Line 5: skipped, 'yesterday' is not a date and time.", err)
+
+        article = Article.objects.get(title="Flying drones")
+        self.assertEqual((article.slug, article.owner, article.is_private), ('flying-drones', self.user.profile, False))
+        self.assertEqual(article.created.isoformat(), '2020-01-02T03:04:05+00:00')
+        self.assertEqual(sorted(article.tags.values_list('name', 'slug')),
+                         [('Aviation', 'aviation'), ('Computer Science', 'computer-science')])
+        self.assertEqual(Tag.objects.get(name='Aviation').article_count, 1)
+        self.assertEqual(Tag.objects.get(pk=self.tag.pk).article_count, 2)
+        self.assertIsNone(Article.objects.get(title="No owner").owner)
+        self.assertIn(article, search.rank_articles(Article.objects.all(), 'drones'))
+
+    def test_import_copies_images_from_directory(self):
+        media_root = self.path('media')
+        images_dir = self.path('backup')
+        os.makedirs(os.path.join(images_dir, 'article_img'))
+        with open(os.path.join(images_dir, 'article_img', 'robot.jpg'), 'wb') as image:
+            image.write(jpeg_upload((20, 10)).read())
+        path = self.path('images.ndjson', [
+            json.dumps({'id': str(self.article.pk), 'image': 'article_img/robot.jpg'}),
+            json.dumps({'title': 'Escape', 'image': '../../etc/passwd'}),
+        ])
+
+        with self.settings(MEDIA_ROOT=media_root):
+            _, err = self.run_command('import_articles', path, '--images-dir', images_dir)
+            self.assertTrue(os.path.exists(os.path.join(media_root, 'article_img', 'robot.jpg')))
+        self.assertIn('Line 2: the image ../../etc/passwd was not found', err)
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.image.name, self.article.title), ('article_img/robot.jpg', "Robotics club"))
+        self.assertEqual(Article.objects.get(title='Escape').image.name, 'article_img/default.jpg')
@@ -1,6 +1,15 @@
-from .models import Article, Tag
-from django.db.models import Q
+import os
+from datetime import datetime, timezone
+
+from .models import Article, Tag, Review
+from django.db.models import Q, Count, Max, OuterRef, Subquery, Sum
+from . import search, pdf
+from BlogStudentsBUT.conditional import latest
+from BlogStudentsBUT.cache import get_versions
+from BlogStudentsBUT.facets import FacetFilter
+from django.conf import settings
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+from BlogStudentsBUT.pagination import CursorPaginator, use_cursor_pagination
 
 def paginateArticles(request, articles, results):
     """
@@ -14,22 +23,31 @@ def paginateArticles(request, articles, results):
     Returns:
         tuple: A tuple containing:
             - custom_range (range): A range of page numbers for pagination controls.
-            - articles (Page): A Page object containing the articles for the current page.
+            - articles (Page | CursorPage): A Page object containing the articles for the current page,
+              or a CursorPage when cursor pagination is used.
 
     This function performs the following tasks:
-        1. Retrieves the current page number from the request's GET parameters.
-        2. Initializes a Paginator object with the articles queryset and the specified number of results per page.
-        3. Tries to get the articles for the specified page:
+        1. Switches to cursor (keyset) pagination on ``(created, id)`` when ``use_cursor_pagination``
+           says so, i.e. for large result sets in their natural order or when a 'cursor' parameter is given.
+           The custom range is then empty and the page carries the next/previous cursor tokens.
+           A 'page' parameter without a cursor, e.g. from an older link, still opens that page.
+        2. Retrieves the current page number from the request's GET parameters.
+        3. Initializes a Paginator object with the articles queryset and the specified number of results per page.
+        4. Tries to get the articles for the specified page:
             a. If the page number is not an integer, defaults to the first page.
             b. If the page number is out of range, defaults to the last page.
-        4. Calculates the range of page numbers to display in pagination controls:
+        5. Calculates the range of page numbers to display in pagination controls:
             a. Ensures the left index is not less than 1.
             b. Ensures the right index does not exceed the total number of pages plus one.
-        5. Returns the custom range of page numbers and the Page object for the current page.
+        6. Returns the custom range of page numbers and the Page object for the current page.
 
     Example:
         >>> custom_range, articles = paginateArticles(request, articles, 10)
     """
+    if use_cursor_pagination(request, articles, results):
+        paginator = CursorPaginator(articles, results, keys=('created', 'id'))
+        return range(0), paginator.page(request.GET.get('cursor'), request.GET.get('page'))
+
     page = request.GET.get('page')
     paginator = Paginator(articles, results)
 
@@ -56,6 +74,36 @@ def paginateArticles(request, articles, results):
 
     return custom_range, articles
 
+def paginateReviews(article, cursor=None):
+    """
+    Returns one page of the comments of an article, oldest first.
+
+    Args:
+        article (Article): The article whose comments are paginated.
+        cursor (str): The token of the requested page, None for the first page.
+
+    Returns:
+        CursorPage: ``REVIEWS_PER_PAGE`` comments with their authors joined, so rendering them runs
+        no further query, and the token of the next page.
+
+    The comments are paginated by keyset on the (article, created) comment index, so the first page and
+    every following page cost one query however many comments the article has.
+    """
+    return reviewPaginator(article).page(cursor)
+
+
+async def apaginateReviews(article, cursor=None):
+    """
+    Async version of ``paginateReviews``.
+    """
+    return await reviewPaginator(article).apage(cursor)
+
+
+def reviewPaginator(article):
+    reviews = article.review_set.select_related('owner')
+    return CursorPaginator(reviews, settings.REVIEWS_PER_PAGE, keys=('created', 'id'))
+
+
 def searchArticles(request):
     """
     Searches for articles based on a search query from the request.
@@ -65,21 +113,24 @@ def searchArticles(request):
 
     Returns:
         tuple: A tuple containing:
-            - articles (QuerySet): A queryset of articles matching the search query.
+            - articles (QuerySet): A queryset of articles matching the search query, best match first.
             - search_query (str): The search query string used for filtering articles.
 
     This function performs the following tasks:
         1. Initializes an empty search query string.
         2. Checks if a 'search_query' parameter is present in the GET request:
             a. If present, sets the search query to the value of this parameter.
-        3. Filters tags based on the search query using a case-insensitive containment lookup.
-        4. Filters articles based on the search query and associated tags:
+        3. If the search query is empty, returns all articles.
+        4. Joins the articles with the full-text index (see ``articles.search.rank_articles``),
+           which covers the title, description, owner's name and faculty names, ranked by relevance.
+           Every match is kept, so the paginator counts and pages through all of them.
+        5. Returns the matching articles in the ranked order and the search query string.
+        6. If the full-text index is not available (e.g. the database is not SQLite), falls back to
+           filtering with case-insensitive containment lookups:
             a. Matches articles where the title contains the search query.
             b. Matches articles where the description contains the search query.
             c. Matches articles where the owner's name contains the search query.
             d. Matches articles that have tags matching the search query.
-        5. Ensures that the resulting article queryset is distinct to avoid duplicate results.
-        6. Returns the filtered articles queryset and the search query string.
 
     Example:
         >>> articles, search_query = searchArticles(request)
@@ -90,6 +141,14 @@ def searchArticles(request):
     if request.GET.get('search_query'):
         search_query = request.GET.get('search_query')
 
+    if not search_query:
+        return Article.objects.all(), search_query
+
+    articles = search.rank_articles(Article.objects.all(), search_query)
+
+    if articles is not None:
+        return articles, search_query
+
     tags = Tag.objects.filter(name__icontains=search_query)
 
     articles = Article.objects.distinct().filter(
@@ -98,4 +157,117 @@ def searchArticles(request):
         Q(owner__name__icontains=search_query) |
         Q(tags__in=tags)
     )
-    return articles, search_query
\ No newline at end of file
+    return articles, search_query
+
+
+def filterArticlesByTags(request, articles, selected=None):
+    """
+    Filters articles by the faculties chosen in the 'tag' parameters of the request.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        articles (QuerySet): The queryset of articles to be filtered.
+        selected (list): The slugs to filter by instead of the request's parameters, e.g. the faculty of
+            ``articles_by_tag``.
+
+    Returns:
+        tuple: A tuple containing:
+            - articles (QuerySet): The articles of any, or with 'match=all' of all, chosen faculties.
+            - context (dict): The faculty filters for the template, see ``BlogStudentsBUT.facets.FacetFilter.context``.
+
+    The faculties are loaded with one query, their article counts are read from the ``article_count``
+    counters and the articles are filtered with a subquery on the relation table's index.
+
+    Example:
+        >>> articles, facets = filterArticlesByTags(request, articles)
+    """
+    facets = FacetFilter(request, Tag.objects.order_by('name'), 'tags', 'tag', 'article_count', selected)
+    return facets.filter(articles), facets.context()
+
+
+def articleState(request, article_slug):
+    """
+    Returns the state of an article page for ``BlogStudentsBUT.conditional.conditional_page``.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        article_slug (str): The slug identifier of the article.
+
+    Returns:
+        tuple | None: The time of the latest change and the values the page depends on,
+        or None for missing and private articles, whose pages are always built.
+
+    This function performs the following tasks:
+        1. Reads the article's update time, comment count and privacy flag, the update time of its owner,
+           and the latest update times of its comments and of their authors with one query.
+           The comment times are read with subqueries on the (article, created) comment index,
+           no comment row is loaded.
+        2. Faculty changes move the article's update time forward (see ``articles.signals.touchTaggedArticles``)
+           and deleted comments change the comment count, so every change of the page changes the state.
+    """
+    reviews = Review.objects.filter(article=OuterRef('pk')).order_by().values('article')
+    state = (Article.objects.filter(slug=article_slug)
+             .values('id', 'is_private', 'updated', 'total_votes', 'owner__updated')
+             .annotate(reviews_updated=Subquery(reviews.annotate(latest=Max('updated')).values('latest')),
+                       reviewers_updated=Subquery(reviews.annotate(latest=Max('owner__updated')).values('latest')))
+             .first())
+    if state is None or state['is_private']:
+        return None
+    last_modified = latest(state['updated'], state['owner__updated'],
+                           state['reviews_updated'], state['reviewers_updated'])
+    return last_modified, list(state.values())
+
+
+def tagState(request, tag_slug):
+    """
+    Returns the state of the article listing of a faculty for ``BlogStudentsBUT.conditional.conditional_page``.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        tag_slug (str): The slug identifier of the faculty.
+
+    Returns:
+        tuple | None: The time of the latest change and the values the page depends on,
+        or None for missing faculties.
+
+    The number of articles, their comment count and the latest update times of the articles and
+    of their owners are aggregated with one query. The page also shows the article counts of all
+    faculties, so the cache versions of the 'articles' and 'tags' namespaces, which the signals bump
+    whenever a counter moves, are part of the state.
+    """
+    state = (Tag.objects.filter(slug=tag_slug)
+             .values('id', 'name')
+             .annotate(articles_updated=Max('article__updated'), owners_updated=Max('article__owner__updated'),
+                       article_count=Count('article'), comment_count=Sum('article__total_votes'))
+             .first())
+    if state is None:
+        return None
+    return latest(state['articles_updated'], state['owners_updated']), [*state.values(), *get_versions(['articles', 'tags'])]
+
+
+def articlePDFState(request, article_slug):
+    """
+    Returns the state of the PDF download of an article for ``BlogStudentsBUT.conditional.conditional_page``.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        article_slug (str): The slug identifier of the article.
+
+    Returns:
+        tuple | None: The modification time of the cached PDF and the values identifying the file,
+        or None for missing and private articles and for PDFs that are not rendered yet.
+
+    The article fields that make up the PDF version are read with one query. The state includes the
+    size and modification time of the file, so a re-rendered PDF never answers a Range request
+    that started with another file.
+    """
+    article = (Article.objects.filter(slug=article_slug)
+               .only('id', 'is_private', 'title', 'description', 'image', 'updated').first())
+    if article is None or article.is_private:
+        return None
+    try:
+        stat = os.stat(pdf.cached_pdf_path(article))
+    except FileNotFoundError:
+        return None
+    modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+    return modified, [str(article.id), pdf.pdf_version(article), stat.st_size, stat.st_mtime_ns]
@@ -1,12 +1,13 @@
 import articles
 from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from .models import Article, Tag, Review
 from .forms import ArticleForm, ReviewForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core import paginator
-from .utils import paginateArticles, searchArticles
+from .utils import paginateArticles, paginateReviews, searchArticles, filterArticlesByTags, articleState, tagState, articlePDFState
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
@@ -15,10 +16,23 @@ import os
 from PIL import Image
 from xhtml2pdf import pisa
 from django.template.loader import render_to_string
-from django.http import HttpResponse, HttpResponseServerError
+from django.http import HttpResponse, HttpResponseServerError, HttpResponseForbidden, JsonResponse
 from django.core.paginator import Paginator
-
-
+from . import pdf, access
+from .pdf import link_callback
+from BlogStudentsBUT.thumbnails import thumbnail_url
+from django.utils.cache import patch_cache_control
+from BlogStudentsBUT.cache import cache_anonymous_page
+from BlogStudentsBUT.conditional import conditional_page
+from BlogStudentsBUT.ranges import ranged_file_response
+from BlogStudentsBUT.routers import read_from_replica
+from BlogStudentsBUT.autocomplete import suggest
+from BlogStudentsBUT.conditional import make_etag
+from django.utils.cache import get_conditional_response
+
+
+@cache_anonymous_page('articles', 'tags')
+@read_from_replica
 def articles_main(request):
     """
     Handles the main view for displaying articles with pagination functionality.
@@ -31,15 +45,20 @@ def articles_main(request):
 
     This view function performs the following tasks:
         1. Paginates the retrieved articles using the paginateArticles function, displaying 12 articles per page.
+           The articles are loaded with ``for_listing()``, so the cards do not query the owner, tags or comment count.
         2. Prepares the context with the articles, search query, and custom pagination range.
-        3. Renders the 'articles/articles_main.html' template with the context.  
+        3. Renders the 'articles/articles_main.html' template with the context.
+
+    Pages of anonymous visitors are cached until an article, comment or faculty changes.
     """
     articles, search_query = searchArticles(request)
-    custom_range, articles = paginateArticles(request, articles, 12)
+    custom_range, articles = paginateArticles(request, articles.for_listing(), 12)
     context = {'articles': articles, 'search_query': search_query, 'custom_range': custom_range}
     return render(request, 'articles/articles_main.html', context)
 
 
+@cache_anonymous_page('articles', 'tags')
+@read_from_replica
 def articles(request):
     """
     Handles the main view for displaying articles with search and pagination functionality.
@@ -52,16 +71,26 @@ def articles(request):
 
     This view function performs the following tasks:
         1. Retrieves articles based on a search query using the searchArticles function.
-        2. Paginates the retrieved articles using the paginateArticles function, displaying 12 articles per page.
-        3. Prepares the context with the articles, search query, and custom pagination range.
-        4. Renders the 'articles/articles_main.html' template with the context.
+        2. Keeps the articles of the faculties chosen with 'tag' parameters, of any of them or with 'match=all'
+           of all of them, using the filterArticlesByTags function.
+        3. Paginates the retrieved articles using the paginateArticles function, displaying 6 articles per page.
+           The articles are loaded with ``for_listing()``, so the cards do not query the owner, tags or comment count.
+        4. Prepares the context with the articles, search query, custom pagination range and the faculty
+           filters with their article counts.
+        5. Renders the 'articles/articles_main.html' template with the context.
+
+    Pages of anonymous visitors are cached until an article, comment or faculty changes.
     """
     articles, search_query = searchArticles(request)
-    custom_range, articles = paginateArticles(request, articles, 6)
-    context = {'articles': articles, 'search_query': search_query, 'custom_range': custom_range}
+    articles, facets = filterArticlesByTags(request, articles)
+    custom_range, articles = paginateArticles(request, articles.for_listing(), 6)
+    context = {'articles': articles, 'search_query': search_query, 'custom_range': custom_range, **facets}
     return render(request, 'articles/articles.html', context)
 
 
+@cache_anonymous_page('tags', lambda request, article_slug: f'article:{article_slug}')
+@read_from_replica
+@conditional_page(articleState)
 def article(request, article_slug):
     """
     Handles the view for displaying a single article, including handling private articles and comments.
@@ -75,29 +104,45 @@ def article(request, article_slug):
 
     This view function performs the following tasks:
         1. Retrieves the article based on the provided slug or returns a 404 if not found.
-        2. Fetches all tags associated with the article.
+        2. Fetches all tags associated with the article and the first page of its comments together with
+           their authors (see ``paginateReviews``), the following pages are loaded from ``article_comments``.
         3. Initializes a blank review form.
-        4. If the article is private and the session does not have authorization, it checks the password:
-            a. If the password is correct, sets the session authorization and redirects to the article.
+        4. If the article is private and the request has no valid access token, it checks the password
+           with ``access.verify_password``, which limits the attempts per IP address:
+            a. If the password is correct, sets a signed access token cookie and redirects to the article.
             b. If the password is incorrect or not provided, renders the password form.
+            c. If the client made too many attempts, renders the password form with a 429 status
+               without checking the password.
         5. If a comment is posted, validates the form and saves the review, associating it with the article and the user.
         6. Renders the article with its details, tags, and the review form.
+           Pages of public articles are cached for anonymous visitors until the article changes,
+           pages of private articles are marked private so they are never shared.
+
+    Pages of public articles carry an ETag and a Last-Modified header computed by ``articleState``,
+    revalidation requests are answered with 304 Not Modified without building the page.
 
     The context for rendering the templates includes:
         - article: The article object.
         - form: The review form.
         - tags: The tags associated with the article.
+        - reviews: The first page of the comments of the article, oldest first.
     """
     article = get_object_or_404(Article, slug=article_slug)
     tags = article.tags.all()
     form = ReviewForm()
 
-    if article.is_private and not request.session.get(article_slug + '_auth'):
+    if article.is_private and not access.has_access(request, article):
         if request.method == 'POST' and 'password' in request.POST:
-            if article.check_password(request.POST['password']):
-                request.session[article_slug + '_auth'] = True
+            try:
+                verified = access.verify_password(request, article, request.POST['password'])
+            except access.AccessThrottled as error:
+                messages.error(request, str(error))
+                response = render(request, 'articles/password_form.html', {'article': article}, status=429)
+                response['Retry-After'] = str(error.retry_after)
+                return response
+            if verified:
                 messages.success(request, 'Password correct, you can now view the article.')
-                return redirect('article', article_slug=article_slug)
+                return access.grant_access(redirect('article', article_slug=article_slug), article)
             else:
                 messages.error(request, 'Incorrect password')
                 return render(request, 'articles/password_form.html', {'article': article})
@@ -113,7 +158,94 @@ def article(request, article_slug):
             messages.success(request, 'Your comment has been added!')
             return redirect('article', article_slug=article.slug)
 
-    return render(request, 'articles/single_article.html', {'article': article, 'form': form, 'tags': tags})
+    context = {'article': article, 'form': form, 'tags': tags, 'reviews': paginateReviews(article)}
+    response = render(request, 'articles/single_article.html', context)
+    if article.is_private:
+        patch_cache_control(response, private=True)
+    return response
+
+
+@cache_anonymous_page(lambda request, article_slug: f'article:{article_slug}')
+@read_from_replica
+def article_comments(request, article_slug):
+    """
+    Returns a further page of the comments of an article, for the "Load more comments" link.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        article_slug (str): The slug identifier for the article.
+
+    Returns:
+        HttpResponse | JsonResponse: The rendered comments as an HTML fragment, or as JSON
+        if the request asks for ``?format=json``.
+
+    This view function performs the following tasks:
+        1. Retrieves the article or returns a 404, and refuses private articles without an access token.
+        2. Fetches the page of comments that the 'cursor' parameter points to with ``paginateReviews``.
+        3. Renders the 'articles/review_list.html' fragment, which ends with the link to the next page,
+           or returns the comments and the URL of the next page as JSON:
+            - reviews: A list of objects with the id, body, created time, author name, username and avatar URL,
+              and whether the current user may edit the comment.
+            - next: The URL of the next page, or null on the last page.
+        4. Marks the responses for private articles as private, so that the page cache does not hand
+           comments seen with an access token to visitors without one.
+    """
+    article = get_object_or_404(Article, slug=article_slug)
+    if article.is_private and not access.has_access(request, article):
+        return HttpResponseForbidden()
+
+    reviews = paginateReviews(article, request.GET.get('cursor'))
+    if request.GET.get('format') != 'json':
+        response = render(request, 'articles/review_list.html', {'article': article, 'reviews': reviews})
+    else:
+        profile_id = request.user.profile.id if request.user.is_authenticated else None
+        next_url = None
+        if reviews.has_next():
+            next_url = f"{reverse('article_comments', args=[article.slug])}?format=json&cursor={reviews.next_cursor}"
+        response = JsonResponse({
+            'reviews': [{
+                'id': str(review.id),
+                'body': review.body,
+                'created': review.created.isoformat(),
+                'author': review.owner.name if review.owner else None,
+                'username': review.owner.username if review.owner else None,
+                'avatar': thumbnail_url(review.owner.image, 'avatar') if review.owner else '',
+                'editable': profile_id is not None and review.owner_id == profile_id,
+            } for review in reviews],
+            'next': next_url,
+        })
+    if article.is_private:
+        # Only visitors with an access token get here, so the page must not be shared with the others.
+        patch_cache_control(response, private=True)
+    return response
+
+
+def autocomplete(request):
+    """
+    Suggests articles, faculties, profiles and skills while a search query is typed.
+
+    Args:
+        request (HttpRequest): The HTTP request object, its 'q' parameter holds the typed text.
+
+    Returns:
+        JsonResponse | HttpResponseNotModified: The suggestions as JSON, or 304 Not Modified if the
+        client already has them.
+
+    This view function performs the following tasks:
+        1. Looks the words of the query up in the in-memory prefix indexes with
+           ``BlogStudentsBUT.autocomplete.suggest``. The indexes are rebuilt from the primary
+           database when the signals bump their cache namespaces, so no query runs otherwise.
+        2. Returns the query and, for each of 'articles', 'tags', 'profiles' and 'skills', a list
+           of objects with the 'label' and 'url' of up to ``AUTOCOMPLETE_LIMIT`` suggestions.
+        3. Marks the response public for ``AUTOCOMPLETE_MAX_AGE`` seconds, with an ETag built from
+           the query and the namespace versions, so a changed index gives a new ETag.
+    """
+    query = request.GET.get('q', '')
+    suggestions, versions = suggest(query)
+    response = JsonResponse({'query': query, **suggestions})
+    response['ETag'] = f'"{make_etag(query, versions)}"'
+    patch_cache_control(response, public=True, max_age=settings.AUTOCOMPLETE_MAX_AGE)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
 
 
 @login_required(login_url="login")
@@ -178,7 +310,8 @@ def updateArticle(request, pk):
             a. If the form is valid:
                 i. Saves the updated article instance.
                 ii. Clears existing tags and adds the new tags from the form.
-                iii. Redirects to the user's account page.
+                iii. Drops the outdated cached PDFs of the article and schedules rendering the new version.
+                iv. Redirects to the user's account page.
             b. If the form is invalid, it continues to render the form with errors.
         5. Renders the article form template with the form and article context.
 
@@ -196,6 +329,7 @@ def updateArticle(request, pk):
             article = form.save()
             article.tags.clear()
             article.tags.add(form.cleaned_data['tag'])
+            pdf.invalidate(article)
 
             return redirect('account')
 
@@ -233,6 +367,8 @@ def deleteArticle(request, pk):
     return render(request, 'delete_template.html', context)
 
 
+@read_from_replica
+@conditional_page(tagState)
 def articles_by_tag(request, tag_slug):
     """
     Handles the view for displaying articles filtered by a specific tag.
@@ -246,17 +382,23 @@ def articles_by_tag(request, tag_slug):
 
     This view function performs the following tasks:
         1. Retrieves the tag instance based on the provided slug or returns a 404 if not found.
-        2. Filters articles that are associated with the retrieved tag.
-        3. Prepares the context with the filtered articles.
+        2. Filters articles that are associated with the retrieved tag with the filterArticlesByTags function,
+           loaded with ``for_listing()``.
+        3. Prepares the context with the filtered articles and the faculty filters.
         4. Renders the articles template with the context.
 
     The context for rendering the template includes:
         - articles: The list of articles associated with the specified tag.
+        - facets: Every faculty with its article count, the specified tag is selected. The links add
+          faculties to the filters of the ``articles`` listing.
+
+    Revalidation requests are answered with 304 Not Modified while ``tagState`` is unchanged.
     """
     tag = get_object_or_404(Tag, slug=tag_slug)
-    articles =Article.objects.filter(tags__in=[tag])
+    articles, facets = filterArticlesByTags(request, Article.objects.for_listing(), [tag.slug])
     context = {
-        "articles": articles
+        "articles": articles,
+        **facets
     }
 
     return render(request, "articles/articles.html", context)
@@ -323,25 +465,34 @@ def delete_review(request, review_id):
     return render(request, 'articles/delete_comment.html', {'review': review})
 
 
-def get_image_size(image_path):
+def get_image_size(article):
     """
-    Retrieves the dimensions of an image.
+    Retrieves the dimensions of an article's image.
 
     Args:
-        image_path (str): The path to the image file.
+        article (Article): The article whose image is measured.
 
     Returns:
-        tuple: A tuple containing the width and height of the image in pixels.
+        tuple: A tuple containing the width and height of the image in pixels, or None if the article has no image.
 
     This function performs the following tasks:
-        1. Opens the image file located at the specified path.
-        2. Retrieves the dimensions (width and height) of the image.
-        3. Returns the dimensions as a tuple (width, height).
+        1. Returns the dimensions stored on the article when its image was uploaded (see ``ArticleForm.clean_image``).
+        2. For images stored before the dimensions were recorded, opens the image once,
+           stores its dimensions on the article and returns them.
     """
-    with Image.open(image_path) as img:
-        return img.size
+    if not article.image:
+        return None
+    if article.image_width and article.image_height:
+        return article.image_width, article.image_height
+
+    with article.image.open('rb') as image_file, Image.open(image_file) as img:
+        article.image_width, article.image_height = img.size
+    Article.objects.filter(pk=article.pk).update(image_width=article.image_width, image_height=article.image_height)
+    return article.image_width, article.image_height
 
 
+@read_from_replica
+@conditional_page(articlePDFState)
 def generate_pdf(request, article_slug):
     """
     Generates a PDF for a specific article and serves it as a downloadable file.
@@ -355,69 +506,29 @@ def generate_pdf(request, article_slug):
 
     This view function performs the following tasks:
         1. Retrieves the article based on the provided slug or returns a 404 if not found.
-        2. Sets up the HTTP response for a PDF file with the appropriate content type and headers.
-        3. Determines the image path if the article has an associated image.
-        4. Renders the HTML content for the PDF using a template.
-        5. Uses xhtml2pdf to generate the PDF from the HTML content.
-        6. If there are errors during PDF generation, returns an error response.
-        7. Returns the generated PDF as an HTTP response.
-
-    The context for rendering the PDF template includes:
-        - article: The article instance for which the PDF is being generated.
-        - image_path: The file path of the article's associated image, if any.
+           Private articles redirect to the password form unless the request carries an access token.
+        2. Looks up the PDF of the current article version in the on-disk cache (see ``articles.pdf``).
+           The version is a hash of the title, description, image and update time.
+        3. On a cache miss, queues a render job (see ``articles.tasks.render_pdf``) without waiting for it:
+            a. If the PDF is not ready yet, returns a 202 response asking the user to retry shortly.
+            b. If the render job failed, returns an error response.
+        4. Streams the cached PDF file as an attachment, answering Range requests with the requested
+           part only (see ``BlogStudentsBUT.ranges``), so downloads can be resumed.
+           Once the PDF is cached, its ETag and Last-Modified come from ``articlePDFState``, revalidation
+           requests get 304 Not Modified and Range requests with an outdated If-Range get the whole file.
     """
     article = get_object_or_404(Article, slug=article_slug)
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{article.slug}.pdf"'
-
-    image_path = os.path.join(settings.MEDIA_ROOT, article.image.name) if article.image else None
-
-    html_content = render_to_string('articles/pdf_template.html', {
-        'article': article,
-        'image_path': image_path,
-    })
-
-    pisa_status = pisa.CreatePDF(html_content, dest=response, link_callback=link_callback)
-
-    if pisa_status.err:
-        return HttpResponse(f'We had some errors with code {pisa_status.err}')
-
-    return response
-
-def link_callback(uri, rel):
-    """
-    Converts URIs in the PDF generation HTML to the appropriate absolute file system paths.
-
-    Args:
-        uri (str): The URI that needs to be converted to a file path.
-        rel (str): A relative path, typically unused in this context.
-
-    Returns:
-        str: The absolute file system path corresponding to the given URI.
-
-    This function performs the following tasks:
-        1. Determines the base URL and root directory for static and media files from the Django settings.
-        2. Checks if the URI starts with the media or static URL, and converts it to the corresponding file system path.
-        3. If the URI does not match media or static URLs, returns the URI as is (for absolute URLs).
-        4. Raises an exception if the converted path does not correspond to an existing file.
-
-    Raises:
-        Exception: If the URI does not start with the media or static URL, or if the file does not exist at the converted path.
-    """
-    sUrl = settings.STATIC_URL  # Typically /static/
-    sRoot = settings.STATIC_ROOT  # Typically /var/www/example.com/static/
-    mUrl = settings.MEDIA_URL  # Typically /media/
-    mRoot = settings.MEDIA_ROOT  # Typically /var/www/example.com/media/
-
-    if uri.startswith(mUrl):
-        path = os.path.join(mRoot, uri.replace(mUrl, ""))
-    elif uri.startswith(sUrl):
-        path = os.path.join(sRoot, uri.replace(sUrl, ""))
-    else:
-        return uri  # handle absolute uri (i.e. http://some.tld/foo.png)
-
-    if not os.path.isfile(path):
-        raise Exception(
-            'media URI must start with {} or {}'.format(sUrl, mUrl)
-        )
-    return path
\ No newline at end of file
+    if article.is_private and not access.has_access(request, article):
+        return redirect('article', article_slug=article.slug)
+
+    try:
+        path = pdf.get_pdf(article)
+    except pdf.PDFPending:
+        response = HttpResponse('The PDF is being prepared, please try again in a moment.', status=202)
+        response['Retry-After'] = '5'
+        return response
+    except pdf.PDFRenderError as error:
+        return HttpResponse(str(error))
+
+    return ranged_file_response(request, path, as_attachment=True, filename=f'{article.slug}.pdf',
+                                content_type='application/pdf')
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'created')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key', 'error')
@@ -0,0 +1,76 @@
+import signal
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks import queue
+
+
+class Command(BaseCommand):
+    """
+    Runs background job workers.
+
+    Each worker is a separate process that takes the due jobs from the job table one at a time,
+    runs them and retries failed ones with exponential backoff. SIGINT and SIGTERM stop the
+    workers after their current job.
+
+    Example:
+        python manage.py run_tasks --workers 4
+        python manage.py run_tasks --burst
+    """
+    help = 'Runs worker processes that execute the queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='The number of worker processes.')
+        parser.add_argument('--burst', action='store_true', help='Exit as soon as no job is due.')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to wait when no job is due, defaults to TASKS_POLL_INTERVAL.')
+
+    def handle(self, *args, **options):
+        if options['workers'] > 1:
+            self.supervise(options)
+            return
+
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+
+        previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        worker = queue.worker_name()
+        self.stdout.write(f'Worker {worker} started.')
+        try:
+            processed = queue.work(worker, burst=options['burst'], poll_interval=options['poll_interval'],
+                                   should_stop=lambda: bool(stopping))
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped after {processed} jobs.'))
+
+    def supervise(self, options):
+        """
+        Starts one single-worker process per requested worker and waits for them.
+
+        The processes are started with ``python -m django``, so they work the same on every platform,
+        and SIGINT/SIGTERM are passed on to them.
+        """
+        command = [sys.executable, '-m', 'django', 'run_tasks', '--workers', '1', '--settings', settings.SETTINGS_MODULE]
+        if options['burst']:
+            command.append('--burst')
+        if options['poll_interval'] is not None:
+            command += ['--poll-interval', str(options['poll_interval'])]
+
+        connections.close_all()
+        workers = [subprocess.Popen(command, cwd=settings.BASE_DIR) for _ in range(options['workers'])]
+
+        def forward(signum, frame):
+            for worker in workers:
+                worker.send_signal(signum)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for worker in workers:
+            worker.wait()
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 23:26
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('name', models.CharField(max_length=200)),
+                ('args', models.JSONField(blank=True, default=list)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('key', models.CharField(blank=True, default='', max_length=200)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+            ],
+            options={
+                'ordering': ['run_after', 'created'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'), models.Index(fields=['key', 'status'], name='job_key_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import models
+from django.utils import timezone
+import uuid
+
+
+class Job(models.Model):
+    """
+    A model representing a background job, i.e. one call of a task function.
+
+    Attributes:
+        name (str): The dotted name of the task, e.g. 'articles.tasks.render_pdf'.
+        args (list): The positional arguments of the call, stored as JSON.
+        kwargs (dict): The keyword arguments of the call, stored as JSON.
+        key (str): An optional deduplication key, a job is not queued twice while one with the same key is queued.
+        status (str): 'queued', 'running' or 'failed'. Finished jobs are deleted.
+        attempts (int): How many times the job was started.
+        max_attempts (int): How many times the job is started before it is marked as failed.
+        run_after (datetime): The job is not started before this time, used to delay retries.
+        locked_by (str): The worker running the job.
+        locked_at (datetime): When the worker started the job, used to requeue jobs of crashed workers.
+        error (str): The error of the last failed attempt.
+        created (datetime): The date and time when the job was queued.
+        id (UUID): A unique identifier for the job, generated automatically.
+
+    Meta:
+        ordering: Jobs are started in the order of ``run_after``, then ``created``.
+        indexes: ``(status, run_after)`` for the workers looking for the next job,
+            ``(key, status)`` for the deduplication of queued jobs.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    key = models.CharField(max_length=200, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
+
+    class Meta:
+        ordering = ['run_after', 'created']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            models.Index(fields=['key', 'status'], name='job_key_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,227 @@
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class Task:
+    """
+    A function that can run in the background, created with the ``task`` decorator.
+
+    Calling the task runs the function right away, ``enqueue`` stores a job that a worker runs later.
+
+    Attributes:
+        func (callable): The decorated function. Its arguments must be JSON serializable.
+        name (str): The dotted name jobs refer to the function by.
+        max_attempts (int): How many times a job is started before it is marked as failed.
+        retry_delay (int): Seconds before the first retry, doubled on every further retry.
+    """
+    def __init__(self, func, max_attempts=3, retry_delay=30):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, args=(), kwargs=None, key='', delay=0):
+        """
+        Queues a call of the task once the current transaction commits.
+
+        Args:
+            args (tuple): The positional arguments of the call.
+            kwargs (dict): The keyword arguments of the call.
+            key (str): A deduplication key. While a job with this key is queued, the existing job is
+                returned instead of queueing another one. A running job may already have read the data
+                the new call is about, so it does not count.
+            delay (int): Seconds to wait before the job may start.
+
+        Returns:
+            Job | None: The queued job. With ``TASKS_EAGER`` the job has already run and its status
+            is 'done' or 'failed'. Inside a transaction the job is queued, or run, only when the
+            transaction commits, so a worker never picks up a job about data it cannot see yet and a
+            rollback drops the job. None is returned then.
+
+        Example:
+            >>> render_pdf.enqueue([str(article.pk)], key=f'pdf:{article.pk}')
+        """
+        queued = []
+        transaction.on_commit(lambda: queued.append(self.enqueue_now(args, kwargs, key, delay)))
+        return queued[0] if queued else None
+
+    def enqueue_now(self, args=(), kwargs=None, key='', delay=0):
+        """
+        Queues a call of the task right away, see ``enqueue``.
+        """
+        if key:
+            pending = Job.objects.filter(key=key, status=Job.QUEUED).first()
+            if pending is not None:
+                return pending
+        job = Job.objects.create(
+            name=self.name, args=list(args), kwargs=kwargs or {}, key=key, max_attempts=self.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+        if settings.TASKS_EAGER:
+            start(job, 'eager')
+            execute(job, retry=False)
+        return job
+
+
+def task(func=None, *, max_attempts=3, retry_delay=30):
+    """
+    Registers a function as a background task.
+
+    Tasks are looked up by name when a worker runs a job, so they must live in a module that is
+    imported at startup. ``tasks.apps.TasksConfig`` imports the ``tasks`` module of every installed app.
+
+    Args:
+        func (callable): The function, when the decorator is used without arguments.
+        max_attempts (int): How many times a job is started before it is marked as failed.
+        retry_delay (int): Seconds before the first retry, doubled on every further retry.
+
+    Returns:
+        Task: The registered task, or a decorator creating it.
+
+    Example:
+        @task(max_attempts=5)
+        def sync_user(profile_id):
+            ...
+    """
+    def decorator(func):
+        registered = Task(func, max_attempts, retry_delay)
+        _registry[registered.name] = registered
+        return registered
+    return decorator(func) if func is not None else decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def start(job, worker):
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.locked_by = worker
+    job.locked_at = timezone.now()
+    job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at'])
+
+
+def claim(worker):
+    """
+    Takes the next job that is due and marks it as running.
+
+    SQLite transactions start with BEGIN IMMEDIATE (see ``BlogStudentsBUT.database``), so only one
+    worker at a time looks for a job and no job is started twice. Other databases lock the row.
+
+    Args:
+        worker (str): The name of the worker taking the job.
+
+    Returns:
+        Job: The claimed job, or None if no job is due.
+    """
+    with transaction.atomic():
+        jobs = Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now()).order_by('run_after', 'created')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        job = jobs.first()
+        if job is not None:
+            start(job, worker)
+    return job
+
+
+def execute(job, retry=True):
+    """
+    Runs a claimed job and records the outcome.
+
+    Args:
+        job (Job): The job, marked as running by ``claim``.
+        retry (bool): Whether a failed job with attempts left is queued again.
+
+    This function performs the following tasks:
+        1. Calls the task function with the stored arguments.
+        2. On success, deletes the job, the returned instance keeps the status 'done'.
+        3. On an exception, logs it and stores the error. The job is queued again after
+           ``retry_delay * 2 ** (attempts - 1)`` seconds while it has attempts left,
+           otherwise it is marked as failed and kept for inspection in the admin.
+    """
+    registered = get_task(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f'Unknown task {job.name}')
+        registered.func(*job.args, **job.kwargs)
+    except Exception as error:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts)
+        job.error = str(error) or type(error).__name__
+        if retry and registered is not None and job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=registered.retry_delay * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.FAILED
+        job.locked_by = ''
+        job.locked_at = None
+        job.save(update_fields=['status', 'run_after', 'error', 'locked_by', 'locked_at'])
+        return
+
+    job.delete()
+    job.status = Job.DONE
+
+
+def requeue_stale(timeout=None):
+    """
+    Queues again the jobs of workers that died while running them.
+
+    Args:
+        timeout (int): Seconds after which a running job counts as abandoned, defaults to ``TASKS_LOCK_TIMEOUT``.
+
+    Returns:
+        int: The number of requeued jobs.
+    """
+    timeout = settings.TASKS_LOCK_TIMEOUT if timeout is None else timeout
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout)).update(
+        status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def work(worker=None, burst=False, poll_interval=None, should_stop=lambda: False):
+    """
+    Runs jobs until stopped.
+
+    Args:
+        worker (str): The name of the worker, defaults to the host name and process ID.
+        burst (bool): Whether to return as soon as no job is due instead of waiting for new ones.
+        poll_interval (float): Seconds to wait when no job is due, defaults to ``TASKS_POLL_INTERVAL``.
+        should_stop (callable): Checked between jobs, returns True to stop the worker.
+
+    Returns:
+        int: The number of jobs run.
+    """
+    worker = worker or worker_name()
+    poll_interval = settings.TASKS_POLL_INTERVAL if poll_interval is None else poll_interval
+    processed = 0
+    requeue_stale()
+    while not should_stop():
+        job = claim(worker)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            requeue_stale()
+            continue
+        execute(job)
+        processed += 1
+    return processed
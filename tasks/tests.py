@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from . import queue
+
+calls = []
+
+
+@queue.task(max_attempts=2, retry_delay=60)
+def record(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2, retry_delay=60)
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(TASKS_EAGER=False)
+class QueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_job_waits_for_a_worker(self):
+        job = record.enqueue_now(['first'])
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(queue.work(burst=True), 1)
+        self.assertEqual(calls, ['first'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_queued_jobs_are_deduplicated_by_key(self):
+        first = record.enqueue_now(['a'], key='same')
+        second = record.enqueue_now(['b'], key='same')
+        self.assertEqual(first.pk, second.pk)
+        queue.work(burst=True)
+        self.assertEqual(calls, ['a'])
+
+    def test_running_jobs_are_not_deduplicated(self):
+        first = record.enqueue_now(['a'], key='same')
+        self.assertEqual(queue.claim('worker').pk, first.pk)
+        second = record.enqueue_now(['b'], key='same')
+        self.assertNotEqual(first.pk, second.pk)
+        queue.execute(first)
+        queue.work(burst=True)
+        self.assertEqual(calls, ['a', 'b'])
+
+    def test_delayed_job_is_not_started_early(self):
+        record.enqueue_now(['later'], delay=3600)
+        self.assertEqual(queue.work(burst=True), 0)
+        self.assertEqual(calls, [])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = explode.enqueue_now()
+        queue.work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.error, 'boom')
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        queue.work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_unknown_task_fails_without_retry(self):
+        job = Job.objects.create(name='tasks.tests.missing')
+        queue.work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Unknown task', job.error)
+
+    def test_abandoned_jobs_are_requeued(self):
+        job = record.enqueue_now(['stale'])
+        queue.start(job, 'crashed-worker')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(queue.requeue_stale(timeout=60), 1)
+        queue.work(burst=True)
+        self.assertEqual(calls, ['stale'])
+
+    def test_jobs_are_queued_when_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(record.enqueue(['committed'], key='commit'))
+            self.assertFalse(Job.objects.exists())
+        self.assertTrue(Job.objects.filter(key='commit', status=Job.QUEUED).exists())
+
+    def test_rolled_back_jobs_are_not_queued(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record.enqueue(['rolled back'])
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_tasks_command_runs_due_jobs(self):
+        record.enqueue_now(['command'])
+        out = StringIO()
+        call_command('run_tasks', '--burst', stdout=out)
+        self.assertEqual(calls, ['command'])
+        self.assertIn('stopped after 1 jobs', out.getvalue())
+
+
+@override_settings(TASKS_EAGER=True)
+class EagerQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_eager_jobs_run_when_queued(self):
+        job = record.enqueue_now(['now'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_eager_jobs_run_after_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.enqueue(['after commit'])
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ['after commit'])
+
+    def test_eager_failures_are_kept(self):
+        job = explode.enqueue_now()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertTrue(Job.objects.filter(pk=job.pk, status=Job.FAILED).exists())
@@ -0,0 +1,75 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from .models import Profile
+from .utils import searchProfiles, filterProfilesBySkills, userProfileState
+from BlogStudentsBUT.async_utils import arender, alist
+from BlogStudentsBUT.cache import cache_anonymous_page
+from BlogStudentsBUT.conditional import conditional_page
+from BlogStudentsBUT.pagination import apaginate
+from BlogStudentsBUT.routers import read_from_replica
+
+
+@cache_anonymous_page('profiles')
+@read_from_replica
+async def profiles(request):
+    """
+    Async version of ``users.views.profiles``, displays 6 profiles per page.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+
+    Returns:
+        HttpResponse: The HTTP response object with the rendered profiles template.
+
+    This view function performs the following tasks:
+        1. Builds the profiles queryset for the search query using the searchProfiles function. The trigram
+           lookup is a raw SQLite query, so it runs in the ORM thread.
+        2. Filters it by the chosen faculties with the filterProfilesBySkills function, which loads the
+           faculties in the ORM thread.
+        3. Paginates the profiles with ``apaginate``, which counts them with ``acount()`` and fetches
+           the page with async iteration.
+        4. Renders the profiles template with the profiles, search query, custom pagination range and faculty filters.
+    """
+    profiles, search_query = await sync_to_async(searchProfiles)(request)
+    profiles, facets = await sync_to_async(filterProfilesBySkills)(request, profiles)
+    custom_range, profiles = await apaginate(request, profiles, 6)
+    context = {'profiles': profiles, 'search_query': search_query, 'custom_range': custom_range, **facets}
+    return await arender(request, 'users/profiles.html', context)
+
+
+@cache_anonymous_page(lambda request, username: f'profile:{username}', 'tags')
+@read_from_replica
+@conditional_page(userProfileState)
+async def userProfile(request, username):
+    """
+    Async version of ``users.views.userProfile``.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        username (str): The username of the profile to be displayed.
+
+    Returns:
+        HttpResponse: The HTTP response object with the rendered user profile template.
+
+    This view function performs the following tasks:
+        1. Retrieves the profile with ``aget()`` or raises a 404 if not found.
+        2. Fetches the main skills (first 10), the extra skills (starting from the 3rd) and the articles
+           of the profile concurrently with ``asyncio.gather``.
+        3. Renders the user profile template with the profile, skills and articles.
+    """
+    try:
+        profile = await Profile.objects.aget(username=username)
+    except Profile.DoesNotExist:
+        raise Http404('No Profile matches the given query.')
+
+    main_skills, extra_skills, articles = await asyncio.gather(
+        alist(profile.skills.all()[:10]),
+        alist(profile.skills.all()[2:]),
+        alist(profile.article_set.for_listing()),
+    )
+    context = {'profile': profile, 'main_skills': main_skills,
+               'extra_skills': extra_skills, 'articles': articles}
+    return await arender(request, 'users/user_profile.html', context)
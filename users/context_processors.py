@@ -1,4 +1,5 @@
 from django.contrib.auth.decorators import login_required
+from .utils import getUnreadCount
 
 def unread_messages_count(request):
     """
@@ -13,17 +14,15 @@ def unread_messages_count(request):
 
     This function performs the following tasks:
         1. Checks if the user is authenticated.
-        2. If authenticated, retrieves the user's profile.
-        3. Counts the number of unread messages associated with the profile.
-        4. Returns a dictionary containing the count of unread messages.
-        5. If the user is not authenticated, returns an empty dictionary.
+        2. If authenticated, gets the number of unread messages of the user's profile with getUnreadCount,
+           which serves it from the cache without touching the database.
+        3. Returns a dictionary containing the count of unread messages.
+        4. If the user is not authenticated, returns an empty dictionary.
 
     Example:
         >>> unread_messages_count(request)
         {'unreadCount': 5}
     """
     if request.user.is_authenticated:
-        profile = request.user.profile
-        unread_count = profile.messages.filter(is_read=False).count()
-        return {'unreadCount': unread_count}
+        return {'unreadCount': getUnreadCount(request.user)}
     return {}
\ No newline at end of file
@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from .models import Profile, Skill, Message
 from django import forms
 from captcha.fields import CaptchaField
+from BlogStudentsBUT.uploads import normalize_form_image
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -48,6 +49,7 @@ class ProfileForm(ModelForm):
         fields (list): The fields included in the form: name, email, username, bio, intro, image, instagram, and facebook.
 
     Methods:
+        clean_image(): Normalizes a newly uploaded image, see ``BlogStudentsBUT.uploads.normalize_image``.
         __init__(*args, **kwargs): Initializes the form with custom CSS classes for fields.
     """
     class Meta:
@@ -56,6 +58,12 @@ class ProfileForm(ModelForm):
                   'bio', 'intro', 'image',
                   'instagram', 'facebook']
 
+    def clean_image(self):
+        """
+        Re-encodes a newly uploaded image and records its dimensions on the profile.
+        """
+        return normalize_form_image(self)
+
     def __init__(self, *args, **kwargs):
         """
         Initializes the form with custom CSS classes for each field.
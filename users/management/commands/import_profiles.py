@@ -0,0 +1,181 @@
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import reset_queries, transaction
+from django.utils import timezone
+
+from articles import search as article_search
+from articles.models import Article
+from users import search
+from users.models import Profile, Skill
+from BlogStudentsBUT import cache
+from BlogStudentsBUT.transfer import (FORMATS, Throughput, batched, detect_format, error_message, hash_password,
+                                      open_stream, parse_text, parse_time, read_rows, related_ids, store_image,
+                                      update_rows)
+
+TEXT_FIELDS = ('name', 'email', 'intro', 'bio', 'facebook', 'instagram')
+
+
+class Command(BaseCommand):
+    """
+    Creates or updates profiles, with their users, from an NDJSON or CSV file.
+
+    The rows are read in batches of ``--batch-size``. Each batch is saved in one transaction with a few
+    queries whatever its size: the existing profiles, users and skills are loaded with one query each,
+    the new users, profiles and skill links are written with ``bulk_create`` and the changed ones with
+    ``update_rows``, a faster ``bulk_update``. Only the current batch is kept in memory, so files of any
+    size can be imported.
+
+    Rows:
+        - username: Required. A row updates the profile with this username if there is one, and only the
+          fields present in the row. Otherwise a user and a profile are created.
+        - name, email, intro, bio, facebook, instagram, created.
+        - password: The password of a new user, a hash or a raw password that is hashed. Hashing a raw
+          password is deliberately slow, so files should carry hashes. Without a password the user
+          cannot log in until the password is reset.
+        - image: The path of the image in the media storage. Images missing from the storage are copied
+          from ``--images-dir`` under the same path, otherwise the default image is used.
+        - skills: The names of the faculties, a list in NDJSON files and joined with '|' in CSV files.
+          Missing faculties are created. A row with skills replaces the faculties of the profile.
+
+    Bulk queries bypass the signals, so the command copies the names and emails to the users, updates
+    the search indexes per batch, and the skill counters and the cached pages at the end. Imported
+    images are not measured, ``normalize_images`` re-encodes them and creates their size variants.
+
+    The cached pages are invalidated through the shared cache, so the command must run with the same
+    ``CACHE_URL`` or ``CACHE_DIR`` as the site. Otherwise the workers serve the old pages until they expire.
+
+    Example:
+        python manage.py import_profiles profiles.ndjson
+        python manage.py import_profiles profiles.csv --images-dir /backup/media --batch-size 5000
+    """
+    help = 'Creates or updates profiles and their users from an NDJSON or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The file to read, '-' for the standard input.")
+        parser.add_argument('--format', choices=FORMATS, help='The file format, by default named by the extension.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='The number of rows saved per transaction.')
+        parser.add_argument('--images-dir', help='A directory to copy the images missing from the media storage from.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.skill_ids = {}
+        self.counts = {'created': 0, 'updated': 0, 'skipped': 0}
+        throughput = Throughput()
+
+        with open_stream(options['path']) as stream:
+            rows = read_rows(stream, detect_format(options['path'], options['format']), list_fields=('skills',))
+            for batch in batched(rows, options['batch_size']):
+                with transaction.atomic():
+                    self.import_batch(batch)
+                # With DEBUG on, the connection logs every query, and the bulk ones are long.
+                reset_queries()
+                throughput.add(len(batch))
+                if options['verbosity'] > 1:
+                    self.stderr.write(throughput.summary('Read', 'rows'))
+
+        Skill.objects.refresh_profile_counts()
+        cache.bump('profiles', 'articles')
+        self.stdout.write(self.style.SUCCESS(
+            f"{throughput.summary('Imported', 'rows')} Created {self.counts['created']} profiles, "
+            f"updated {self.counts['updated']}, skipped {self.counts['skipped']} rows."))
+
+    def skip(self, number, reason):
+        self.counts['skipped'] += 1
+        self.stderr.write(f'Line {number}: skipped, {reason}')
+
+    def import_batch(self, batch):
+        rows = {}
+        for number, row in batch:
+            username = parse_text(row.get('username'))
+            if username is None:
+                self.skip(number, 'the username is missing.')
+                continue
+            rows[username] = (number, row)
+
+        existing = {profile.username: profile for profile in Profile.objects.filter(username__in=list(rows))}
+        user_ids = dict(User.objects.filter(username__in=list(rows)).values_list('username', 'id'))
+        skill_ids = related_ids(Skill, {name for _, row in rows.values() for name in row.get('skills', [])},
+                                self.skill_ids)
+
+        now = timezone.now()
+        created, updated, new_users, passwords = [], [], [], []
+        for username, (number, row) in rows.items():
+            profile = existing.get(username)
+            try:
+                profile = self.build(profile or Profile(username=username, name=username), number, row, now)
+                if username not in user_ids:
+                    # make_password(None) gives an unusable password, like User.set_unusable_password.
+                    user = User(username=username, email=parse_text(row.get('email')) or '', first_name=profile.name,
+                                password=hash_password(row.get('password')) or make_password(None))
+                    user.clean_fields(exclude=['password'])
+                    new_users.append(user)
+                elif row.get('password'):
+                    passwords.append(User(id=user_ids[username], password=hash_password(row['password'])))
+            except (ValueError, ValidationError) as error:
+                self.skip(number, error_message(error))
+                continue
+            (updated if username in existing else created).append((profile, row))
+
+        User.objects.bulk_create(new_users)
+        user_ids.update(User.objects.filter(username__in=[user.username for user in new_users])
+                        .values_list('username', 'id'))
+        update_rows(passwords, ['password'])
+
+        if created:
+            # bulk_create sets the auto_now_add time, the created time of the rows is written afterwards.
+            times = {profile.pk: profile.created for profile, row in created if row.get('created')}
+            for profile, _ in created:
+                profile.user_id = profile.user_id or user_ids[profile.username]
+            Profile.objects.bulk_create([profile for profile, _ in created])
+            dated = [profile for profile, _ in created if profile.pk in times]
+            for profile in dated:
+                profile.created = times[profile.pk]
+            update_rows(dated, ['created'])
+        if updated:
+            update_rows([profile for profile, _ in updated],
+                        [*TEXT_FIELDS, 'image', 'image_width', 'image_height', 'created', 'updated'])
+            update_rows([User(id=profile.user_id, first_name=profile.name, email=profile.email)
+                         for profile, _ in updated if profile.user_id], ['first_name', 'email'])
+
+        reskilled = [profile.pk for profile, row in updated if 'skills' in row]
+        Profile.skills.through.objects.filter(profile_id__in=reskilled).delete()
+        Profile.skills.through.objects.bulk_create([
+            Profile.skills.through(profile_id=profile.pk, skill_id=skill_ids[name])
+            for profile, row in created + updated for name in row.get('skills', []) if name in skill_ids
+        ], ignore_conflicts=True)
+
+        search.index_profiles([profile.pk for profile, _ in created + updated])
+        article_search.index_articles(Article.objects.filter(owner__in=[profile.pk for profile, _ in updated])
+                                      .values_list('id', flat=True))
+        cache.bump(*(f'profile:{profile.username}' for profile, _ in updated))
+        self.counts['created'] += len(created)
+        self.counts['updated'] += len(updated)
+
+    def build(self, profile, number, row, now):
+        """
+        Sets the fields of a profile from a row.
+
+        Raises:
+            ValueError: If a value cannot be read.
+            ValidationError: If a field is invalid, e.g. a too long name or an invalid email.
+        """
+        for field in TEXT_FIELDS:
+            if field in row:
+                setattr(profile, field, parse_text(row[field]))
+        if row.get('created'):
+            profile.created = parse_time(row['created'])
+        if row.get('image'):
+            field = Profile._meta.get_field('image')
+            name = store_image(field.storage, row['image'], self.options['images_dir'])
+            if name is None:
+                if row['image'] != field.get_default():
+                    self.stderr.write(f"Line {number}: the image {row['image']} was not found, the default image is used.")
+                name = field.get_default()
+            if name != profile.image.name:
+                profile.image, profile.image_width, profile.image_height = name, None, None
+        profile.updated = now
+        # The default email of the model is a placeholder, it is only validated when the row sets it.
+        profile.clean_fields(exclude=['user', 'image'] + ([] if 'email' in row else ['email']))
+        return profile
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-17 23:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_message_created'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', 'is_read', '-created'], name='message_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['username'], name='profile_username_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['created', 'id'], name='profile_created_id_idx'),
+        ),
+    ]
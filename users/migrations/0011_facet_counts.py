@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 23:48
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_profile_counts(apps, schema_editor):
+    Skill = apps.get_model('users', 'Skill')
+    Through = apps.get_model('users', 'Profile').skills.through
+    counted = Through.objects.filter(skill=models.OuterRef('pk')).order_by().values('skill')
+    counted = counted.annotate(total=models.Count('pk')).values('total')
+    Skill.objects.update(profile_count=Coalesce(models.Subquery(counted), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='profile_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_profile_counts, migrations.RunPython.noop),
+        # Lets the faculty filters of the profile listing read the profile IDs of the selected faculties
+        # from the index alone, see BlogStudentsBUT.facets.filter_by_facets.
+        migrations.RunSQL(
+            'CREATE INDEX profile_skills_skill_profile_idx ON users_profile_skills (skill_id, profile_id)',
+            'DROP INDEX profile_skills_skill_profile_idx',
+        ),
+    ]
@@ -0,0 +1,83 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# The schema and the word splitting of users.search as of this migration. They are copied here,
+# so later changes of the module do not change what this migration creates.
+WORD_TABLE = 'users_search_word'
+TRIGRAM_TABLE = 'users_search_trigram'
+PROFILE_WORD_TABLE = 'users_profile_word'
+SKILL_WORD_TABLE = 'users_skill_word'
+
+
+def words(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r'\w+', text.lower())
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def store_words(cursor, table, column, names):
+    documents = {key: set(words(name)) for key, name in names.items()}
+    found = set().union(*documents.values())
+    cursor.execute(f"SELECT word, id FROM {WORD_TABLE}")
+    ids = {word: word_id for word, word_id in cursor.fetchall() if word in found}
+    for word in found - set(ids):
+        cursor.execute(f"INSERT INTO {WORD_TABLE} (word, size) VALUES (%s, %s)", [word, len(trigrams(word))])
+        ids[word] = cursor.lastrowid
+        cursor.executemany(f"INSERT INTO {TRIGRAM_TABLE} (trigram, word_id) VALUES (%s, %s)",
+                           [(gram, ids[word]) for gram in trigrams(word)])
+    cursor.executemany(f"INSERT INTO {table} (word_id, {column}) VALUES (%s, %s)",
+                       [(ids[word], key) for key, entries in documents.items() for word in entries])
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Profile = apps.get_model('users', 'Profile')
+    Skill = apps.get_model('users', 'Skill')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {WORD_TABLE} ("
+            "id INTEGER PRIMARY KEY, word TEXT NOT NULL UNIQUE, size INTEGER NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TRIGRAM_TABLE} ("
+            "trigram TEXT NOT NULL, word_id INTEGER NOT NULL, PRIMARY KEY (trigram, word_id)) WITHOUT ROWID"
+        )
+        for table, column in ((PROFILE_WORD_TABLE, 'profile_id'), (SKILL_WORD_TABLE, 'skill_id')):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"word_id INTEGER NOT NULL, {column} CHAR(32) NOT NULL, "
+                f"PRIMARY KEY (word_id, {column})) WITHOUT ROWID"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column}_idx ON {table} ({column})")
+
+        store_words(cursor, PROFILE_WORD_TABLE, 'profile_id',
+                    {pk.hex: name for pk, name in Profile.objects.values_list('id', 'name').iterator()})
+        store_words(cursor, SKILL_WORD_TABLE, 'skill_id',
+                    {pk.hex: name for pk, name in Skill.objects.values_list('id', 'name').iterator()})
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in (PROFILE_WORD_TABLE, SKILL_WORD_TABLE, TRIGRAM_TABLE, WORD_TABLE):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_facet_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
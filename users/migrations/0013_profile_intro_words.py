@@ -0,0 +1,70 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# The schema and the word splitting of users.search as of this migration. They are copied here,
+# so later changes of the module do not change what this migration creates.
+WORD_TABLE = 'users_search_word'
+TRIGRAM_TABLE = 'users_search_trigram'
+INTRO_WORD_TABLE = 'users_profile_intro_word'
+
+
+def words(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r'\w+', text.lower())
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def store_words(cursor, table, column, names):
+    documents = {key: set(words(name)) for key, name in names.items()}
+    found = set().union(*documents.values())
+    cursor.execute(f"SELECT word, id FROM {WORD_TABLE}")
+    ids = {word: word_id for word, word_id in cursor.fetchall() if word in found}
+    for word in found - set(ids):
+        cursor.execute(f"INSERT INTO {WORD_TABLE} (word, size) VALUES (%s, %s)", [word, len(trigrams(word))])
+        ids[word] = cursor.lastrowid
+        cursor.executemany(f"INSERT INTO {TRIGRAM_TABLE} (trigram, word_id) VALUES (%s, %s)",
+                           [(gram, ids[word]) for gram in trigrams(word)])
+    cursor.executemany(f"INSERT INTO {table} (word_id, {column}) VALUES (%s, %s)",
+                       [(ids[word], key) for key, entries in documents.items() for word in entries])
+
+
+def index_intros(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Profile = apps.get_model('users', 'Profile')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {INTRO_WORD_TABLE} ("
+            "word_id INTEGER NOT NULL, profile_id CHAR(32) NOT NULL, "
+            "PRIMARY KEY (word_id, profile_id)) WITHOUT ROWID"
+        )
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {INTRO_WORD_TABLE}_profile_id_idx "
+                       f"ON {INTRO_WORD_TABLE} (profile_id)")
+        cursor.execute(f"DELETE FROM {INTRO_WORD_TABLE}")
+        store_words(cursor, INTRO_WORD_TABLE, 'profile_id',
+                    {pk.hex: intro for pk, intro in Profile.objects.values_list('id', 'intro').iterator()})
+
+
+def drop_intro_words(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {INTRO_WORD_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_profile_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_intros, drop_intro_words),
+    ]
@@ -1,6 +1,27 @@
 from django.db import models
 from django.contrib.auth.models import User
 import uuid
+from BlogStudentsBUT.counters import fields_to_save
+
+
+class SkillQuerySet(models.QuerySet):
+    """
+    A queryset for skills (faculties).
+
+    Methods:
+        refresh_profile_counts(): Recomputes the ``profile_count`` counters with a single UPDATE.
+    """
+    def refresh_profile_counts(self):
+        """
+        Sets ``profile_count`` of the faculties to their real number of profiles.
+
+        Returns:
+            int: The number of updated faculties.
+        """
+        through = Profile.skills.through
+        counted = through.objects.filter(skill=models.OuterRef('pk')).order_by().values('skill')
+        counted = counted.annotate(total=models.Count('pk')).values('total')
+        return self.update(profile_count=models.functions.Coalesce(models.Subquery(counted), 0))
 
 
 class Skill(models.Model):
@@ -10,17 +31,28 @@ class Skill(models.Model):
     Attributes:
         name (str): The name of the faculty. It can be blank or null.
         slug (str): A URL-friendly slug identifier for the faculty.
+        profile_count (int): The number of profiles with the faculty, shown next to the listing filters.
+            It is kept up to date by the signals, see ``users.signals.countSkilledProfiles``.
         created (datetime): The date and time when the faculty was created. Automatically set on creation.
         id (UUID): A unique identifier for the faculty, generated automatically.
 
     Methods:
+        save(*args, **kwargs): Saves the faculty. Saves of existing faculties leave ``profile_count`` alone
+            unless ``update_fields`` names it, see ``BlogStudentsBUT.counters.fields_to_save``.
         __str__(): Returns the string representation of the skill, which is the skill's name.
     """
     name = models.CharField(max_length=80, blank=True, null=True)
     slug = models.SlugField()
+    profile_count = models.IntegerField(default=0, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
 
+    objects = SkillQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = fields_to_save(self, ('profile_count',), **kwargs)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return str(self.name)
 
@@ -37,10 +69,13 @@ class Profile(models.Model):
         intro (str): A short introduction for the profile. Can be blank or null.
         bio (TextField): A detailed biography for the profile. Can be blank or null.
         image (ImageField): The profile image. Defaults to 'profile_images/default.jpg'. Can be blank or null.
+        image_width (int): The width of the stored image in pixels, set when the upload is normalized.
+        image_height (int): The height of the stored image in pixels, set when the upload is normalized.
         skills (ManyToManyField): A many-to-many relationship with the Skill model. Can be blank.
         facebook (str): The Facebook profile link. Can be blank or null.
         instagram (str): The Instagram profile link. Can be blank or null.
         created (datetime): The date and time when the profile was created. Automatically set on creation.
+        updated (datetime): The date and time when the profile or its skills last changed.
         id (UUID): A unique identifier for the profile, generated automatically.
 
     Methods:
@@ -48,6 +83,7 @@ class Profile(models.Model):
 
     Meta:
         ordering (list): Specifies the default ordering of profiles by the 'created' field.
+        indexes (list): Indexes for the profile lookup by username and for the cursor pagination by (created, id).
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=50, blank=False, default="no_email")
@@ -56,10 +92,13 @@ class Profile(models.Model):
     intro = models.CharField(max_length=200, blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
     image = models.ImageField(null=True, blank=True, upload_to='profile_images', default="profile_images/default.jpg")
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     skills = models.ManyToManyField(Skill, blank=True)
     facebook = models.CharField(max_length=100, blank=True, null=True)
     instagram = models.CharField(max_length=100, blank=True, null=True)
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True, editable=False)
 
     def __str__(self):
@@ -67,6 +106,10 @@ class Profile(models.Model):
 
     class Meta:
         ordering = ['created']
+        indexes = [
+            models.Index(fields=['username'], name='profile_username_idx'),
+            models.Index(fields=['created', 'id'], name='profile_created_id_idx'),
+        ]
 
 
 class Message(models.Model):
@@ -89,6 +132,7 @@ class Message(models.Model):
 
     Meta:
         ordering (list): Specifies the default ordering of messages, first by 'is_read' status and then by 'created' date in descending order.
+        indexes (list): An index matching the inbox query, the messages of one recipient in the default order.
     """
     sender = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True, blank=True)
     recipient = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True, blank=True, related_name="messages")
@@ -104,4 +148,7 @@ class Message(models.Model):
         return self.subject
 
     class Meta:
-        ordering = ['is_read', '-created']
\ No newline at end of file
+        ordering = ['is_read', '-created']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', '-created'], name='message_inbox_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,382 @@
+import functools
+import math
+import re
+import unicodedata
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+WORD_TABLE = 'users_search_word'
+TRIGRAM_TABLE = 'users_search_trigram'
+PROFILE_WORD_TABLE = 'users_profile_word'
+SKILL_WORD_TABLE = 'users_skill_word'
+INTRO_WORD_TABLE = 'users_profile_intro_word'
+MAX_QUERY_WORDS = 8
+MAX_WORD_MATCHES = 50
+CHUNK_SIZE = 500
+
+# A match in a faculty name counts less than a match in the profile name, and a match in the intro less still.
+SKILL_WEIGHT = 0.8
+INTRO_WEIGHT = 0.6
+
+# The tables the index needs, the intro word table is optional.
+INDEX_TABLES = (WORD_TABLE, TRIGRAM_TABLE, PROFILE_WORD_TABLE, SKILL_WORD_TABLE)
+
+_trigram_databases = {}
+
+
+def trigrams_supported(conn=connection):
+    """
+    Checks whether the database behind a connection can host the trigram index.
+
+    The index is made of plain tables, but they are built as SQLite ``WITHOUT ROWID`` tables.
+    PostgreSQL would use the pg_trgm extension instead.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to inspect.
+
+    Returns:
+        bool: True if the connection is SQLite.
+    """
+    return conn.vendor == 'sqlite'
+
+
+def index_tables(conn=connection):
+    """
+    Returns the tables of the trigram index that exist in the database.
+
+    The intro words were added to the index after the name words, so a database migrated back
+    before ``0013_profile_intro_words`` holds the index without ``users_profile_intro_word``.
+    The result is remembered per database name, so the check costs a query only once per process.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to inspect.
+
+    Returns:
+        frozenset: The names of the existing index tables.
+    """
+    name = str(conn.settings_dict['NAME'])
+    if name not in _trigram_databases:
+        tables = set(conn.introspection.table_names()) if trigrams_supported(conn) else set()
+        _trigram_databases[name] = frozenset(tables.intersection([*INDEX_TABLES, INTRO_WORD_TABLE]))
+    return _trigram_databases[name]
+
+
+def trigrams_enabled(conn=connection):
+    """
+    Checks whether the trigram index tables exist in the database.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to inspect.
+
+    Returns:
+        bool: True if the name and faculty words can be searched. The intro words are searched
+        as well when their table exists.
+    """
+    return set(INDEX_TABLES) <= index_tables(conn)
+
+
+def create_index(conn=connection):
+    """
+    Creates the tables of the trigram index.
+
+    The index has two levels, so the trigrams of a name shared by thousands of profiles are stored once:
+
+    - ``users_search_word`` holds every distinct indexed word with the number of its trigrams.
+    - ``users_search_trigram`` maps each trigram to the words containing it. Misspelled query words
+      are matched against this small dictionary.
+    - ``users_profile_word`` maps each word to the profiles using it in their name.
+    - ``users_profile_intro_word`` maps each word to the profiles using it in their intro.
+    - ``users_skill_word`` maps each word to the faculties using it in their name. The profiles of a
+      faculty are read from the ``users_profile_skills`` relation table, so adding or removing a faculty
+      of a profile does not touch the index.
+
+    The primary keys start with the looked up column and the tables have no rowid, so every
+    lookup reads one B-tree range. A second index finds the words of a profile or faculty to replace them.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to create the tables in.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {WORD_TABLE} ("
+            "id INTEGER PRIMARY KEY, word TEXT NOT NULL UNIQUE, size INTEGER NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TRIGRAM_TABLE} ("
+            "trigram TEXT NOT NULL, word_id INTEGER NOT NULL, PRIMARY KEY (trigram, word_id)) WITHOUT ROWID"
+        )
+        for table, column in ((PROFILE_WORD_TABLE, 'profile_id'), (INTRO_WORD_TABLE, 'profile_id'),
+                              (SKILL_WORD_TABLE, 'skill_id')):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"word_id INTEGER NOT NULL, {column} CHAR(32) NOT NULL, "
+                f"PRIMARY KEY (word_id, {column})) WITHOUT ROWID"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column}_idx ON {table} ({column})")
+    _trigram_databases.pop(str(conn.settings_dict['NAME']), None)
+
+
+def drop_index(conn=connection):
+    """
+    Drops the tables of the trigram index.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection to drop the tables from.
+    """
+    with conn.cursor() as cursor:
+        for table in (PROFILE_WORD_TABLE, INTRO_WORD_TABLE, SKILL_WORD_TABLE, TRIGRAM_TABLE, WORD_TABLE):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    _trigram_databases.pop(str(conn.settings_dict['NAME']), None)
+
+
+@functools.lru_cache(maxsize=65536)
+def _fold(word):
+    word = unicodedata.normalize('NFKD', word)
+    return re.findall(r'\w+', ''.join(char for char in word if not unicodedata.combining(char)).lower())
+
+
+def words(text):
+    """
+    Splits a text into lowercase words without diacritics, e.g. ``Łukasz Wiśniewski`` gives
+    ``['łukasz', 'wisniewski']`` (``ł`` is a letter of its own, not an ``l`` with a mark).
+
+    Names repeat a lot, so the diacritics of each distinct word are only removed once.
+    """
+    text = text or ''
+    if text.isascii():
+        return re.findall(r'\w+', text.lower())
+    return [folded for word in re.findall(r'\w+', unicodedata.normalize('NFC', text)) for folded in _fold(word)]
+
+
+def trigrams(word):
+    """
+    Returns the set of trigrams of a word.
+
+    The word is padded with two spaces in front and one behind, like PostgreSQL's pg_trgm does,
+    so its start and end weigh more than its middle, e.g. ``anna`` gives ``'  a', ' an', 'ann', 'nna', 'na '``.
+
+    Args:
+        word (str): A word returned by ``words``.
+
+    Returns:
+        set: The trigrams of the word.
+    """
+    padded = f'  {word} '
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        chunk = values[start:start + CHUNK_SIZE]
+        yield chunk, ', '.join(['%s'] * len(chunk))
+
+
+def _word_ids(cursor, found):
+    ids = {}
+    for chunk, placeholders in _chunks(found):
+        cursor.execute(f"SELECT word, id FROM {WORD_TABLE} WHERE word IN ({placeholders})", chunk)
+        ids.update(cursor.fetchall())
+    return ids
+
+
+def _store_words(cursor, table, column, names):
+    """
+    Replaces the words of the given profiles or faculties.
+
+    Args:
+        cursor (CursorWrapper): A cursor of the connection holding the index.
+        table (str): ``PROFILE_WORD_TABLE``, ``INTRO_WORD_TABLE`` or ``SKILL_WORD_TABLE``.
+        column (str): The ID column of the table, 'profile_id' or 'skill_id'.
+        names (dict): The current text (name or intro) of every object to index, by its hex ID.
+            Objects missing from the dictionary are only removed from the index.
+    """
+    documents = {key: set(words(name)) for key, name in names.items()}
+    found = set().union(*documents.values())
+    ids = _word_ids(cursor, found)
+    new_words = found - set(ids)
+    if new_words:
+        cursor.executemany(f"INSERT INTO {WORD_TABLE} (word, size) VALUES (%s, %s)",
+                           [(word, len(trigrams(word))) for word in new_words])
+        new_ids = _word_ids(cursor, new_words)
+        cursor.executemany(f"INSERT INTO {TRIGRAM_TABLE} (trigram, word_id) VALUES (%s, %s)",
+                           [(gram, word_id) for word, word_id in new_ids.items() for gram in trigrams(word)])
+        ids.update(new_ids)
+    cursor.executemany(
+        f"INSERT INTO {table} (word_id, {column}) VALUES (%s, %s)",
+        [(ids[word], key) for key, entries in documents.items() for word in entries],
+    )
+
+
+# The indexed text columns: the model table, its text column, the word table and its ID column.
+PROFILE_NAMES = ('users_profile', 'name', PROFILE_WORD_TABLE, 'profile_id')
+PROFILE_INTROS = ('users_profile', 'intro', INTRO_WORD_TABLE, 'profile_id')
+SKILL_NAMES = ('users_skill', 'name', SKILL_WORD_TABLE, 'skill_id')
+
+
+def _indexed(sources, conn):
+    return [source for source in sources if source[2] in index_tables(conn)]
+
+
+def _reindex(sources, keys, conn):
+    if not trigrams_enabled(conn):
+        return
+    sources = _indexed(sources, conn)
+    keys = [uuid.UUID(str(pk)).hex for pk in keys]
+    with conn.cursor() as cursor:
+        for chunk, placeholders in _chunks(keys):
+            for model_table, field, table, column in sources:
+                cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", chunk)
+                cursor.execute(f"SELECT id, {field} FROM {model_table} WHERE id IN ({placeholders})", chunk)
+                _store_words(cursor, table, column, dict(cursor.fetchall()))
+
+
+def rebuild_index(conn=connection):
+    """
+    Rebuilds the whole trigram index from the profile and skill tables.
+
+    Words of renamed or deleted profiles and faculties stay in the dictionary until the next rebuild,
+    they are never returned because nothing uses them.
+
+    Args:
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+    """
+    if not trigrams_enabled(conn):
+        return
+    sources = _indexed((PROFILE_NAMES, PROFILE_INTROS, SKILL_NAMES), conn)
+    with conn.cursor() as cursor:
+        for table in [source[2] for source in sources] + [TRIGRAM_TABLE, WORD_TABLE]:
+            cursor.execute(f"DELETE FROM {table}")
+        for model_table, field, table, column in sources:
+            cursor.execute(f"SELECT id, {field} FROM {model_table}")
+            _store_words(cursor, table, column, dict(cursor.fetchall()))
+
+
+def index_profiles(profile_ids, conn=connection):
+    """
+    Refreshes the name and intro words of the given profiles.
+
+    Profiles that no longer exist are simply removed from the index.
+
+    Args:
+        profile_ids (iterable): Primary keys (UUID) of the profiles to reindex.
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+    """
+    _reindex((PROFILE_NAMES, PROFILE_INTROS), profile_ids, conn)
+
+
+def index_skills(skill_ids, conn=connection):
+    """
+    Refreshes the name words of the given faculties.
+
+    Faculties that no longer exist are simply removed from the index.
+
+    Args:
+        skill_ids (iterable): Primary keys (UUID) of the faculties to reindex.
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+    """
+    _reindex((SKILL_NAMES,), skill_ids, conn)
+
+
+def match_words(cursor, word):
+    """
+    Finds the indexed words similar to a query word.
+
+    Args:
+        cursor (CursorWrapper): A cursor of the connection holding the index.
+        word (str): A word of the search query.
+
+    Returns:
+        list: Up to ``MAX_WORD_MATCHES`` tuples of a word ID and its score, best first.
+
+    A word matches when it shares at least ``PROFILE_SEARCH_THRESHOLD`` of the query word's trigrams,
+    i.e. the intersection of their trigram sets. A typo only breaks the up to three trigrams around it,
+    so misspelled words still match, and so do words starting with a typed prefix. The score is the mean
+    of that share and of the Jaccard similarity ``shared / (query + word - shared)``, so the exact word
+    scores 1 and longer words containing it score less.
+    """
+    grams = sorted(trigrams(word))
+    size = len(grams)
+    minimum = math.ceil(settings.PROFILE_SEARCH_THRESHOLD * size)
+    placeholders = ', '.join(['%s'] * size)
+    cursor.execute(
+        "SELECT m.word_id, (m.shared / %s + m.shared / (%s + w.size - m.shared)) / 2 AS score "
+        f"FROM (SELECT word_id, COUNT(*) * 1.0 AS shared FROM {TRIGRAM_TABLE} "
+        f"WHERE trigram IN ({placeholders}) GROUP BY word_id HAVING COUNT(*) >= %s) m "
+        f"JOIN {WORD_TABLE} w ON w.id = m.word_id "
+        "ORDER BY score DESC LIMIT %s",
+        [size, size, *grams, minimum, MAX_WORD_MATCHES],
+    )
+    return cursor.fetchall()
+
+
+def rank_profiles(profiles, search_query, conn=connection):
+    """
+    Narrows a queryset of profiles to the matches of a search query, best match first.
+
+    Args:
+        profiles (QuerySet): The profiles to search.
+        search_query (str): The search query entered by the user.
+        conn (BaseDatabaseWrapper): The database connection holding the index.
+
+    Returns:
+        QuerySet | None: The matching profiles ordered by similarity, or None if the index
+        cannot answer the query and the caller should fall back to a plain lookup.
+
+    This function performs the following tasks:
+        1. Matches every query word against the word dictionary with ``match_words``. The dictionary
+           holds each distinct word once, so this reads a few hundred rows even for 100k profiles.
+        2. Keeps the profiles using a matched word in their name, their intro or the name of one of
+           their faculties.
+        3. Ranks them in the database: every matched word scores for the profiles using it, weighted
+           by ``SKILL_WEIGHT`` in a faculty name and by ``INTRO_WEIGHT`` in the intro. The best score
+           per profile and query word is kept and the profiles are ordered by the sum of these scores,
+           so profiles matching more query words, more exactly and in their name come first. Equally
+           ranked profiles are ordered by their IDs.
+
+    Like ``articles.search.rank_articles``, the ranking is part of the query, so the database counts
+    and slices every match: a paginator over the result reports the real number of matches and pages
+    through all of them.
+    """
+    query_words = list(dict.fromkeys(words(search_query)))[:MAX_QUERY_WORDS]
+    if not query_words or not trigrams_enabled(conn):
+        return None
+
+    with conn.cursor() as cursor:
+        matched = [(word_id, position, score) for position, word in enumerate(query_words)
+                   for word_id, score in match_words(cursor, word)]
+    if not matched:
+        return profiles.none()
+
+    table = profiles.model._meta.db_table
+    word_ids = sorted({word_id for word_id, _, _ in matched})
+    in_words = ', '.join(['%s'] * len(word_ids))
+    scores = ', '.join(['(%s, %s, %s)'] * len(matched))
+    # The profiles using each word, with the weight of its source.
+    sources = [
+        (f"SELECT w.profile_id, w.word_id FROM {PROFILE_WORD_TABLE} w", 1),
+        (f"SELECT s.profile_id, w.word_id FROM {SKILL_WORD_TABLE} w "
+         "JOIN users_profile_skills s ON s.skill_id = w.skill_id", SKILL_WEIGHT),
+    ]
+    if INTRO_WORD_TABLE in index_tables(conn):
+        sources.append((f"SELECT w.profile_id, w.word_id FROM {INTRO_WORD_TABLE} w", INTRO_WEIGHT))
+    # SQLite computes the ranking subquery once and looks the profiles up in it.
+    ranking = (
+        f"(WITH matched (word_id, position, score) AS (VALUES {scores}), "
+        "ranking AS (SELECT profile_id, SUM(score) AS score FROM ("
+        "SELECT profile_id, position, MAX(score) AS score FROM ("
+        + ' UNION ALL '.join(f"SELECT u.profile_id, m.position, m.score * {weight} AS score FROM ({source}) u "
+                             "JOIN matched m ON m.word_id = u.word_id" for source, weight in sources)
+        + ") GROUP BY profile_id, position) GROUP BY profile_id) "
+        f"SELECT score FROM ranking WHERE ranking.profile_id = {table}.id)"
+    )
+    candidates = f"{table}.id IN (" + ' UNION '.join(
+        f"SELECT u.profile_id FROM ({source}) u WHERE u.word_id IN ({in_words})" for source, _ in sources) + ")"
+    return profiles.extra(
+        select={'search_rank': ranking},
+        select_params=[value for row in matched for value in row],
+        where=[candidates],
+        params=word_ids * len(sources),
+    ).order_by('-search_rank', 'id')
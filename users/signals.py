@@ -1,10 +1,15 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.db.models import F
 from django.dispatch import receiver
+from django.utils import timezone
 
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import Profile, Skill, Message
+from .utils import invalidateUnreadCount
 
 from django.conf import settings
+from BlogStudentsBUT import cache
+from . import tasks, search
 
 def createProfile(sender, instance, created, **kwargs):
     """
@@ -39,7 +44,7 @@ def createProfile(sender, instance, created, **kwargs):
 
 def updateUser(sender, instance, created, **kwargs):
     """
-    Updates the User instance associated with a Profile when the Profile is updated.
+    Queues the update of the User instance associated with a Profile when the Profile is updated.
 
     Args:
         sender (type): The model class that sent the signal.
@@ -49,10 +54,9 @@ def updateUser(sender, instance, created, **kwargs):
 
     This function performs the following tasks:
         1. Retrieves the Profile instance that was saved.
-        2. Retrieves the associated User instance.
-        3. If the Profile instance was not newly created (i.e., it was updated):
-            a. Updates the User's first name, username, and email to match the Profile.
-            b. Saves the updated User instance.
+        2. If the Profile instance was not newly created (i.e., it was updated), queues the
+           ``users.tasks.sync_user`` job, which updates the User's first name, username, and email
+           to match the Profile. Several saves in a row share one queued job.
 
     This function is intended to be connected to the `post_save` signal of the Profile model.
 
@@ -60,13 +64,27 @@ def updateUser(sender, instance, created, **kwargs):
         post_save.connect(updateUser, sender=Profile)
     """
     profile = instance
-    user = profile.user
 
     if created==False:
-        user.first_name = profile.name
-        user.username = profile.username
-        user.email = profile.email
-        user.save()
+        tasks.sync_user.enqueue([str(profile.pk)], key=f'sync-user:{profile.pk}')
+
+
+def createProfileThumbnails(sender, instance, **kwargs):
+    """
+    Queues the creation of the missing size variants of a profile's image after the profile is saved.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Profile): The instance of the Profile model that was saved.
+        **kwargs: Additional keyword arguments.
+
+    This function is intended to be connected to the `post_save` signal of the Profile model.
+
+    Example:
+        post_save.connect(createProfileThumbnails, sender=Profile)
+    """
+    if instance.image:
+        tasks.create_profile_thumbnails.enqueue([str(instance.pk)], key=f'thumbnails:{instance.image.name}')
 
 
 def deleteUser(sender, instance, **kwargs):
@@ -95,6 +113,212 @@ def deleteUser(sender, instance, **kwargs):
         pass
 
 
+def rememberProfileFields(sender, instance, **kwargs):
+    """
+    Remembers the stored username, name and image of a profile before it is saved, so that the cached
+    page under the old username can be invalidated and the article pages are only invalidated when
+    something they show changed.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Profile): The profile that is about to be saved.
+        **kwargs: Additional keyword arguments.
+    """
+    if not instance._state.adding:
+        stored = Profile.objects.filter(pk=instance.pk).values_list('username', 'name', 'image').first()
+        instance._cached_fields = stored and (stored[0], stored[1], stored[2] or '')
+
+
+def invalidateProfilePages(sender, instance, **kwargs):
+    """
+    Invalidates the cached pages showing a profile after it is saved or deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Profile): The instance of the Profile model that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    This function performs the following tasks:
+        1. Invalidates the profile listing and the user's profile page, under the new and the old username.
+        2. If the username, name or image changed, invalidates the article listings, which show the
+           author's name and avatar and link to the profile.
+        3. In that case also invalidates the pages of the user's articles and of the articles the user
+           commented on. Other changes, e.g. of the bio, leave the article pages cached.
+
+    Example:
+        post_save.connect(invalidateProfilePages, sender=Profile)
+    """
+    namespaces = ['profiles', f'profile:{instance.username}']
+    old_fields = instance.__dict__.pop('_cached_fields', None)
+    if old_fields and old_fields[0] != instance.username:
+        namespaces.append(f'profile:{old_fields[0]}')
+    shown = (instance.username, instance.name, instance.image.name or '')
+    if kwargs.get('signal') is post_save and not kwargs.get('created') and old_fields != shown:
+        slugs = set(instance.article_set.values_list('slug', flat=True))
+        slugs.update(instance.review_set.values_list('article__slug', flat=True))
+        namespaces.append('articles')
+        namespaces.extend(f'article:{slug}' for slug in slugs)
+    cache.bump(*namespaces)
+
+
+def invalidateSkillPages(sender, instance, action=None, **kwargs):
+    """
+    Invalidates the cached pages showing skills after a skill, or the skills of a profile, change.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Skill | Profile): The changed instance.
+        action (str): The m2m_changed action, None for post_save and post_delete.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        m2m_changed.connect(invalidateSkillPages, sender=Profile.skills.through)
+    """
+    if action is not None and not action.startswith('post_'):
+        return
+    if isinstance(instance, Profile):
+        cache.bump('profiles', f'profile:{instance.username}')
+    else:
+        cache.bump('profiles', *(f'profile:{username}' for username in
+                                 Profile.objects.filter(skills=instance).values_list('username', flat=True)))
+
+
+def refreshUnreadCount(sender, instance, **kwargs):
+    """
+    Drops the cached unread message count of the recipient when a message is saved or deleted,
+    e.g. when createMessage sends it or viewMessage marks it as read.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Message): The instance of the Message model that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(refreshUnreadCount, sender=Message)
+    """
+    invalidateUnreadCount(instance.recipient_id)
+
+
+def touchSkilledProfiles(sender, instance, action=None, reverse=False, pk_set=None, **kwargs):
+    """
+    Moves the ``updated`` time of profiles forward when their skills change, so the validators
+    of the profile pages (see ``users.utils.userProfileState``) change with them.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Skill | Profile): The changed instance.
+        action (str): The m2m_changed action, None for post_save and pre_delete.
+        reverse (bool): True if the relation was changed from the Skill side.
+        pk_set (set): The primary keys of the related objects that were added or removed.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        m2m_changed.connect(touchSkilledProfiles, sender=Profile.skills.through)
+    """
+    if action is None or (reverse and action == 'pre_clear'):
+        profiles = Profile.objects.filter(skills=instance)
+    elif action.startswith('post_') and not reverse:
+        profiles = Profile.objects.filter(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        profiles = Profile.objects.filter(pk__in=pk_set or [])
+    else:
+        return
+    profiles.update(updated=timezone.now())
+
+
+def countSkilledProfiles(sender, instance, action=None, reverse=False, pk_set=None, **kwargs):
+    """
+    Keeps the ``profile_count`` counters of the faculties in sync when profiles gain, lose
+    or are deleted with faculties.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Profile | Skill): The changed instance.
+        action (str): The m2m_changed action, None for pre_delete of a profile.
+        reverse (bool): True if the relation was changed from the Skill side.
+        pk_set (set): The primary keys of the related objects that were added or removed.
+        **kwargs: Additional keyword arguments.
+
+    The counters are moved like the article counters of the faculties, see
+    ``articles.signals.countTaggedArticles``.
+
+    Example:
+        m2m_changed.connect(countSkilledProfiles, sender=Profile.skills.through)
+    """
+    if action is None:
+        Skill.objects.filter(profile=instance).update(profile_count=F('profile_count') - 1)
+        return
+    if action in ('pre_remove', 'pre_clear'):
+        related = instance.profile_set if reverse else instance.skills
+        if action == 'pre_remove':
+            related = related.filter(pk__in=pk_set or [])
+        instance._counted_ids = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_add':
+        changed, step = pk_set or [], 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, step = instance.__dict__.pop('_counted_ids', []), -1
+    else:
+        return
+    if not changed:
+        return
+    if reverse:
+        Skill.objects.filter(pk=instance.pk).update(profile_count=F('profile_count') + step * len(changed))
+    else:
+        Skill.objects.filter(pk__in=changed).update(profile_count=F('profile_count') + step)
+
+
+def indexProfile(sender, instance, **kwargs):
+    """
+    Refreshes the name and intro words of a profile in the trigram search index after it is saved or deleted.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Profile): The profile that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(indexProfile, sender=Profile)
+    """
+    search.index_profiles([instance.pk])
+
+
+def indexSkill(sender, instance, **kwargs):
+    """
+    Refreshes the name words of a faculty in the trigram search index after it is saved or deleted.
+
+    The profiles of a faculty are looked up in the relation table when searching, so adding
+    or removing a faculty of a profile needs no reindexing.
+
+    Args:
+        sender (type): The model class that sent the signal.
+        instance (Skill): The skill that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    Example:
+        post_save.connect(indexSkill, sender=Skill)
+    """
+    search.index_skills([instance.pk])
+
+
 post_save.connect(createProfile, sender=User)
 post_save.connect(updateUser, sender=Profile)
-post_delete.connect(deleteUser, sender=Profile)
\ No newline at end of file
+post_save.connect(createProfileThumbnails, sender=Profile)
+post_delete.connect(deleteUser, sender=Profile)
+pre_save.connect(rememberProfileFields, sender=Profile)
+post_save.connect(invalidateProfilePages, sender=Profile)
+post_delete.connect(invalidateProfilePages, sender=Profile)
+post_save.connect(invalidateSkillPages, sender=Skill)
+post_delete.connect(invalidateSkillPages, sender=Skill)
+m2m_changed.connect(invalidateSkillPages, sender=Profile.skills.through)
+post_save.connect(refreshUnreadCount, sender=Message)
+post_delete.connect(refreshUnreadCount, sender=Message)
+post_save.connect(touchSkilledProfiles, sender=Skill)
+pre_delete.connect(touchSkilledProfiles, sender=Skill)
+m2m_changed.connect(touchSkilledProfiles, sender=Profile.skills.through)
+pre_delete.connect(countSkilledProfiles, sender=Profile)
+m2m_changed.connect(countSkilledProfiles, sender=Profile.skills.through)
+post_save.connect(indexProfile, sender=Profile)
+post_delete.connect(indexProfile, sender=Profile)
+post_save.connect(indexSkill, sender=Skill)
+post_delete.connect(indexSkill, sender=Skill)
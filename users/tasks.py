@@ -0,0 +1,35 @@
+from BlogStudentsBUT import thumbnails
+from tasks.queue import task
+from .models import Profile
+
+
+@task(max_attempts=5)
+def sync_user(profile_id):
+    """
+    Copies the name, username and email of a profile to its User.
+
+    Args:
+        profile_id (str): The ID of the profile. The values are read when the job runs,
+            so a job queued for an older save still copies the latest values.
+    """
+    profile = Profile.objects.select_related('user').filter(pk=profile_id).first()
+    if profile is None or profile.user is None:
+        return
+    user = profile.user
+    user.first_name = profile.name
+    user.username = profile.username
+    user.email = profile.email
+    user.save(update_fields=['first_name', 'username', 'email'])
+
+
+@task
+def create_profile_thumbnails(profile_id):
+    """
+    Creates the missing size variants of a profile's image.
+
+    Args:
+        profile_id (str): The ID of the profile.
+    """
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is not None and profile.image:
+        thumbnails.create_variants(profile.image.name, profile.image.storage)
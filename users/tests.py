@@ -1,9 +1,30 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from django.conf import settings
+from django.urls import reverse, resolve, clear_url_caches
+from django.core.management import call_command
+from django.db import connection
 from django.contrib.auth.models import User
 from .models import Profile, Skill, Message
 from .forms import CustomUserCreationForm, ProfileForm, SkillForm, MessageForm
 from captcha.models import CaptchaStore
+from django.core.cache import cache
+from django.test import RequestFactory, AsyncRequestFactory
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from articles.models import Article
+from . import async_views, urls, search
+from tasks import queue
+from .context_processors import unread_messages_count
 
 
 class UsersViewsTest(TestCase):
@@ -143,6 +164,16 @@ class UsersFormsTest(TestCase):
         form = ProfileForm(data=form_data, instance=profile)
         self.assertTrue(form.is_valid(), msg=f"Form errors: {form.errors}")
 
+    def test_profile_form_normalizes_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (3000, 3000), (10, 200, 10)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+        form = ProfileForm(data={'name': 'Pictured', 'email': 'pictured@example.com', 'username': 'testuser3'},
+                           files={'image': upload}, instance=self.profile)
+        self.assertTrue(form.is_valid(), msg=f"Form errors: {form.errors}")
+        self.assertEqual((form.instance.image_width, form.instance.image_height), (2048, 2048))
+        self.assertNotEqual(form.cleaned_data['image'].name, 'avatar.png')
+
     def test_skill_form(self):
         skill = Skill.objects.create(name='Django', slug='django')
         form_data = {'skill': skill.id}
@@ -158,3 +189,404 @@ class UsersFormsTest(TestCase):
         }
         form = MessageForm(data=form_data)
         self.assertTrue(form.is_valid(), msg=f"Form errors: {form.errors}")
+
+
+
+@override_settings(PAGINATION_CURSOR_THRESHOLD=1)
+class ProfilesCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(8):
+            User.objects.create_user(username=f'cursor{number}', password='12345', first_name=f'Student {number}')
+
+    def test_profiles_use_cursor_pages(self):
+        response = self.client.get(reverse('profiles'))
+        page = response.context['profiles']
+        self.assertTrue(page.is_cursor)
+        self.assertEqual(len(page), 6)
+        self.assertContains(response, f"?cursor={page.next_cursor}")
+
+        response = self.client.get(reverse('profiles'), {'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['profiles']), 2)
+        self.assertFalse(response.context['profiles'].has_next())
+
+    def test_search_results_use_numbered_pages(self):
+        response = self.client.get(reverse('profiles'), {'search_query': 'student'})
+        page = response.context['profiles']
+        self.assertFalse(getattr(page, 'is_cursor', False))
+        self.assertEqual(page.paginator.count, 8)
+
+
+class UnreadMessagesCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='12345')
+        cls.sender = User.objects.create_user(username='writer', password='12345')
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def send(self, subject):
+        return Message.objects.create(sender=self.sender.profile, recipient=self.user.profile,
+                                      subject=subject, body='Hello')
+
+    def test_count_is_cached(self):
+        self.send('First')
+        self.assertEqual(unread_messages_count(self.request), {'unreadCount': 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_messages_count(self.request), {'unreadCount': 1})
+
+    def test_count_follows_new_and_read_messages(self):
+        message = self.send('First')
+        self.assertEqual(unread_messages_count(self.request), {'unreadCount': 1})
+
+        self.send('Second')
+        self.assertEqual(unread_messages_count(self.request), {'unreadCount': 2})
+
+        self.client.login(username='reader', password='12345')
+        self.client.get(reverse('message', args=[message.id]))
+        self.assertEqual(unread_messages_count(self.request), {'unreadCount': 1})
+
+
+class QueryPlanTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='12345')
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def test_profile_lookup_by_username_uses_index(self):
+        self.assertIn('profile_username_idx', self.query_plan(Profile.objects.filter(username='planner')))
+
+    def test_inbox_uses_index(self):
+        plan = self.query_plan(self.user.profile.messages.all())
+        self.assertIn('message_inbox_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_unread_count_uses_index(self):
+        plan = self.query_plan(self.user.profile.messages.filter(is_read=False))
+        self.assertIn('message_inbox_idx', plan)
+
+
+class AsyncProfileViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='asyncprofile', password='12345')
+        cls.profile = cls.user.profile
+        cls.profile.name = 'Async Student'
+        cls.profile.save()
+        cls.skill = Skill.objects.create(name='Concurrency', slug='concurrency')
+        cls.profile.skills.add(cls.skill)
+        Article.objects.create(owner=cls.profile, title='Awaited Article', slug='awaited-article')
+
+    def setUp(self):
+        cache.clear()
+
+    def async_request(self, path):
+        request = AsyncRequestFactory().get(path)
+        request.user = AnonymousUser()
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    async def test_profiles_listing(self):
+        response = await async_views.profiles(self.async_request(reverse('profiles')))
+        self.assertContains(response, 'Async Student')
+
+    async def test_profile_page_shows_skills_and_articles(self):
+        request = self.async_request(reverse('user_profile', args=['asyncprofile']))
+        response = await async_views.userProfile(request, username='asyncprofile')
+        self.assertContains(response, 'Concurrency')
+        self.assertContains(response, 'Awaited Article')
+
+    async def test_missing_profile_raises_404(self):
+        with self.assertRaises(Http404):
+            await async_views.userProfile(self.async_request('/users/profile/nobody/'), username='nobody')
+
+
+class ProfileSyncJobTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='syncuser', password='12345')
+
+    @override_settings(TASKS_EAGER=False)
+    def test_profile_changes_reach_the_user_through_a_job(self):
+        profile = self.user.profile
+        profile.name = 'Synced Name'
+        profile.email = 'synced@example.com'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.first_name, 'Synced Name')
+
+        queue.work(burst=True)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Synced Name')
+        self.assertEqual(self.user.email, 'synced@example.com')
+
+
+@override_settings(ASYNC_VIEWS=True)
+class AsyncProfileConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='asyncetag', password='12345')
+
+    def setUp(self):
+        cache.clear()
+        # The URLs pick the async views when they are imported, see ASYNC_VIEWS.
+        self.addCleanup(self.reload_urls)
+        self.reload_urls()
+
+    def reload_urls(self):
+        importlib.reload(urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    async def test_async_profile_page_answers_conditional_requests(self):
+        url = reverse('user_profile', args=['asyncetag'])
+        self.assertIs(resolve(url).func, async_views.userProfile)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        await cache.aclear()
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+class ProfileConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='etagprofile', password='12345')
+        cls.sender = User.objects.create_user(username='etagsender', password='12345')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('user_profile', args=['etagprofile'])
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_profile_is_not_modified(self):
+        etag = self.etag()
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_skill_and_article_changes_change_the_etag(self):
+        etag = self.etag()
+        skill = Skill.objects.create(name='Validation', slug='validation')
+        self.user.profile.skills.add(skill)
+        self.assertNotEqual(self.etag(), etag)
+        etag = self.etag()
+
+        skill.name = 'Revalidation'
+        skill.save()
+        self.assertNotEqual(self.etag(), etag)
+        etag = self.etag()
+
+        Article.objects.create(owner=self.user.profile, title='Fresh article', slug='fresh-article')
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_new_message_changes_the_etag_of_the_recipient(self):
+        self.client.login(username='etagprofile', password='12345')
+        etag = self.etag()
+        Message.objects.create(sender=self.sender.profile, recipient=self.user.profile, subject='Hi', body='Hello')
+        self.assertNotEqual(self.etag(), etag)
+
+
+class SkillFacetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.python = Skill.objects.create(name='Python', slug='python')
+        cls.design = Skill.objects.create(name='Design', slug='design')
+        cls.ada = User.objects.create_user(username='ada', password='12345', first_name='Ada').profile
+        cls.bob = User.objects.create_user(username='bob', password='12345', first_name='Bob').profile
+        cls.ada.skills.add(cls.python, cls.design)
+        cls.bob.skills.add(cls.python)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return dict(Skill.objects.values_list('name', 'profile_count'))
+
+    def test_counters_follow_relations(self):
+        self.assertEqual(self.counts(), {'Python': 2, 'Design': 1})
+        self.design.profile_set.add(self.bob)
+        self.ada.skills.remove(self.python)
+        self.assertEqual(self.counts(), {'Python': 1, 'Design': 2})
+        User.objects.get(username='bob').delete()
+        self.assertEqual(self.counts(), {'Python': 0, 'Design': 1})
+
+    def test_saving_a_loaded_skill_keeps_newer_counts(self):
+        loaded = Skill.objects.get(pk=self.design.pk)
+        self.bob.skills.add(self.design)
+        loaded.name = 'Graphic Design'
+        loaded.save()
+        self.assertEqual(self.counts(), {'Python': 2, 'Graphic Design': 2})
+
+    def test_profiles_filter_by_any_or_all_skills(self):
+        response = self.client.get(reverse('profiles'), {'skill': ['python', 'design']})
+        self.assertEqual({profile.username for profile in response.context['profiles']}, {'ada', 'bob'})
+        response = self.client.get(reverse('profiles'), {'skill': ['python', 'design'], 'match': 'all'})
+        self.assertEqual({profile.username for profile in response.context['profiles']}, {'ada'})
+        self.assertContains(response, 'Design <small>1</small>', html=False)
+        self.assertContains(response, '<input type="hidden" name="match" value="all" />', html=False)
+
+    def test_skill_page_shows_counts(self):
+        response = self.client.get(reverse('skill', args=['design']))
+        self.assertEqual([profile.username for profile in response.context['profiles']], ['ada'])
+        self.assertContains(response, 'Python <small>2</small>', html=False)
+
+
+class ProfileSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.science = Skill.objects.create(name='Computer Science', slug='computer-science')
+        cls.kowalski = User.objects.create_user(username='jan', password='12345', first_name='Jan Kowalski').profile
+        cls.anna = User.objects.create_user(username='anna', password='12345', first_name='Anna Nowak').profile
+        cls.annabelle = User.objects.create_user(username='annabelle', password='12345', first_name='Annabelle Computer').profile
+        cls.anna.skills.add(cls.science)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        response = self.client.get(reverse('profiles'), {'search_query': query})
+        return [profile.username for profile in response.context['profiles']]
+
+    def test_search_tolerates_typos(self):
+        self.assertEqual(self.search('Kowalsky'), ['jan'])
+        self.assertEqual(self.search('nowk'), ['anna'])
+        self.assertEqual(self.search('zzzz'), [])
+
+    def test_search_ranks_exact_and_name_matches_first(self):
+        self.assertEqual(self.search('anna'), ['anna', 'annabelle'])
+        self.assertEqual(self.search('computer'), ['annabelle', 'anna'])
+        self.assertEqual(self.search('anna nowak'), ['anna', 'annabelle'])
+
+    def test_search_by_skill_follows_relations(self):
+        self.assertEqual(self.search('science'), ['anna'])
+        self.kowalski.skills.add(self.science)
+        self.anna.skills.remove(self.science)
+        self.assertEqual(self.search('science'), ['jan'])
+
+    def test_search_covers_the_intro_below_the_name(self):
+        self.kowalski.intro = 'Robotics and embedded systems'
+        self.kowalski.save()
+        User.objects.create_user(username='robo', password='12345', first_name='Robotics Fan')
+        self.assertEqual(self.search('robotics'), ['robo', 'jan'])
+        self.assertEqual(self.search('embeded'), ['jan'])
+
+        self.kowalski.intro = ''
+        self.kowalski.save()
+        self.assertEqual(self.search('embedded'), [])
+
+    def test_search_works_without_the_intro_words(self):
+        self.kowalski.intro = 'Robotics and embedded systems'
+        self.kowalski.save()
+        with mock.patch.object(search, 'index_tables', return_value=frozenset(search.INDEX_TABLES)):
+            self.assertTrue(search.trigrams_enabled())
+            self.assertEqual(self.search('kowalski'), ['jan'])
+            self.assertEqual(self.search('robotics'), [])
+
+    @override_settings(PAGINATION_CURSOR_THRESHOLD=1)
+    def test_search_pages_through_every_match(self):
+        for number in range(12):
+            Profile.objects.create(username=f'robot{number}', name=f'Student {number}', intro='Robotics club')
+        User.objects.create_user(username='robo', password='12345', first_name='Robotics Fan')
+
+        pages = [self.client.get(reverse('profiles'), {'search_query': 'robotics', 'page': page}).context['profiles']
+                 for page in (1, 2, 3)]
+        self.assertEqual(pages[0].paginator.count, 13)
+        self.assertEqual(pages[0][0].username, 'robo')
+        self.assertEqual(len(pages[2]), 1)
+        self.assertEqual(len({profile.pk for page in pages for profile in page}), 13)
+
+    def test_index_follows_renames_and_deletions(self):
+        self.kowalski.name = 'Jan Wisniewski'
+        self.kowalski.save()
+        self.assertEqual(self.search('kowalski'), [])
+        self.assertEqual(self.search('wiśniewski'), ['jan'])
+
+        self.science.name = 'Mathematics'
+        self.science.save()
+        self.assertEqual(self.search('science'), [])
+        self.assertEqual(self.search('mathematics'), ['anna'])
+
+        self.science.delete()
+        self.assertEqual(self.search('mathematics'), [])
+        User.objects.get(username='jan').delete()
+        self.assertEqual(self.search('wisniewski'), [])
+
+
+class ImportProfilesCommandTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='12345', first_name='Ewa')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def path(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write('\n'.join(lines) + '\n')
+        return path
+
+    def run_command(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command(*args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_profiles(self):
+        Skill.objects.create(name='Computer Science', slug='computer-science')
+        path = self.path('profiles.ndjson', [
+            json.dumps({'username': 'zofia', 'name': 'Zofia Nowak', 'email': 'zofia@example.com',
+                        'skills': ['Computer Science', 'Robotics'], 'created': '2021-05-06T07:08:09+00:00'}),
+            json.dumps({'username': 'exporter', 'name': 'Ewa Kowalska', 'skills': []}),
+            json.dumps({'username': 'broken', 'name': 'Broken', 'email': 'not-an-email'}),
+            json.dumps({'name': 'Nameless'}),
+        ])
+        out, err = self.run_command('import_profiles', path)
+        self.assertIn('Created 1 profiles, updated 1, skipped 2 rows.', out)
+        self.assertIn('Line 3: skipped, email: Enter a valid email address.', err)
+        self.assertIn('Line 4: skipped, the username is missing.', err)
+
+        profile = Profile.objects.get(username='zofia')
+        self.assertEqual((profile.user.username, profile.user.email, profile.user.first_name),
+                         ('zofia', 'zofia@example.com', 'Zofia Nowak'))
+        self.assertFalse(profile.user.has_usable_password())
+        self.assertEqual(profile.created.isoformat(), '2021-05-06T07:08:09+00:00')
+        self.assertEqual(sorted(profile.skills.values_list('name', flat=True)), ['Computer Science', 'Robotics'])
+        self.assertEqual(Skill.objects.get(slug='robotics').profile_count, 1)
+        self.assertEqual(list(search.rank_profiles(Profile.objects.all(), 'zofia nowak')), [profile])
+
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.profile.name, self.user.first_name), ('Ewa Kowalska', 'Ewa Kowalska'))
+        self.assertTrue(self.user.check_password('12345'))
@@ -1,13 +1,17 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# The read-only pages are served by the async views under ASGI, see ASYNC_VIEWS.
+read_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
 
-    path('', views.profiles, name="profiles"),
+    path('', read_views.profiles, name="profiles"),
     path('login/', views.loginUser, name="login"),
     path('logout/', views.logoutUser, name="logout"),
     path('register/', views.registerUser, name="register"),
-    path('profile/<str:username>/', views.userProfile, name="user_profile"),
+    path('profile/<str:username>/', read_views.userProfile, name="user_profile"),
     path('account/', views.userAccount, name="account"),
     path('edit-account/', views.editAccount, name="edit-account"),
     path('create-skill/', views.createSkill, name="create-skill"),
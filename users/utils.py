@@ -1,6 +1,12 @@
-from .models import Profile, Skill
+from .models import Profile, Skill, Message
+from . import search
+from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.db.models import Q
+from BlogStudentsBUT.pagination import CursorPaginator, use_cursor_pagination
+from django.db.models import Q, Count, Max, Sum
+from BlogStudentsBUT.conditional import latest
+from BlogStudentsBUT.facets import FacetFilter
 
 def paginateProfiles(request, profiles, results):
     """
@@ -14,22 +20,31 @@ def paginateProfiles(request, profiles, results):
     Returns:
         tuple: A tuple containing:
             - custom_range (range): A range of page numbers for pagination controls.
-            - profiles (Page): A Page object containing the profiles for the current page.
+            - profiles (Page | CursorPage): A Page object containing the profiles for the current page,
+              or a CursorPage when cursor pagination is used.
 
     This function performs the following tasks:
-        1. Retrieves the current page number from the request's GET parameters.
-        2. Initializes a Paginator object with the profiles queryset and the specified number of results per page.
-        3. Tries to get the profiles for the specified page:
+        1. Switches to cursor (keyset) pagination on ``(created, id)`` when ``use_cursor_pagination``
+           says so, i.e. for large result sets in their natural order or when a 'cursor' parameter is given.
+           The custom range is then empty and the page carries the next/previous cursor tokens.
+           A 'page' parameter without a cursor, e.g. from an older link, still opens that page.
+        2. Retrieves the current page number from the request's GET parameters.
+        3. Initializes a Paginator object with the profiles queryset and the specified number of results per page.
+        4. Tries to get the profiles for the specified page:
             a. If the page number is not an integer, defaults to the first page.
             b. If the page number is out of range, defaults to the last page.
-        4. Calculates the range of page numbers to display in pagination controls:
+        5. Calculates the range of page numbers to display in pagination controls:
             a. Ensures the left index is not less than 1.
             b. Ensures the right index does not exceed the total number of pages plus one.
-        5. Returns the custom range of page numbers and the Page object for the current page.
+        6. Returns the custom range of page numbers and the Page object for the current page.
 
     Example:
         >>> custom_range, profiles = paginateProfiles(request, profiles, 6)
     """
+    if use_cursor_pagination(request, profiles, results):
+        paginator = CursorPaginator(profiles, results, keys=('created', 'id'))
+        return range(0), paginator.page(request.GET.get('cursor'), request.GET.get('page'))
+
     page = request.GET.get('page')
     paginator = Paginator(profiles, results)
 
@@ -73,13 +88,17 @@ def searchProfiles(request):
         1. Initializes an empty search query string.
         2. Checks if a 'search_query' parameter is present in the GET request:
             a. If present, sets the search query to the value of this parameter.
-        3. Filters skills based on the search query using a case-insensitive containment lookup.
-        4. Filters profiles based on the search query and associated skills:
-            a. Matches profiles where the name contains the search query.
-            b. Matches profiles where the intro contains the search query.
-            c. Matches profiles that have skills matching the search query.
-        5. Ensures that the resulting profile queryset is distinct to avoid duplicate results.
-        6. Returns the filtered profiles queryset and the search query string.
+        3. If the search query is empty, returns all profiles.
+        4. Narrows the profiles to the matches in the trigram index (see ``users.search.rank_profiles``),
+           which covers the name, the intro and the faculty names and tolerates typos, ordered by similarity.
+        5. Returns the matching profiles in the ranked order and the search query string.
+        6. If the trigram index is not available (e.g. the database is not SQLite), falls back to
+           filtering with case-insensitive containment lookups:
+            a. Filters skills based on the search query.
+            b. Matches profiles where the name contains the search query.
+            c. Matches profiles where the intro contains the search query.
+            d. Matches profiles that have skills matching the search query.
+            e. Ensures that the resulting profile queryset is distinct to avoid duplicate results.
 
     Example:
         >>> profiles, search_query = searchProfiles(request)
@@ -88,10 +107,107 @@ def searchProfiles(request):
     if request.GET.get('search_query'):
         search_query = request.GET.get('search_query')
 
+    if not search_query:
+        return Profile.objects.all(), search_query
+
+    profiles = search.rank_profiles(Profile.objects.all(), search_query)
+    if profiles is not None:
+        return profiles, search_query
+
     skills = Skill.objects.filter(name__icontains=search_query)
     profiles = Profile.objects.distinct().filter(
         Q(name__icontains=search_query) |
         Q(intro__icontains=search_query) |
         Q(skills__in=skills)
     )
-    return profiles, search_query
\ No newline at end of file
+    return profiles, search_query
+
+
+def filterProfilesBySkills(request, profiles, selected=None):
+    """
+    Filters profiles by the faculties chosen in the 'skill' parameters of the request.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        profiles (QuerySet): The queryset of profiles to be filtered.
+        selected (list): The slugs to filter by instead of the request's parameters, e.g. the faculty of
+            ``profiles_by_skill``.
+
+    Returns:
+        tuple: A tuple containing:
+            - profiles (QuerySet): The profiles with any, or with 'match=all' with all, chosen faculties.
+            - context (dict): The faculty filters for the template, see ``BlogStudentsBUT.facets.FacetFilter.context``.
+
+    Example:
+        >>> profiles, facets = filterProfilesBySkills(request, profiles)
+    """
+    facets = FacetFilter(request, Skill.objects.order_by('name'), 'skills', 'skill', 'profile_count', selected)
+    return facets.filter(profiles), facets.context()
+
+
+def unreadCountKey(user_id):
+    return f'unread-messages:{user_id}'
+
+
+def getUnreadCount(user):
+    """
+    Returns the number of unread messages of a user, served from the cache when possible.
+
+    Args:
+        user (User): The authenticated user.
+
+    Returns:
+        int: The number of unread messages received by the user's profile.
+
+    This function performs the following tasks:
+        1. Looks the count up in the cache under the user's ID, which needs no query for the profile.
+        2. On a cache miss, counts the unread messages with a single query and caches the result
+           for ``UNREAD_COUNT_TIMEOUT`` seconds. The Message signals drop the cached value
+           whenever a message of the user is saved or deleted. The value lives in the shared cache,
+           so the drop reaches every worker process.
+    """
+    key = unreadCountKey(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Message.objects.filter(recipient__user_id=user.pk, is_read=False).count()
+        cache.set(key, count, settings.UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def invalidateUnreadCount(profile_id):
+    """
+    Drops the cached unread message count of a profile's user.
+
+    Args:
+        profile_id (UUID): The ID of the profile that received a message.
+    """
+    if profile_id is None:
+        return
+    user_id = Profile.objects.filter(pk=profile_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        cache.delete(unreadCountKey(user_id))
+
+
+def userProfileState(request, username):
+    """
+    Returns the state of a profile page for ``BlogStudentsBUT.conditional.conditional_page``.
+
+    Args:
+        request (HttpRequest): The HTTP request object containing metadata about the request.
+        username (str): The username of the profile.
+
+    Returns:
+        tuple | None: The time of the latest change and the values the page depends on,
+        or None for missing profiles.
+
+    The update time of the profile, which skill changes move forward (see ``users.signals.touchSkilledProfiles``),
+    and the number, comment count and latest update time of its articles are read with one query.
+    """
+    state = (Profile.objects.filter(username=username)
+             .values('id', 'updated')
+             .annotate(articles_updated=Max('article__updated'), article_count=Count('article'),
+                       comment_count=Sum('article__total_votes'))
+             .first())
+    if state is None:
+        return None
+    return latest(state['updated'], state['articles_updated']), list(state.values())
@@ -7,7 +7,10 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from django.urls import conf
 from .forms import CustomUserCreationForm, ProfileForm, SkillForm, MessageForm
-from .utils import paginateProfiles, searchProfiles
+from .utils import paginateProfiles, searchProfiles, filterProfilesBySkills, userProfileState
+from BlogStudentsBUT.cache import cache_anonymous_page
+from BlogStudentsBUT.conditional import conditional_page
+from BlogStudentsBUT.routers import read_from_replica
 
 
 def loginUser(request):
@@ -134,6 +137,8 @@ def registerUser(request):
     return render(request, 'users/login_register.html', context)
 
 
+@cache_anonymous_page('profiles')
+@read_from_replica
 def profiles(request):
     """
     Handles the view for displaying a list of user profiles with search and pagination functionality.
@@ -146,26 +151,34 @@ def profiles(request):
 
     This view function performs the following tasks:
         1. Retrieves profiles based on a search query using the searchProfiles function.
-        2. Paginates the retrieved profiles using the paginateProfiles function, displaying 6 profiles per page.
-        3. Prepares the context with the profiles, search query, and custom pagination range.
-        4. Renders the profiles template with the context.
+        2. Keeps the profiles with the faculties chosen with 'skill' parameters, any of them or with 'match=all'
+           all of them, using the filterProfilesBySkills function.
+        3. Paginates the retrieved profiles using the paginateProfiles function, displaying 6 profiles per page.
+        4. Prepares the context with the profiles, search query, custom pagination range and faculty filters.
+        5. Renders the profiles template with the context.
+           Pages of anonymous visitors are cached until a profile or skill changes.
 
     The context for rendering the template includes:
         - profiles: The paginated list of profiles matching the search query.
         - search_query: The search query string used for filtering profiles.
         - custom_range: The range of page numbers for pagination controls.
+        - facets: Every faculty with its profile count, see ``BlogStudentsBUT.facets.FacetFilter.context``.
 
     Example:
         >>> profiles(request)
     """
     profiles, search_query = searchProfiles(request)
+    profiles, facets = filterProfilesBySkills(request, profiles)
 
     custom_range, profiles = paginateProfiles(request, profiles, 6)
-    context = {'profiles': profiles, 'search_query': search_query, 'custom_range': custom_range}
+    context = {'profiles': profiles, 'search_query': search_query, 'custom_range': custom_range, **facets}
     return render(request, 'users/profiles.html', context)
 
 
 
+@cache_anonymous_page(lambda request, username: f'profile:{username}', 'tags')
+@read_from_replica
+@conditional_page(userProfileState)
 def userProfile(request, username):
     """
     Handles the view for displaying a user's profile, including their main and extra skills.
@@ -180,13 +193,17 @@ def userProfile(request, username):
     This view function performs the following tasks:
         1. Retrieves the profile associated with the provided username.
         2. Retrieves the main skills (first 10) and extra skills (all skills starting from the 3rd) of the profile.
-        3. Prepares the context with the profile, main skills, and extra skills.
-        4. Renders the user profile template with the context.
+        3. Retrieves the articles of the profile with ``for_listing()``, so the cards do not query the owner or tags.
+        4. Prepares the context with the profile, main skills, extra skills and articles.
+        5. Renders the user profile template with the context.
+           Pages of anonymous visitors are cached until the profile or one of its articles changes.
+           Revalidation requests are answered with 304 Not Modified while ``userProfileState`` is unchanged.
 
     The context for rendering the template includes:
         - profile: The Profile instance of the user.
         - main_skills: A list of the first 10 skills of the user.
         - extra_skills: A list of the user's skills starting from the 3rd skill.
+        - articles: The articles of the user.
 
     Example:
         >>> userProfile(request, 'john_doe')
@@ -195,12 +212,14 @@ def userProfile(request, username):
 
     main_skills = profile.skills.all()[:10]
     extra_skills = profile.skills.all()[2:]
+    articles = profile.article_set.for_listing()
 
     context = {'profile': profile, 'main_skills': main_skills,
-               "extra_skills": extra_skills,}
+               "extra_skills": extra_skills, 'articles': articles}
     return render(request, 'users/user_profile.html', context)
 
 
+@read_from_replica
 def profiles_by_skill(request, skill_slug):
     """
     Handles the view for displaying profiles filtered by a specific faculty.
@@ -214,19 +233,21 @@ def profiles_by_skill(request, skill_slug):
 
     This view function performs the following tasks:
         1. Retrieves the faculty instance based on the provided slug or returns a 404 if not found.
-        2. Filters profiles that have the specified faculty.
-        3. Prepares the context with the filtered profiles.
+        2. Filters profiles that have the specified faculty with the filterProfilesBySkills function.
+        3. Prepares the context with the filtered profiles and the faculty filters.
         4. Renders the profiles template with the context.
 
     The context for rendering the template includes:
         - profiles: The list of profiles that have the specified skill.
+        - facets: Every faculty with its profile count, the specified skill is selected. The links add
+          faculties to the filters of the ``profiles`` listing.
 
     Example:
         >>> profiles_by_skill(request, 'Computer Sience')
     """
     skill = get_object_or_404(Skill, slug=skill_slug)
-    profiles = Profile.objects.filter(skills=skill)
-    context = {'profiles': profiles}
+    profiles, facets = filterProfilesBySkills(request, Profile.objects.all(), [skill.slug])
+    context = {'profiles': profiles, **facets}
     return render(request, "users/profiles.html", context)
 
 